@@ -0,0 +1,57 @@
+import argparse
+import random
+import sys
+
+from benchmarks import harness
+from benchmarks.cases import BENCHMARKS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quoting hot path benchmarks")
+    parser.add_argument("names", nargs="*", help="Benchmarks to run, all if empty")
+    parser.add_argument("--duration", type=float, default=1.0, help="In seconds")
+    parser.add_argument(
+        "--save", action="store_true", help="Save the results as the new baselines"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=harness.REGRESSION_THRESHOLD,
+        help="p50 slowdown in percent reported as a regression",
+    )
+    args = parser.parse_args()
+
+    random.seed(0)
+    baselines = harness.load_baselines()
+    results = {}
+    for benchmark in BENCHMARKS:
+        if args.names and benchmark.name not in args.names:
+            continue
+        results[benchmark.name] = harness.run(benchmark, duration=args.duration)
+
+    regressions = harness.compare(results, baselines, threshold=args.threshold)
+    print(
+        f"{'benchmark':<22}{'ops/sec':>12}{'p50 us':>10}{'p99 us':>10}"
+        f"{'peak B':>10}{'kept':>8}{'p50 vs base':>13}"
+    )
+    for name, result in results.items():
+        change = result.get("p50_change")
+        print(
+            f"{name:<22}{result['ops_per_sec']:>12,.0f}{result['p50_us']:>10.2f}"
+            f"{result['p99_us']:>10.2f}{result['peak_bytes']:>10}"
+            f"{result['retained_blocks']:>8.1f}"
+            f"{'' if change is None else f'{change:+.1f}%':>13}"
+        )
+
+    if args.save:
+        for result in results.values():
+            result.pop("p50_change", None)
+        harness.save_baselines(results)
+        print(f"Baselines saved to {harness.BASELINES_PATH}")
+    elif regressions:
+        print(f"Regressions over {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import base64
+import json
+import random
+from decimal import Decimal
+
+from benchmarks.harness import Benchmark
+from trading_bot import price_feed, price_source
+from trading_bot.balance_cache import BalanceCache
+from trading_bot.book_query import BookQuery
+from trading_bot.bot_cycle import create_order
+from trading_bot.quote_manager import QuoteManager
+from trading_bot.shared_book import SharedBook
+from trading_bot.tauros_api import OrderBook, TaurosPrivate, format_orderbook
+
+MARKET = "BTC-MXN"
+MID_PRICE = 800_000.0
+DEPTH = 50
+
+
+def create_levels(depth=DEPTH, ask=True):
+    sign = 1 if ask else -1
+    levels = []
+    for level in range(depth):
+        price = round(MID_PRICE + sign * (100 + level * 25), 2)
+        amount = round(random.uniform(0.0001, 0.1), 8)
+        levels.append((price, amount, round(price * amount, 2)))
+    return levels
+
+
+def create_shared_book(depth=DEPTH):
+    book = SharedBook(depth=depth)
+    book.write(create_levels(depth), create_levels(depth, ask=False))
+    return book
+
+
+def create_frame(levels, type=None, sequence=None):
+    asks, bids = levels
+    frame = {
+        "channel": "orderbook",
+        "data": {
+            "asks": [{"p": str(p), "a": str(a), "v": str(v)} for p, a, v in asks],
+            "bids": [{"p": str(p), "a": str(a), "v": str(v)} for p, a, v in bids],
+        },
+    }
+    if type is not None:
+        frame["type"] = type
+        frame["sequence"] = sequence
+    return json.dumps(frame)
+
+
+def create_secret():
+    return base64.b64encode(random.randbytes(64)).decode()
+
+
+class SignOnlyClient(TaurosPrivate):
+    """
+    TaurosPrivate that signs every request as usual but answers it without
+    any network request.
+    """
+
+    def __init__(self):
+        super().__init__(key="benchmark", secret=create_secret())
+        self.ids = 0
+
+    def _send(self, prepared, query_params={}):
+        nonce = self.nonce_generator.get_nonce()
+        self._get_headers(prepared, nonce)
+        self.ids += 1
+        return {"success": True, "data": {"id": self.ids}}
+
+
+def setup_format_orderbook():
+    return (create_shared_book(),)
+
+
+def setup_snapshot_message():
+    orderbook = OrderBook(market=MARKET, orderbook=SharedBook(depth=DEPTH))
+    levels = create_levels(), create_levels(ask=False)
+    return orderbook, create_frame(levels)
+
+
+def setup_diff_message():
+    orderbook = OrderBook(market=MARKET, orderbook=SharedBook(depth=DEPTH))
+    orderbook.on_message(
+        None, create_frame((create_levels(), create_levels(ask=False)))
+    )
+    # The same diff is applied every call, so the sequence is not checked
+    diff = create_levels(3), create_levels(3, ask=False)
+    return orderbook, create_frame(diff, type="update")
+
+
+def on_message(orderbook, message):
+    orderbook.on_message(None, message)
+
+
+def setup_signature():
+    client = TaurosPrivate(key="benchmark", secret=create_secret())
+    order = {
+        "market": MARKET,
+        "amount": "20000.00",
+        "is_amount_value": True,
+        "side": "BUY",
+        "type": "LIMIT",
+        "price": "799900.00",
+    }
+    return client, order
+
+
+def get_signature(client, order):
+    client._get_signature(
+        path="/api/v1/trading/placeorder/", data=order, nonce="1", method="post"
+    )
+
+
+def setup_order_price():
+    book = BookQuery.from_snapshot(create_shared_book().snapshot())
+    return book, Decimal("800050.00")
+
+
+def setup_close_order():
+    client = SignOnlyClient()
+    client.place_order(order={})
+    return client, client.ids
+
+
+def sign_close_order(client, order_id):
+    """
+    Signs the prepared close request of a placed order.
+    """
+    client._get_headers(client.close_templates[order_id], "1")
+
+
+def get_order_price(book, external_price):
+    price_source.get_order_price(
+        side="buy", book=book, external_price=external_price, spread=1.5
+    )
+    price_source.get_order_price(
+        side="sell",
+        book=book,
+        external_price=external_price,
+        spread=1.5,
+        greedy_mood=False,
+    )
+
+
+def get_order_value(price):
+    price_source.get_order_value(
+        max_balance=Decimal("50000"), price=price, max_order_value=20_000.00
+    )
+    price_source.get_order_value(
+        max_balance=Decimal("0.5"),
+        price=price,
+        max_order_value=20_000.00,
+        side="sell",
+    )
+
+
+def setup_bot_cycle():
+    orderbook = create_shared_book()
+    price = price_feed.create_price_array()
+    price[:] = [MID_PRICE - 50, MID_PRICE + 50, 1e12, 1e12]
+    balances = BalanceCache(["btc", "mxn"], sync_interval=1e12)
+    balances.claim_sync("mxn")
+    balances.set_available("mxn", Decimal("1000000"))
+    quotes = QuoteManager(
+        client=SignOnlyClient(), market="btc-mxn", side="buy", balances=balances
+    )
+    return orderbook, price, balances, quotes
+
+
+def bot_cycle(orderbook, price, balances, quotes):
+    """
+    Tick to quote path of a buy bot: reads the book and the external price,
+    prices and sizes the order and replaces the live order.
+    """
+    book = BookQuery.from_snapshot(orderbook.snapshot())
+    external_price = price_feed.get_price(price, ask=False)
+    order_price, _ = price_source.get_order_price(
+        side="buy", book=book, external_price=external_price, spread=1.5
+    )
+    available_balance = balances.get_available("mxn")
+    order = create_order(
+        market="btc-mxn",
+        side="buy",
+        order_price=order_price,
+        max_balance=quotes.get_spendable_balance(available_balance),
+        config={"order_value": 20_000.00},
+    )
+    quotes.replace(order=order, available_balance=available_balance)
+
+
+BENCHMARKS = [
+    Benchmark("format_orderbook", format_orderbook, setup_format_orderbook),
+    Benchmark("on_message_snapshot", on_message, setup_snapshot_message),
+    Benchmark("on_message_diff", on_message, setup_diff_message),
+    Benchmark("get_signature", get_signature, setup_signature),
+    Benchmark("sign_close_order", sign_close_order, setup_close_order),
+    Benchmark("get_order_price", get_order_price, setup_order_price),
+    Benchmark("get_order_value", get_order_value, lambda: (Decimal("800000"),)),
+    Benchmark("bot_cycle", bot_cycle, setup_bot_cycle),
+]
@@ -0,0 +1,118 @@
+import gc
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+# Slowdown in percent over the baseline reported as a regression
+REGRESSION_THRESHOLD = 20
+
+
+class Benchmark:
+    """
+    A function to measure. setup returns the arguments of every call, so
+    building inputs is not measured.
+    """
+
+    def __init__(self, name, function, setup=None):
+        self.name = name
+        self.function = function
+        self.setup = setup or (lambda: ())
+
+
+def _time_calls(function, args, calls):
+    timings = np.empty(calls, dtype=np.int64)
+    perf_counter_ns = time.perf_counter_ns
+    for index in range(calls):
+        start = perf_counter_ns()
+        function(*args)
+        timings[index] = perf_counter_ns() - start
+    return timings
+
+
+def _measure_allocations(function, args, calls):
+    """
+    Returns the peak memory in bytes allocated by a call and the number of
+    memory blocks still allocated per call, which should be zero.
+    """
+    tracemalloc.start()
+    try:
+        function(*args)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        current, _ = tracemalloc.get_traced_memory()
+        for _ in range(calls):
+            function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(
+        stat.count_diff
+        for stat in after.compare_to(before, "filename")
+        if stat.count_diff > 0
+    )
+    return peak - current, blocks / calls
+
+
+def run(benchmark, duration=1.0, allocation_calls=100):
+    """
+    Runs a benchmark for about duration seconds. Returns its results: ops
+    per second, p50 and p99 latency in microseconds and allocations.
+    """
+    args = benchmark.setup()
+
+    # Warm up and estimate the number of calls that fit in duration
+    warmup = _time_calls(benchmark.function, args, 10)
+    calls = max(int(duration * 1e9 / max(np.median(warmup), 1)), 100)
+
+    gc.collect()
+    gc.disable()
+    try:
+        timings = _time_calls(benchmark.function, args, calls)
+    finally:
+        gc.enable()
+
+    peak, blocks = _measure_allocations(benchmark.function, args, allocation_calls)
+    return {
+        "ops_per_sec": round(1e9 * calls / timings.sum(), 1),
+        "p50_us": round(float(np.percentile(timings, 50)) / 1000, 3),
+        "p99_us": round(float(np.percentile(timings, 99)) / 1000, 3),
+        "peak_bytes": int(peak),
+        "retained_blocks": round(blocks, 2),
+    }
+
+
+def load_baselines(path=BASELINES_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as baselines:
+        return json.load(baselines)
+
+
+def save_baselines(results, path=BASELINES_PATH):
+    baselines = load_baselines(path)
+    baselines.update(results)
+    with open(path, "w") as file:
+        json.dump(baselines, file, indent=4, sort_keys=True)
+
+
+def compare(results, baselines, threshold=REGRESSION_THRESHOLD):
+    """
+    Returns the names of the benchmarks whose p50 latency is more than
+    threshold percent slower than their baseline.
+    """
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        change = (result["p50_us"] - baseline["p50_us"]) / baseline["p50_us"] * 100
+        result["p50_change"] = round(change, 1)
+        if change > threshold:
+            regressions.append(name)
+    return regressions
@@ -1,17 +1,40 @@
 from trading_bot.tauros_api import (
     TaurosPrivate,
-    TaurosPublic,
     OrderBook,
-    format_orderbook,
+    OrderStore,
+    UserStream,
 )
-from trading_bot import notifications, price_source
-from decimal import Decimal
+from trading_bot import (
+    async_runtime,
+    bot_cycle,
+    metrics,
+    notifications,
+    price_source,
+    price_feed,
+    signals,
+    strategy,
+)
+from trading_bot.balance_cache import BalanceCache
+from trading_bot.book_engine import get_orderbook_depth
+from trading_bot.gateway import OrderGateway
+from trading_bot.config_service import (
+    BotUpdates,
+    ConfigService,
+    apply_updates,
+    normalize_robots,
+)
+from trading_bot.http_session import get_session
+from trading_bot.quote_manager import LadderManager, QuoteManager
+from trading_bot.recorder import BookRecorder, Recorder
+from trading_bot.shared_book import SharedBook
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import logging
 import settings
 import time
 import json
-from multiprocessing import Process, Array
+from multiprocessing import Process, Condition, Manager, Queue
+from threading import Thread
 
 logging.basicConfig(format="%(asctime)s - %(message)s", level=logging.INFO)
 
@@ -24,9 +47,6 @@ if not tauros_key or not tauros_secret:
     exit("Tauros credentials not fund. Unable to launch bots.")
 
 tauros = TaurosPrivate(key=tauros_key, secret=tauros_secret, prod=is_production)
-
-tauros_public = TaurosPublic(prod=is_production)
-ORDERBOOK_SIZE = 20
 REMOTE_BOTS_LIMIT = 50
 
 
@@ -46,339 +66,458 @@ def notify_not_enough_balance(left_coin_balance=None, right_coin_balance=None):
     )
 
 
-def sell_bot(config_id, raw_orderbook, remote=False):
-    config = {}
+def get_available_balance(balances, coin):
+    """
+    Returns the unreserved balance of a coin from the shared cache,
+    reconciling it with the tauros wallet when it is due.
+    Returns None if the balance is not known yet.
+    """
+    if balances.claim_sync(coin):
+        bot_cycle.set_wallet_balance(balances, coin, tauros.get_wallet(coin))
+    return bot_cycle.get_synced_balance(balances, coin)
+
+
+def create_market_data(market, orders=None):
+    """
+    Shared memory objects for a market. The event is notified every time the
+    orderbook or the external price of the market changes, or when the user
+    stream reports one of our orders. Orders are shared by every market.
+    """
+    return {
+        "orderbook": SharedBook(depth=get_orderbook_depth(market)),
+        "price": price_feed.create_price_array(),
+        "quote": strategy.create_quote_array(),
+        "signals": signals.create_signals_array(),
+        "event": Condition(),
+        "orders": orders,
+    }
+
+
+def wait_for_requote(
+    side, config, market_data, updates, order_price, max_age, quotes=None
+):
+    """
+    Blocks until the target price of the order moves more than the configured
+    requote threshold, the order is filled or closed, the bot config changes
+    or until max_age seconds have passed.
+    Woken up by every orderbook, external price or own order update of the
+    market.
+    """
+    deadline = time.time() + max_age
     while True:
-        if remote:
-            response = requests.get(f"{FIREBASE_BASE_URL}/{config_id}.json")
-            config = response.json()
-        else:
-            with open("./robots.json") as robots:
-                robots_list = json.load(robots)
-                config = robots_list[config_id]
-        market = config["market"]
-        spread = config["spread"]
-        time_to_sleep = config.get("refresh_rate") * 60 or settings.REFRESH_ORDER_RATE
-        greedy_mood = config.get("greedy_mood", True)
-        orderbook = format_orderbook(raw_orderbook)
-
-        if not config.get("is_active"):
-            logging.info(
-                f"{market} SELL bot is not active. Sleeping {time_to_sleep} seconds"
-            )
-            time.sleep(time_to_sleep)
-            continue
-
-        left_coin, _ = market.split("-")
-        external_price = price_source.get_external_price(market=market, ask=True)
-        tauros_price = tauros_public.get_ask_price(market=market, orderbook=orderbook)
-
-        if not external_price or not tauros_price:
-            logging.error("Bitso or Tauros query price failed")
-            time.sleep(3)
-            continue
-
-        left_coin_wallet = tauros.get_wallet(left_coin)
-
-        if not left_coin_wallet["success"]:
-            error_msg = left_coin_wallet["msg"]
-            logging.error(f"Tauros {left_coin} wallet query failed. Error: {error_msg}")
-            time.sleep(3)
-            continue
-
-        left_coin_balance = Decimal(left_coin_wallet["data"]["balances"]["available"])
-
-        if left_coin_balance == 0:
-            logging.error(
-                f"{left_coin} wallet is empty. Imposible to place a buy order. Sending email . . ."
-            )
-            notify_not_enough_balance(left_coin_balance=0)
-            time.sleep(settings.NOT_FUNDS_AWAITING_TIME * 60)
-            continue
-
-        order_price = price_source.get_sell_order_price(
-            min_price=external_price,
-            ref_price=tauros_price,
-            spread=spread,
-            greedy_mood=greedy_mood,
-        )
-        if not greedy_mood:
-            tauros_bid_price = tauros_public.get_bid_price(
-                market=market, ignore_below=0, orderbook=orderbook
-            )
-            if order_price <= tauros_bid_price:
-                # TODO: Remove magic number
-                order_price = tauros_bid_price + Decimal("0.01")
-
-        order_value = price_source.get_order_value(
-            max_balance=left_coin_balance,
-            price=order_price,
-            max_order_value=config.get("order_value") or 20_000.00,
-            side="sell",
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            logging.info(f"{config['market']} {side.upper()} order reached its max age")
+            return
+
+        with market_data["event"]:
+            market_data["event"].wait(timeout=remaining)
+
+        if updates.poll():
+            return
+        if bot_cycle.is_requote_due(side, config, market_data, order_price, quotes):
+            return
+
+
+def run_ladder_cycle(
+    ladder, side, config, book, market_data, balances, updates, cycle_start
+):
+    """
+    Quotes every level of a ladder bot, replacing only the levels whose
+    order changed, and waits for the next cycle.
+    """
+    market = config["market"]
+    levels = bot_cycle.get_ladder_levels(config, market_data)
+    time_to_sleep = bot_cycle.get_time_to_sleep(config)
+    prices = bot_cycle.get_ladder_prices(side, config, market_data, levels, book)
+    if not prices:
+        ladder.cancel()
+        updates.wait(bot_cycle.TRY_AGAIN_IN)
+        return
+
+    available_balance = get_available_balance(
+        balances, bot_cycle.get_coin(market, side)
+    )
+    if available_balance is None:
+        updates.wait(bot_cycle.TRY_AGAIN_IN)
+        return
+
+    orders = price_source.get_ladder_orders(
+        market=market,
+        side=side,
+        prices=prices,
+        levels=levels,
+        max_balance=ladder.get_spendable_balance(available_balance),
+    )
+    responses = ladder.update(
+        orders=orders,
+        available_balance=available_balance,
+        threshold=config.get("requote_threshold"),
+    )
+    metrics.observe("cycle", time.perf_counter() - cycle_start)
+    bot_cycle.log_ladder_responses(market, side, responses, orders)
+
+    if config.get("event_driven"):
+        wait_for_requote(
+            side=side,
+            config={**config, "spread": config["levels"][0]["spread"]},
+            market_data=market_data,
+            updates=updates,
+            order_price=prices[0],
+            max_age=time_to_sleep,
+            quotes=ladder,
         )
-
-        order = {
-            "market": market,
-            "amount": str(order_value),
-            "is_amount_value": True,
-            "side": "SELL",
-            "type": "LIMIT",
-            "price": str(order_price),
-        }
-
-        order_placed = tauros.place_order(order=order)
-
-        if not order_placed["success"]:
-            logging.error(
-                f"Could not place sell order in {market} market. Error: {order_placed['msg']}"
-            )
-            messages = (
-                "The minimum order",
-                "has not enough {}".format(left_coin.upper()),
-                "'amount' field must be greater",
-            )
-            try:
-                for message in messages:
-                    if message in order_placed["msg"][0]:
-                        notify_not_enough_balance()
-                        logging.error("Not enough funds email sent...")
-                        time.sleep(settings.NOT_FUNDS_AWAITING_TIME * 60)
-            except:
-                pass
-            continue
-
-        order_id = order_placed["data"]["id"]
-
-        time_to_sleep = config.get("refresh_rate") * 60 or settings.REFRESH_ORDER_RATE
-
-        logging.info(f"Tauros ask order price: {tauros_price}")
-        logging.info(f"External ask order price: {external_price}")
-        order_data = order_placed["data"]
-        real_spread = (external_price - Decimal(order_data["price"])) / external_price
-        real_spread = abs(round(real_spread * 100, 2))
-        order_data["spread"] = str(real_spread) + "%"
-        logging.info(f"Sell order successfully placed: {order_data}")
+    else:
         logging.info(f"Sleeping {time_to_sleep} seconds")
-        time.sleep(time_to_sleep)
-
-        close_order = tauros.close_order(order_id)
-        if not close_order["success"]:
-            logging.info(f"Order close faild. Error: {close_order['msg']}")
-            # Making a second attempt if nonce invalid
-            if "Provided nonce it is not valid." == close_order["msg"]:
-                logging.info("Making a sencond attempt")
-                close_order = tauros.close_order(order_id)
+        updates.wait(time_to_sleep)
 
 
-def buy_bot(config_id, raw_orderbook, remote=False):
-    config = {}
+def run_bot(config_id, config, updates, market_data, balances):
+    """
+    Loop of a buy or sell bot process.
+    """
+    updates = BotUpdates(updates)
+    side = config["side"]
+    quotes = QuoteManager(
+        client=tauros, market=config["market"], side=side, balances=balances
+    )
+    ladder = LadderManager(
+        client=tauros, market=config["market"], side=side, balances=balances
+    )
     while True:
-        if remote:
-            response = requests.get(f"{FIREBASE_BASE_URL}/{config_id}.json")
-            config = response.json()
-            if not config:
-                logging.error(
-                    "Imposible to place order. Could get config from firebase. Error:",
-                    response.text,
-                )
-                return
-        else:
-            with open("./robots.json") as robots:
-                robots_list = json.load(robots)
-                config = robots_list[config_id]
+        cycle_start = time.perf_counter()
+        with metrics.timer("config"):
+            config = apply_updates(config, updates)
+        if config is None:
+            logging.info(f"Bot {config_id} stopped")
+            quotes.cancel()
+            ladder.cancel()
+            return
         market = config["market"]
-        spread = config["spread"]
-        time_to_sleep = config.get("refresh_rate") * 60 or settings.REFRESH_ORDER_RATE
-        greedy_mood = config.get("greedy_mood", True)
-        orderbook = format_orderbook(raw_orderbook)
+        time_to_sleep = bot_cycle.get_time_to_sleep(config)
+        book = bot_cycle.read_book(market_data)
+        quotes.sync(market_data["orders"])
+        ladder.sync(market_data["orders"])
 
         if not config.get("is_active"):
             logging.info(
-                f"{market} BUY bot is not active. Sleeping {time_to_sleep} seconds"
+                f"{market} {side.upper()} bot is not active. Sleeping {time_to_sleep} seconds"
             )
-            time.sleep(time_to_sleep)
+            quotes.cancel()
+            ladder.cancel()
+            updates.wait(time_to_sleep)
             continue
 
-        _, right_coin = market.split("-")
-        external_price = price_source.get_external_price(market=market, ask=False)
-        tauros_price = tauros_public.get_bid_price(market=market, orderbook=orderbook)
-
-        if not external_price or not tauros_price:
-            TRY_AGAIN_IN = 3
-            logging.error(
-                f"External or Tauros query price failed for BUY bot in {market}. Trying again in: {TRY_AGAIN_IN}s"
+        if config.get("levels"):
+            quotes.cancel()
+            run_ladder_cycle(
+                ladder=ladder,
+                side=side,
+                config=config,
+                book=book,
+                market_data=market_data,
+                balances=balances,
+                updates=updates,
+                cycle_start=cycle_start,
             )
-            time.sleep(TRY_AGAIN_IN)
             continue
+        ladder.cancel()
 
-        right_coin_wallet = tauros.get_wallet(right_coin)
-
-        if not right_coin_wallet["success"]:
-            error_msg = right_coin_wallet["msg"]
-            logging.error(
-                f"Tauros {right_coin} wallet query failed. Error: {error_msg}"
-            )
-            time.sleep(3)
+        order_price, tauros_price, external_price = bot_cycle.get_order_price(
+            side, config, market_data, book
+        )
+        if not order_price:
+            quotes.cancel()
+            updates.wait(bot_cycle.TRY_AGAIN_IN)
             continue
 
-        right_coin_balance = Decimal(right_coin_wallet["data"]["balances"]["available"])
+        coin = bot_cycle.get_coin(market, side)
+        available_balance = get_available_balance(balances, coin)
+        if available_balance is None:
+            updates.wait(bot_cycle.TRY_AGAIN_IN)
+            continue
 
-        if right_coin_balance == 0:
+        coin_balance = quotes.get_spendable_balance(available_balance)
+        if coin_balance == 0:
             logging.error(
-                f"{right_coin} wallet is empty. Imposible to place a buy order. Sending email . . ."
+                f"{coin} wallet is empty. Imposible to place a {side} order. Sending email . . ."
             )
-            notify_not_enough_balance(right_coin_balance=0)
-            time.sleep(settings.NOT_FUNDS_AWAITING_TIME * 60)
+            if side == "buy":
+                notify_not_enough_balance(right_coin_balance=0)
+            else:
+                notify_not_enough_balance(left_coin_balance=0)
+            updates.wait(settings.NOT_FUNDS_AWAITING_TIME * 60)
             continue
 
-        order_price = price_source.get_buy_order_price(
-            max_price=external_price,
-            ref_price=tauros_price,
-            spread=spread,
-            greedy_mood=greedy_mood,
+        order = bot_cycle.create_order(
+            market, side, order_price, max_balance=coin_balance, config=config
         )
-        if not greedy_mood:
-            tauros_ask_price = tauros_public.get_ask_price(
-                market=market, ignore_below=0, orderbook=orderbook
-            )
-            if order_price >= tauros_ask_price:
-                # TODO: Remove magic number
-                order_price = tauros_ask_price - Decimal("0.01")
-
-        order_value = price_source.get_order_value(
-            max_balance=right_coin_balance,
-            price=order_price,
-            max_order_value=config.get("order_value") or 20_000.00,
-            side="buy",
-        )
-
-        order = {
-            "market": market,
-            "amount": str(order_value),
-            "is_amount_value": True,
-            "side": "BUY",
-            "type": "LIMIT",
-            "price": str(order_price),
-        }
-
-        order_placed = tauros.place_order(order=order)
-
-        if not order_placed["success"]:
-            error_msg = f"Could not place buy order in {market} market. Error: {order_placed['msg']}"
-            logging.error(error_msg)
-            messages = (
-                "The minimum order",
-                "has not enough {}".format(right_coin.upper()),
-                "'amount' field must be greater",
-            )
-            try:
-                for message in messages:
-                    if message in order_placed["msg"][0]:
-                        notify_not_enough_balance()
-                        logging.error("Not enough funds email sent...")
-                        time.sleep(settings.NOT_FUNDS_AWAITING_TIME * 60)
-            except:
-                pass
+        order_placed = quotes.replace(order=order, available_balance=available_balance)
+        metrics.observe("cycle", time.perf_counter() - cycle_start)
+
+        if not bot_cycle.log_order_placed(
+            market, side, order_placed, tauros_price, external_price
+        ):
+            if bot_cycle.is_not_funds_error(order_placed, coin):
+                quotes.cancel()
+                notify_not_enough_balance()
+                logging.error("Not enough funds email sent...")
+                updates.wait(settings.NOT_FUNDS_AWAITING_TIME * 60)
             continue
 
-        order_id = order_placed["data"]["id"]
-
-        logging.info(f"Tauros bid order price: {tauros_price}")
-        logging.info(f"External bid order price: {external_price}")
-        order_data = order_placed["data"]
-        real_spread = (external_price - Decimal(order_data["price"])) / external_price
-        real_spread = abs(round(real_spread * 100, 2))
-        order_data["spread"] = str(real_spread) + "%"
-        logging.info(f"Buy order successfully placed: {order_data}")
-        logging.info(f"Sleeping {time_to_sleep} seconds")
-        time.sleep(time_to_sleep)
-
-        close_order = tauros.close_order(order_id)
-        if not close_order["success"]:
-            logging.info(f"Order close faild. Error: {close_order['msg']}")
-            # Making a second attempt if nonce invalid
-            if "Provided nonce it is not valid." == close_order["msg"]:
-                logging.info("Making a sencond attempt")
-                close_order = tauros.close_order(order_id)
+        if config.get("event_driven"):
+            wait_for_requote(
+                side=side,
+                config=config,
+                market_data=market_data,
+                updates=updates,
+                order_price=order_price,
+                max_age=time_to_sleep,
+                quotes=quotes,
+            )
+        else:
+            logging.info(f"Sleeping {time_to_sleep} seconds")
+            updates.wait(time_to_sleep)
 
 
-def main():
-    tauros.close_all_orders()
-    bots_processes = []
-    orderbooks = {}
+def get_robots():
+    """
+    Returns a list of (config_id, config) for every configured bot.
+    """
     if not settings.USE_FIREBASE:
         logging.info("Using robots.json file...")
         with open("./robots.json") as bots_config:
             robots_config = json.load(bots_config)
-        for index, bot_config in enumerate(robots_config):
-            market = bot_config["market"].upper()
-            if market not in orderbooks:
-                orderbooks[market] = {
-                    "asks_a": Array("d", ORDERBOOK_SIZE),
-                    "asks_v": Array("d", ORDERBOOK_SIZE),
-                    "asks_p": Array("d", ORDERBOOK_SIZE),
-                    "bids_a": Array("d", ORDERBOOK_SIZE),
-                    "bids_v": Array("d", ORDERBOOK_SIZE),
-                    "bids_p": Array("d", ORDERBOOK_SIZE),
-                }
-            bots_processes.append(
-                Process(
-                    target=buy_bot if bot_config["side"] == "buy" else sell_bot,
-                    args=(index, orderbooks[market], False),
-                )
-            )
-    else:
-        logging.info(f"Using firebase with up to {REMOTE_BOTS_LIMIT} bots")
-        for i in range(0, REMOTE_BOTS_LIMIT - 1):
-            response = requests.get(f"{FIREBASE_BASE_URL}/{i}.json")
-            robot = response.json()
-            if not robot:
-                break
-            func = buy_bot if robot["side"] == "buy" else sell_bot
-            market = robot["market"].upper()
-            if market not in orderbooks:
-                orderbooks[market] = {
-                    "asks_a": Array("d", ORDERBOOK_SIZE),
-                    "asks_v": Array("d", ORDERBOOK_SIZE),
-                    "asks_p": Array("d", ORDERBOOK_SIZE),
-                    "bids_a": Array("d", ORDERBOOK_SIZE),
-                    "bids_v": Array("d", ORDERBOOK_SIZE),
-                    "bids_p": Array("d", ORDERBOOK_SIZE),
-                }
-            bots_processes.append(
-                Process(target=func, args=(i, orderbooks[market], True))
+        return list(enumerate(robots_config))
+
+    logging.info(f"Using firebase with up to {REMOTE_BOTS_LIMIT} bots")
+    try:
+        response = get_session().get(
+            f"{FIREBASE_BASE_URL}/.json", timeout=settings.HTTP_TIMEOUT
+        )
+        robots = normalize_robots(response.json())
+    except (ValueError, requests.RequestException) as e:
+        logging.error(f"Could not get bots collection. Error: {e}")
+        return get_robots_by_id()
+    return sorted(robots.items())[:REMOTE_BOTS_LIMIT]
+
+
+def get_robots_by_id():
+    """
+    Fetches the firebase bots one by one concurrently, up to the first
+    missing id.
+    """
+
+    def get_robot(config_id):
+        try:
+            response = get_session().get(
+                f"{FIREBASE_BASE_URL}/{config_id}.json", timeout=settings.HTTP_TIMEOUT
             )
+            return response.json()
+        except (ValueError, requests.RequestException):
+            return None
+
+    config_ids = range(REMOTE_BOTS_LIMIT)
+    with ThreadPoolExecutor(max_workers=settings.HTTP_POOL_SIZE) as pool:
+        configs = list(pool.map(get_robot, config_ids))
+    robots = []
+    for config_id, robot in zip(config_ids, configs):
+        if not robot:
+            break
+        robots.append((config_id, robot))
+    return robots
+
+
+def run_bot_process(gateway, slot, bot, *args):
+    """
+    Entry point of the bot processes when the order gateway is enabled.
+    Requests of the process are sent through the gateway instead of the
+    tauros client of the module.
+    """
+    global tauros
+    tauros = gateway.get_client(slot)
+    bot(*args)
+
+
+def start_feeds(market, market_data, balances):
+    """
+    Starts the orderbook, external price and pricing engine processes of a
+    market.
+    """
+    orderbook_obj = OrderBook(
+        market=market,
+        orderbook=market_data["orderbook"],
+        event=market_data["event"],
+        signals=signals.BookSignals(market_data["signals"]),
+        recorder=(
+            BookRecorder(market, market_data["orderbook"].depth)
+            if settings.RECORDER_ENABLED
+            else None
+        ),
+    )
+    feed = price_feed.PriceFeed(
+        market=market, price=market_data["price"], event=market_data["event"]
+    )
+    engine = strategy.InventoryStrategy(
+        market=market, market_data=market_data, balances=balances
+    )
+    processes = [
+        Process(target=orderbook_obj.connect),
+        Process(target=feed.connect),
+        Process(target=engine.connect),
+    ]
+    for process in processes:
+        process.start()
+    return processes
 
-    if not bots_processes:
+
+def main():
+    tauros.close_all_orders()
+    robots = get_robots()
+
+    if not robots:
         exit("No bots config defined")
 
-    ob_processes = []
-    for market, orderbook_arr in orderbooks.items():
-        orderbook_obj = OrderBook(market=market, orderbook=orderbook_arr)
-        process = Process(target=orderbook_obj.connect)
-        ob_processes.append(process)
-        process.start()
+    config_service = ConfigService(robots, remote=settings.USE_FIREBASE)
 
-    # Awaiting to receive websocket stream
+    if settings.BOTS_RUNTIME == "asyncio":
+        logging.info(f"Running {len(robots)} bots in asyncio runtime")
+        try:
+            async_runtime.run(
+                config_service,
+                prod=is_production,
+                nonce_generator=tauros.nonce_generator,
+            )
+        except KeyboardInterrupt:
+            # Close all open orders
+            tauros.close_all_orders()
+        return
+
+    # Bots can be added at runtime, so shared data is created for every
+    # supported market. Feeds only run for markets with bots.
+    coins = set()
+    for market in settings.PRICE_SOURCE_RULES:
+        coins.update(market.split("-"))
+    balances = BalanceCache(coins)
+    orders = OrderStore(Manager().dict()) if settings.USER_STREAM_ENABLED else None
+    markets = {
+        market.upper(): create_market_data(market, orders=orders)
+        for market in settings.PRICE_SOURCE_RULES
+    }
+
+    if settings.METRICS_ENABLED:
+        metrics.start_server(markets)
+
+    feed_processes = {}
+    for _, bot_config in config_service.robots.items():
+        market = bot_config["market"].upper()
+        if market not in feed_processes:
+            feed_processes[market] = start_feeds(market, markets[market], balances)
+
+    user_stream_process = None
+    if settings.USER_STREAM_ENABLED:
+        user_stream = UserStream(
+            client=tauros,
+            orders=orders,
+            balances=balances,
+            events={market: data["event"] for market, data in markets.items()},
+            prod=is_production,
+        )
+        user_stream_process = Process(target=user_stream.connect)
+        user_stream_process.start()
+
+    gateway = None
+    gateway_process = None
+    if settings.GATEWAY_ENABLED:
+        gateway = OrderGateway(client=tauros)
+        gateway_process = Process(target=gateway.connect)
+        gateway_process.start()
+
+    recorder_process = None
+    if settings.RECORDER_ENABLED:
+        recorder = Recorder(markets=markets, orders=orders)
+        recorder_process = Process(target=recorder.connect)
+        recorder_process.start()
+
+    # Awaiting to receive websocket stream and external prices
     time.sleep(3)
 
-    for process in bots_processes:
+    # Process and market of every running bot by config_id
+    bots = {}
+
+    def start_bot(config_id, bot_config):
+        market = bot_config["market"].upper()
+        if market not in feed_processes:
+            feed_processes[market] = start_feeds(market, markets[market], balances)
+        updates = Queue()
+        config_service.register(config_id, updates)
+        args = (config_id, bot_config, updates, markets[market], balances)
+        if gateway is None:
+            process = Process(target=run_bot, args=args)
+        else:
+            slot = gateway.acquire_slot()
+            process = Process(
+                target=run_bot_process, args=(gateway, slot, run_bot, *args)
+            )
+            gateway.bind_slot(slot, process)
         process.start()
+        bots[config_id] = (process, market)
+
+    def stop_bot(config_id):
+        """
+        Stops a bot and waits for it to cancel its orders and exit, so a bot
+        started again with the same config_id never quotes along with it.
+        """
+        config_service.unregister(config_id)
+        if config_id not in bots:
+            return
+        process, market = bots.pop(config_id)
+        # Bots waiting for a requote are woken up by the market event
+        event = markets[market]["event"]
+        with event:
+            event.notify_all()
+        process.join(settings.BOT_STOP_TIMEOUT)
+        if process.is_alive():
+            logging.error(
+                f"Bot {config_id} did not stop in {settings.BOT_STOP_TIMEOUT} seconds. Terminating it, its orders may be left open"
+            )
+            process.terminate()
+            process.join()
+
+    for config_id, bot_config in config_service.robots.items():
+        start_bot(config_id, bot_config)
+
+    Thread(target=config_service.watch, daemon=True).start()
 
     try:
-        bots_processes[0].join()
+        while True:
+            action, config_id, bot_config = config_service.control.get()
+            if action == "add":
+                start_bot(config_id, bot_config)
+            elif action == "remove":
+                stop_bot(config_id)
     except KeyboardInterrupt:
 
+        # Terminate bots processes first so no order is placed meanwhile
+        for bot_process, _ in bots.values():
+            bot_process.terminate()
+
+        if gateway_process is not None:
+            gateway_process.terminate()
+
         # Close all open orders
         tauros.close_all_orders()
 
-        # Terminate bots processes
-        for bot_process in bots_processes:
-            bot_process.terminate()
+        # Terminate orderbook and external price processes
+        for processes in feed_processes.values():
+            for process in processes:
+                process.terminate()
+
+        if user_stream_process is not None:
+            user_stream_process.terminate()
 
-        # Terminate orderbook processes
-        for ob_process in ob_processes:
-            ob_process.terminate()
+        if recorder_process is not None:
+            recorder_process.terminate()
 
 
 if __name__ == "__main__":
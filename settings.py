@@ -38,3 +38,142 @@ PRICE_SOURCE_RULES = {
     "bch-mxn": BITSO,
     "btc-usdc": OKX,
 }
+
+# Venues combined into the reference price of a market. Sources with fx are
+# converted with the fx quote, e.g. BTC-USDC x USD-MXN for BTC-MXN. Markets
+# not listed use their PRICE_SOURCE_RULES venue only
+USD_MXN = {"venue": BITSO, "market": "usd-mxn"}
+
+REFERENCE_PRICE_SOURCES = {
+    "btc-mxn": [
+        {"venue": BITSO, "market": "btc-mxn"},
+        {"venue": OKX, "market": "btc-usdc", "fx": USD_MXN},
+    ],
+    "eth-mxn": [
+        {"venue": BITSO, "market": "eth-mxn"},
+        {"venue": OKX, "market": "eth-usdc", "fx": USD_MXN},
+    ],
+    "ltc-mxn": [
+        {"venue": BITSO, "market": "ltc-mxn"},
+        {"venue": OKX, "market": "ltc-usdc", "fx": USD_MXN},
+    ],
+}
+
+REFERENCE_PRICE_TTL = 1  # In seconds. Venue quotes are reused meanwhile
+
+REFERENCE_PRICE_TIMEOUT = 1.5  # In seconds. Slow venues are not waited longer
+
+REFERENCE_PRICE_MAX_AGE = 10  # In seconds. Older venue quotes are dropped
+
+REFERENCE_PRICE_MAX_DEVIATION = 0.5  # In percent from the median of the venues
+
+EXTERNAL_PRICE_REFRESH_RATE = 2  # In seconds
+
+EXTERNAL_PRICE_MAX_AGE = 30  # In seconds
+
+REQUOTE_THRESHOLD = 0.05  # In percent. Used by event driven bots
+
+SIGNALS_WINDOWS = (10, 60, 300)  # In seconds. Rolling windows of the book signals
+
+SIGNALS_MAX_RATE = 50  # Book updates per second kept by the signal windows
+
+SIGNALS_MAX_AGE = 60  # In seconds. Older signals are ignored
+
+# Pricing engine of bots with "strategy": "inventory"
+STRATEGY_REFRESH_RATE = 0.5  # In seconds
+
+STRATEGY_RISK_AVERSION = 50  # Reservation price skew per unit of inventory risk
+
+STRATEGY_HORIZON = 3600  # In seconds. Time the inventory is expected to be held
+
+STRATEGY_ORDER_INTENSITY = 50_000  # Higher values tighten the optimal spread
+
+STRATEGY_TARGET_INVENTORY = 0.5  # Share of the value held in the left coin
+
+STRATEGY_IMBALANCE_SKEW = 0.05  # In percent. Skew for a one-sided tauros book
+
+STRATEGY_IMBALANCE_LEVELS = 5  # Tauros book levels of the imbalance
+
+STRATEGY_VOLATILITY_HALF_LIFE = 300  # In seconds
+
+HTTP_POOL_SIZE = 10  # Connections kept alive per host
+
+HTTP_TIMEOUT = 10  # In seconds
+
+HTTP_RETRIES = 3
+
+HTTP_BACKOFF_FACTOR = 0.2  # In seconds
+
+ORDERBOOK_SIZE = 20
+
+# "process" runs every bot in its own process, "asyncio" runs all of them
+# as coroutines in a single event loop
+BOTS_RUNTIME = os.environ.get("BOTS_RUNTIME", "process")
+
+# Sends the requests of every bot process through a single order gateway
+# process with a global rate limit. Not used by the asyncio runtime
+GATEWAY_ENABLED = os.environ.get("GATEWAY_ENABLED") == "1"
+
+GATEWAY_RATE_LIMIT = 10  # Requests per second to tauros
+
+GATEWAY_BURST = 20  # Requests sent at once after being idle
+
+GATEWAY_SLOTS = 64  # Maximum number of bot processes
+
+GATEWAY_TIMEOUT = 60  # In seconds. Bots give up waiting for a reply
+
+GATEWAY_POLL_INTERVAL = 0.005  # In seconds, while requests wait for a token
+
+NONCE_RETRIES = 2  # Attempts made again when the exchange rejects a nonce
+
+NONCE_REJECTION_JUMP = 100  # In milliseconds. Nonces skipped after a rejection
+
+NONCE_MAX_LEAD = 5000  # In milliseconds. Farthest a rejection moves nonces ahead
+
+BALANCE_SYNC_INTERVAL = 30  # In seconds
+
+USER_STREAM_ENABLED = os.environ.get("USER_STREAM_ENABLED") == "1"
+
+USER_STREAM_CLOSED_ORDERS_TTL = 600  # In seconds. Closed orders kept for bots
+
+# Orderbook levels per side for specific markets, ORDERBOOK_SIZE otherwise
+ORDERBOOK_DEPTHS = {
+    "btc-mxn": 50,
+}
+
+BOOK_RESYNC_INTERVAL = 1  # In seconds. Failed orderbook resyncs are retried
+
+CONFIG_WATCH_INTERVAL = 2  # In seconds. robots.json is checked for changes
+
+BOT_STOP_TIMEOUT = 30  # In seconds. Removed bots still running are terminated
+
+CLOSE_ORDERS_WORKERS = 10  # Orders closed at the same time on start and shutdown
+
+CLOSE_TEMPLATES_SIZE = 1000  # Close requests of placed orders kept prepared
+
+# Fees in percent of the traded value used by backtests
+BACKTEST_MAKER_FEE = 0.1
+
+BACKTEST_TAKER_FEE = 0.25
+
+RECORDER_ENABLED = os.environ.get("RECORDER_ENABLED") == "1"
+
+RECORDINGS_DIR = os.environ.get("RECORDINGS_DIR", "./recordings")
+
+RECORDER_FLUSH_INTERVAL = 1  # In seconds
+
+RECORDER_ORDERS_INTERVAL = 0.5  # In seconds. Own orders are polled
+
+RECORDER_POLL_INTERVAL = 0.1  # In seconds. Used by the asyncio runtime
+
+# Override the tauros API and websocket urls, e.g. to use the local simulator
+TAUROS_API_URL = os.environ.get("TAUROS_API_URL")
+
+TAUROS_WS_URL = os.environ.get("TAUROS_WS_URL")
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED") == "1"
+
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 9100))
+
+# Address of the metrics endpoint. Set 0.0.0.0 to expose it to other hosts
+METRICS_ADDRESS = os.environ.get("METRICS_ADDRESS", "127.0.0.1")
@@ -0,0 +1,81 @@
+import numpy as np
+
+from trading_bot.backtest import Backtest, MarketHistory
+from trading_bot.shared_book import ASKS_A, ASKS_P, ASKS_V, BIDS_A, BIDS_P, BIDS_V
+
+DEPTH = 2
+
+
+def create_history(asks):
+    """
+    History of one book per second with a single ask, (price, amount) or
+    None, and a constant bid.
+    """
+    books = np.zeros((len(asks), 6 * DEPTH))
+    for index, ask in enumerate(asks):
+        if ask is not None:
+            price, amount = ask
+            books[index, ASKS_P * DEPTH] = price
+            books[index, ASKS_A * DEPTH] = amount
+            books[index, ASKS_V * DEPTH] = price * amount
+        books[index, BIDS_P * DEPTH] = 90.0
+        books[index, BIDS_A * DEPTH] = 1.0
+        books[index, BIDS_V * DEPTH] = 90.0
+    timestamps = np.arange(len(asks), dtype=float)
+    return MarketHistory(
+        timestamps,
+        books,
+        [int(ask is not None) for ask in asks],
+        [1] * len(asks),
+        timestamps,
+        [[90.0, 101.0]] * len(asks),
+        DEPTH,
+    )
+
+
+def get_filled(asks):
+    history = create_history(asks)
+    backtest = Backtest(
+        history,
+        [(0, {"side": "buy", "is_active": True})],
+        left_balance=0,
+        right_balance=1000,
+    )
+    bot = backtest.bots[0]
+    backtest._place(bot, 0.0, 100.0, 100.0)
+    backtest._match(bot, len(asks) - 1)
+    return round(sum(trade[4] for trade in backtest.trades), 8)
+
+
+def test_unchanged_level_fills_once():
+    asks = [(101.0, 1.0)] * 5 + [(99.5, 0.01)] * 5
+
+    assert get_filled(asks) == 0.01
+
+
+def test_level_fills_again_when_it_grows():
+    asks = [(101.0, 1.0)] * 5 + [(99.5, 0.01)] * 3 + [(99.5, 0.03)] * 2
+
+    assert get_filled(asks) == 0.03
+
+
+def test_level_fills_again_when_it_comes_back():
+    asks = [(101.0, 1.0)] * 5 + [(99.5, 0.01), None, (99.5, 0.01)]
+
+    assert get_filled(asks) == 0.02
+
+
+def test_taker_fill_is_not_repeated():
+    history = create_history([(99.5, 0.01)] * 10)
+    backtest = Backtest(
+        history,
+        [(0, {"side": "buy", "is_active": True})],
+        left_balance=0,
+        right_balance=1000,
+    )
+    bot = backtest.bots[0]
+    backtest._place(bot, 0.0, 100.0, 100.0)
+    backtest._match(bot, 9)
+
+    assert len(backtest.trades) == 1
+    assert round(backtest.trades[0][4], 8) == 0.01
@@ -0,0 +1,131 @@
+import copy
+import queue
+
+from trading_bot.config_service import ConfigService, apply_firebase_event
+
+
+def create_state():
+    return {
+        3: {
+            "market": "btc-mxn",
+            "side": "buy",
+            "spread": 1.5,
+            "refresh_rate": 0.1,
+            "is_active": True,
+            "levels": [
+                {"spread": 1.0, "order_value": 100},
+                {"spread": 2.0, "order_value": 200},
+            ],
+        }
+    }
+
+
+def test_nested_put_in_list():
+    state = create_state()
+    old_state = copy.deepcopy(state)
+
+    new_state = apply_firebase_event(
+        state, "put", {"path": "/3/levels/0/spread", "data": 1.2}
+    )
+
+    assert new_state[3]["levels"][0] == {"spread": 1.2, "order_value": 100}
+    assert state == old_state
+
+
+def test_nested_put_null_removes_key():
+    state = create_state()
+
+    new_state = apply_firebase_event(
+        state, "put", {"path": "/3/levels/1/order_value", "data": None}
+    )
+
+    assert new_state[3]["levels"][1] == {"spread": 2.0}
+    assert state[3]["levels"][1] == {"spread": 2.0, "order_value": 200}
+
+
+def test_put_appends_list_item():
+    new_state = apply_firebase_event(
+        create_state(),
+        "put",
+        {"path": "/3/levels/2", "data": {"spread": 3.0, "order_value": 300}},
+    )
+
+    assert [level["spread"] for level in new_state[3]["levels"]] == [1.0, 2.0, 3.0]
+
+
+def test_put_null_removes_last_list_item():
+    new_state = apply_firebase_event(
+        create_state(), "put", {"path": "/3/levels/1", "data": None}
+    )
+
+    assert new_state[3]["levels"] == [{"spread": 1.0, "order_value": 100}]
+
+
+def test_nested_patch_in_list():
+    state = create_state()
+    old_state = copy.deepcopy(state)
+
+    new_state = apply_firebase_event(
+        state, "patch", {"path": "/3/levels/1", "data": {"spread": 2.5}}
+    )
+
+    assert new_state[3]["levels"][1] == {"spread": 2.5, "order_value": 200}
+    assert state == old_state
+
+
+def test_patch_list_by_index():
+    new_state = apply_firebase_event(
+        create_state(),
+        "patch",
+        {"path": "/3/levels", "data": {"0": {"spread": 0.5, "order_value": 50}}},
+    )
+
+    assert new_state[3]["levels"][0] == {"spread": 0.5, "order_value": 50}
+    assert new_state[3]["levels"][1] == {"spread": 2.0, "order_value": 200}
+
+
+def test_patch_creates_missing_path():
+    new_state = apply_firebase_event(
+        create_state(), "patch", {"path": "/3/extra", "data": {"key": 1}}
+    )
+
+    assert new_state[3]["extra"] == {"key": 1}
+
+
+def test_put_and_patch_bot():
+    state = create_state()
+
+    new_state = apply_firebase_event(
+        state, "patch", {"path": "/3", "data": {"spread": 2}}
+    )
+    assert new_state[3]["spread"] == 2
+
+    new_state = apply_firebase_event(new_state, "put", {"path": "/3", "data": None})
+    assert new_state == {}
+    assert 3 in state
+
+
+def test_root_patch_removes_null_bots():
+    new_state = apply_firebase_event(
+        create_state(),
+        "patch",
+        {"path": "/", "data": {"3": None, "4": {"market": "btc-mxn"}}},
+    )
+
+    assert new_state == {4: {"market": "btc-mxn"}}
+
+
+def test_nested_change_is_dispatched():
+    state = create_state()
+    service = ConfigService(list(state.items()), remote=True)
+    updates = queue.Queue()
+    service.register(3, updates)
+
+    new_state = apply_firebase_event(
+        state, "put", {"path": "/3/levels/0/spread", "data": 1.2}
+    )
+    service.reload(new_state)
+
+    delta = updates.get_nowait()
+    assert delta["levels"][0]["spread"] == 1.2
+    assert service.robots[3]["levels"][0]["spread"] == 1.2
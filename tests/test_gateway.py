@@ -0,0 +1,92 @@
+import itertools
+import queue
+import threading
+import time
+
+from trading_bot.gateway import OrderGateway
+
+
+class FakeClient:
+    def __init__(self):
+        self.orders = []
+
+    def place_order(self, order):
+        self.orders.append(order)
+        return {"success": True, "data": order}
+
+    def close_order(self, order_id):
+        return {"success": True, "data": order_id}
+
+
+def test_expired_order_is_not_placed():
+    client = FakeClient()
+    gateway = OrderGateway(client, slots=1)
+    order = {"market": "BTC-MXN", "side": "BUY"}
+
+    gateway._execute((0, (1, 0), "place_order", {"order": order}, time.time() - 1))
+    request_id, response = gateway.replies[0].get(timeout=1)
+
+    assert request_id == (1, 0)
+    assert not response["success"]
+    assert client.orders == []
+
+
+def test_order_is_placed_before_deadline():
+    client = FakeClient()
+    gateway = OrderGateway(client, slots=1)
+    order = {"market": "BTC-MXN", "side": "BUY"}
+
+    gateway._execute((0, (1, 0), "place_order", {"order": order}, time.time() + 60))
+    _, response = gateway.replies[0].get(timeout=1)
+
+    assert response["success"]
+    assert client.orders == [order]
+
+
+def test_expired_close_is_sent():
+    gateway = OrderGateway(FakeClient(), slots=1)
+
+    gateway._execute((0, (1, 0), "close_order", {"order_id": 5}, time.time() - 1))
+    _, response = gateway.replies[0].get(timeout=1)
+
+    assert response == {"success": True, "data": 5}
+
+
+class RecordingClient(FakeClient):
+    def __init__(self):
+        super().__init__()
+        self.nonces = itertools.count()
+        self.calls = []
+        self.in_flight = 0
+
+    def _send(self, kind):
+        self.in_flight += 1
+        assert self.in_flight == 1
+        time.sleep(0.01)
+        self.calls.append((next(self.nonces), kind))
+        self.in_flight -= 1
+
+    def place_order(self, order):
+        self._send("place_order")
+        return super().place_order(order)
+
+    def close_order(self, order_id):
+        self._send("close_order")
+        return super().close_order(order_id)
+
+
+def test_requests_are_sent_one_at_a_time_by_priority():
+    client = RecordingClient()
+    gateway = OrderGateway(client, slots=1, rate=1000, burst=1000)
+    gateway.requests = queue.Queue()
+    deadline = time.time() + 60
+    for n in range(3):
+        order = {"order": {"side": "BUY"}}
+        gateway.requests.put((0, (1, n), "place_order", order, deadline))
+    gateway.requests.put((0, (1, 3), "close_order", {"order_id": 5}, deadline))
+    threading.Thread(target=gateway.connect, daemon=True).start()
+
+    replies = [gateway.replies[0].get(timeout=5) for _ in range(4)]
+
+    assert len(replies) == 4
+    assert [kind for _, kind in client.calls][0] == "close_order"
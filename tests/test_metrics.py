@@ -0,0 +1,21 @@
+from trading_bot.metrics import Metrics, start_server
+
+
+def test_render_counts_every_series():
+    registry = Metrics()
+    registry.inc("ws_messages", "BTC-MXN", amount=3)
+    registry.observe("cycle", 0.02)
+
+    body = registry.render()
+
+    assert 'tauros_bot_ws_messages_total{market="BTC-MXN"} 3' in body
+    assert 'tauros_bot_stage_seconds_bucket{stage="cycle",le="0.025"} 1' in body
+    assert 'tauros_bot_stage_seconds_count{stage="cycle"} 1' in body
+
+
+def test_server_listens_on_localhost():
+    server = start_server(port=19100)
+    try:
+        assert server.server_address[0] == "127.0.0.1"
+    finally:
+        server.shutdown()
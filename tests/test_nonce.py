@@ -0,0 +1,24 @@
+import time
+
+from trading_bot.nonce import NonceGenerator
+
+
+def test_nonces_increase():
+    nonce_generator = NonceGenerator()
+    nonces = [int(nonce_generator.get_nonce()) for _ in range(100)]
+
+    assert nonces == sorted(set(nonces))
+
+
+def test_rejections_stay_close_to_the_clock(monkeypatch):
+    monkeypatch.setattr("settings.NONCE_REJECTION_JUMP", 100)
+    monkeypatch.setattr("settings.NONCE_MAX_LEAD", 5000)
+    nonce_generator = NonceGenerator()
+
+    nonce = nonce_generator.get_nonce()
+    nonce_generator.reject(nonce)
+    assert int(nonce_generator.get_nonce()) > int(nonce) + 100
+
+    for _ in range(1000):
+        nonce_generator.reject(nonce)
+    assert int(nonce_generator.get_nonce()) <= 1000 * time.time() + 5001
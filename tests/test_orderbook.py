@@ -0,0 +1,75 @@
+import json
+
+from trading_bot.shared_book import SharedBook
+from trading_bot.tauros_api import OrderBook
+
+
+class FakePublic:
+    def __init__(self, responses):
+        self.responses = responses
+
+    def get_order_book(self, market):
+        return self.responses.pop(0)
+
+
+def create_frame(sequence, price=800000, type="update"):
+    level = {"p": price, "a": 1, "v": price}
+    return json.dumps(
+        {"type": type, "sequence": sequence, "data": {"asks": [level], "bids": []}}
+    )
+
+
+def create_payload(price=800000, **kwargs):
+    level = {"price": price, "amount": 1, "value": price}
+    return {"success": True, "payload": {"asks": [level], "bids": [], **kwargs}}
+
+
+def create_orderbook(responses):
+    orderbook = OrderBook("btc-mxn", SharedBook(depth=5, shared=False))
+    orderbook.tauros_public = FakePublic(responses)
+    return orderbook
+
+
+def get_asks(orderbook):
+    return orderbook.orderbook.snapshot().asks_p.tolist()
+
+
+def test_failed_resync_marks_book_stale(monkeypatch):
+    monkeypatch.setattr("settings.BOOK_RESYNC_INTERVAL", 0)
+    orderbook = create_orderbook(
+        [{"success": False}, create_payload(price=801000, sequence=5)]
+    )
+    orderbook.on_message(None, create_frame(1, type="snapshot"))
+    assert get_asks(orderbook) == [800000]
+
+    orderbook.on_message(None, create_frame(3, price=802000))
+    assert orderbook.stale
+    assert get_asks(orderbook) == []
+
+    orderbook.on_message(None, create_frame(4, price=803000))
+    assert not orderbook.stale
+    assert get_asks(orderbook) == [801000]
+
+    orderbook.on_message(None, create_frame(6, price=804000))
+    assert get_asks(orderbook) == [801000, 804000]
+
+
+def test_stale_book_retries_after_interval(monkeypatch):
+    monkeypatch.setattr("settings.BOOK_RESYNC_INTERVAL", 60)
+    orderbook = create_orderbook([{"success": False}, create_payload()])
+    orderbook.on_message(None, create_frame(1, type="snapshot"))
+    orderbook.on_message(None, create_frame(3))
+    orderbook.on_message(None, create_frame(4))
+
+    assert orderbook.stale
+    assert len(orderbook.tauros_public.responses) == 1
+
+
+def test_resync_without_sequence_uses_frame_sequence():
+    orderbook = create_orderbook([create_payload(price=801000)])
+    orderbook.on_message(None, create_frame(1, type="snapshot"))
+    orderbook.on_message(None, create_frame(3, price=802000))
+
+    assert orderbook.engine.sequence == 3
+    orderbook.on_message(None, create_frame(4, price=803000))
+    assert get_asks(orderbook) == [801000, 803000]
@@ -0,0 +1,26 @@
+import time
+
+from trading_bot import price_feed, reference_price
+
+
+def test_update_time_moves_with_a_reused_source(monkeypatch):
+    received_at = time.time() - 5
+    quotes = iter(
+        [
+            reference_price.Quote(99.0, 101.0, 1.0, received_at),
+            reference_price.Quote(99.5, 101.5, 1.0, received_at),
+        ]
+    )
+    monkeypatch.setattr(reference_price, "get_quote", lambda market: next(quotes))
+    price = price_feed.create_price_array()
+    feed = price_feed.PriceFeed("btc-mxn", price)
+
+    feed.update()
+    published_at = price[price_feed.TIMESTAMP]
+    time.sleep(0.01)
+    feed.update()
+
+    assert price[price_feed.TIMESTAMP] > published_at
+    assert price[price_feed.SOURCE_TIMESTAMP] == received_at
+    assert price_feed.get_price(price, ask=True, max_age=10) == 101.5
+    assert price_feed.get_price(price, ask=True, max_age=1) is None
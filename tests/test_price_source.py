@@ -0,0 +1,56 @@
+from decimal import Decimal
+
+from trading_bot.book_query import BookQuery
+from trading_bot.price_source import get_ladder_prices
+
+LEVELS = [
+    {"spread": 1.0, "order_value": 100},
+    {"spread": 2.0, "order_value": 100},
+    {"spread": 3.0, "order_value": 100},
+]
+
+
+def create_book(bid, ask):
+    def create_levels(price, step):
+        return [
+            {"price": price + step * index, "amount": 1.0, "value": price}
+            for index in range(2)
+        ]
+
+    return BookQuery.from_orderbook(
+        {"asks": create_levels(ask, 100), "bids": create_levels(bid, -100)}
+    )
+
+
+def test_buy_ladder_never_inverts():
+    # Tauros best bid far below the external price
+    book = create_book(bid=700_000.0, ask=900_000.0)
+
+    prices = get_ladder_prices(
+        side="buy", book=book, external_price=Decimal("800000"), levels=LEVELS
+    )
+
+    assert prices == sorted(prices, reverse=True)
+    assert prices[0] == Decimal("700001")
+
+
+def test_sell_ladder_never_inverts():
+    # Tauros best ask far above the external price
+    book = create_book(bid=700_000.0, ask=900_000.0)
+
+    prices = get_ladder_prices(
+        side="sell", book=book, external_price=Decimal("800000"), levels=LEVELS
+    )
+
+    assert prices == sorted(prices)
+    assert prices[0] == Decimal("899999")
+
+
+def test_deeper_levels_keep_their_spread():
+    book = create_book(bid=799_900.0, ask=800_100.0)
+
+    prices = get_ladder_prices(
+        side="buy", book=book, external_price=Decimal("800000"), levels=LEVELS
+    )
+
+    assert [round(price) for price in prices[1:]] == [784_000, 776_000]
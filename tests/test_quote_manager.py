@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+from trading_bot.quote_manager import QuoteManager
+from trading_bot.tauros_api import OrderStore
+
+
+def create_quotes():
+    quotes = QuoteManager(None, "btc-mxn", "buy")
+    quotes.order_id = 1
+    quotes.order_price = Decimal(800000)
+    quotes.order_amount = Decimal(1000)
+    quotes.locked_balance = Decimal(1000)
+    return quotes
+
+
+def test_partial_fill_shrinks_live_order():
+    quotes = create_quotes()
+    orders = OrderStore({})
+    orders.put({"id": 1, "status": "OPEN", "amount": "0.01", "filled": "0.002"})
+
+    assert quotes.is_hit(orders)
+    assert quotes.sync(orders)
+    assert quotes.locked_balance == Decimal(800)
+    assert quotes.order_amount == Decimal(800)
+    assert not quotes.is_hit(orders)
+
+    orders.put({"id": 1, "status": "OPEN", "amount": "0.01", "filled": "0.006"})
+    assert quotes.sync(orders)
+    assert quotes.locked_balance == Decimal(400)
+    assert quotes.order_id == 1
+
+
+def test_closed_order_is_forgotten():
+    quotes = create_quotes()
+    orders = OrderStore({})
+    orders.put({"id": 1, "status": "FILLED", "amount": "0.01", "filled": "0.01"})
+
+    assert quotes.is_hit(orders)
+    assert quotes.sync(orders)
+    assert quotes.order_id is None
+    assert quotes.locked_balance == 0
+
+
+def test_closed_orders_are_pruned():
+    orders = OrderStore({}, ttl=60)
+    orders.put({"id": 1, "status": "CANCELLED"})
+    orders.put({"id": 2, "status": "OPEN"})
+    orders.closed[0] = (orders.closed[0][0] - 120, 1)
+    orders.put({"id": 3, "status": "OPEN"})
+
+    assert orders.get(1) is None
+    assert orders.get(2) == {"id": 2, "status": "OPEN"}
+
+
+def test_order_without_status_is_kept():
+    orders = OrderStore({})
+    orders.put({"id": 1, "status": None})
+
+    assert orders.get(1) == {"id": 1, "status": None}
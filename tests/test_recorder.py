@@ -0,0 +1,42 @@
+import json
+
+import numpy as np
+
+from trading_bot.recorder import BOOKS, BookRecorder, ColumnWriter, RecordingReader
+from trading_bot.shared_book import BLOCKS, SharedBook
+from trading_bot.tauros_api import OrderBook
+
+
+def create_frame(sequence, price):
+    level = {"p": price, "a": 1, "v": price}
+    return json.dumps(
+        {"type": "update", "sequence": sequence, "data": {"asks": [level], "bids": []}}
+    )
+
+
+def test_every_book_update_is_recorded(tmp_path):
+    book = SharedBook(depth=5, shared=False)
+    recorder = BookRecorder("btc-mxn", book.depth, directory=str(tmp_path))
+    orderbook = OrderBook("btc-mxn", book, recorder=recorder)
+
+    for sequence in range(1, 101):
+        orderbook.on_message(None, create_frame(sequence, 800000 + sequence))
+    recorder.books.flush()
+
+    reader = RecordingReader("btc-mxn", directory=str(tmp_path))
+    books = reader.read_days(BOOKS)
+    assert len(books["timestamp"]) == 100
+    assert books["asks_depth"][-1] == 5
+    assert books["levels"][-1][:5].tolist() == [800001, 800002, 800003, 800004, 800005]
+
+
+def test_depth_change_starts_a_new_segment(tmp_path):
+    for depth in (5, 3, 3):
+        writer = ColumnWriter("btc-mxn", BOOKS, depth, directory=str(tmp_path))
+        writer.append(86400.0, 1, 1, np.arange(BLOCKS * depth))
+        writer.close()
+
+    reader = RecordingReader("btc-mxn", directory=str(tmp_path))
+    assert reader.get_days() == ["1970-01-02", "1970-01-02.1"]
+    assert reader.read(BOOKS, "1970-01-02")["levels"].shape == (1, BLOCKS * 5)
+    assert reader.read(BOOKS, "1970-01-02.1")["levels"].shape == (2, BLOCKS * 3)
@@ -0,0 +1,30 @@
+from trading_bot.signals import BookSignals, create_signals_array, get_signals
+
+ASKS = [(801000, 1, 801000)]
+BIDS = [(799000, 1, 799000)]
+
+
+def push_updates(book_signals, rate, seconds):
+    for index in range(int(rate * seconds)):
+        book_signals.update(ASKS, BIDS, timestamp=1000 + index / rate)
+
+
+def test_window_keeps_every_update_below_max_rate():
+    raw_signals = create_signals_array(windows=(300,))
+    book_signals = BookSignals(raw_signals, windows=(300,), max_rate=20)
+    push_updates(book_signals, rate=20, seconds=300)
+
+    window = book_signals.windows[0]
+    assert window.capacity == 6000
+    assert window.size == 6000
+    assert window.get_span(1300) == 300
+
+
+def test_span_is_shorter_above_max_rate():
+    raw_signals = create_signals_array(windows=(10,))
+    book_signals = BookSignals(raw_signals, windows=(10,), max_rate=10)
+    push_updates(book_signals, rate=20, seconds=10)
+
+    signals = get_signals(raw_signals, windows=(10,), max_age=float("inf"))
+    assert signals["updates"] == 100
+    assert round(signals["span"], 2) == 4.95
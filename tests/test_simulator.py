@@ -0,0 +1,40 @@
+import base64
+
+from trading_bot.simulator import Simulator
+from trading_bot.tauros_api import TaurosPrivate
+
+KEY = "key"
+SECRET = base64.b64encode(b"secret").decode()
+
+
+def create_simulator():
+    return Simulator({KEY: SECRET}, {"btc-mxn": 800000}, {"btc": 1, "mxn": 1000})
+
+
+def test_signature_is_checked_over_the_bytes_received():
+    simulator = create_simulator()
+    client = TaurosPrivate(key=KEY, secret=SECRET)
+    prepared = client.prepare("/api/v1/trading/placeorder/", {"price": "1.10"})
+    signature = client._get_headers(prepared, 1)["Taur-Signature"]
+
+    error = simulator._authenticate(
+        KEY, signature, "1", prepared.path, prepared.body, "post"
+    )
+    assert error is None
+
+    # Same JSON, other bytes
+    error = simulator._authenticate(
+        KEY, signature, "2", prepared.path, b'{"price": "1.10"}', "post"
+    )
+    assert error == "Invalid signature"
+
+
+def test_reaction_times_are_bounded(monkeypatch):
+    monkeypatch.setattr("trading_bot.simulator.REACTION_TIMES_SIZE", 3)
+    simulator = create_simulator()
+    order = {"market": "btc-mxn", "side": "buy", "price": "1", "amount": "0.1"}
+    for _ in range(5):
+        simulator._place_order(KEY, order, {})
+
+    assert simulator.orders == 5
+    assert len(simulator.reaction_times) == 3
@@ -0,0 +1,19 @@
+import threading
+import time
+
+from trading_bot.strategy import InventoryStrategy
+
+
+def test_engine_wakes_up_on_market_event():
+    event = threading.Condition()
+    engine = InventoryStrategy("btc-mxn", {"event": event}, None, refresh_rate=60)
+    updates = threading.Semaphore(0)
+    engine.update = updates.release
+    threading.Thread(target=engine.connect, daemon=True).start()
+    assert updates.acquire(timeout=5)
+
+    deadline = time.time() + 5
+    while not updates.acquire(timeout=0.05):
+        assert time.time() < deadline
+        with event:
+            event.notify_all()
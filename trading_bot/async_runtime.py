@@ -0,0 +1,468 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+
+import settings
+from trading_bot import (
+    bot_cycle,
+    metrics,
+    notifications,
+    price_feed,
+    price_source,
+    signals,
+    strategy,
+)
+from trading_bot.balance_cache import BalanceCache
+from trading_bot.book_engine import get_orderbook_depth
+from trading_bot.config_service import apply_updates
+from trading_bot.quote_manager import AsyncLadderManager, AsyncQuoteManager
+from trading_bot.recorder import BookRecorder, Recorder
+from trading_bot.shared_book import SharedBook
+from trading_bot.tauros_api import (
+    AsyncTaurosPrivate,
+    OrderBook,
+    OrderStore,
+    UserStream,
+)
+
+
+class MarketEvent:
+    """
+    Replacement of multiprocessing.Condition for in-process feeds. OrderBook
+    and PriceFeed threads notify it as usual and coroutines waiting in the
+    event loop are woken up.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.waiters = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def notify_all(self):
+        try:
+            self.loop.call_soon_threadsafe(self._wake_up)
+        except RuntimeError:
+            # Event loop already closed
+            pass
+
+    def _wake_up(self):
+        for waiter in self.waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self.waiters.clear()
+
+    async def wait(self, timeout=None):
+        waiter = self.loop.create_future()
+        self.waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.waiters.discard(waiter)
+
+
+class AsyncBotUpdates:
+    """
+    Updates queue of a bot coroutine. Deltas and STOP are put by the config
+    watcher thread and wake the bot up if it is sleeping on wait.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = queue.Queue()
+        self.event = asyncio.Event()
+
+    def put(self, item):
+        self.queue.put(item)
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    def get_nowait(self):
+        return self.queue.get_nowait()
+
+    def poll(self):
+        return not self.queue.empty()
+
+    async def wait(self, timeout):
+        """
+        Sleeps up to timeout seconds. Returns True if an update arrived.
+        """
+        if self.poll():
+            return True
+        self.event.clear()
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+def create_market_data(loop, market, orders=None):
+    """
+    In-process version of main.create_market_data.
+    """
+    return {
+        "orderbook": SharedBook(depth=get_orderbook_depth(market), shared=False),
+        "price": price_feed.create_price_array(),
+        "quote": strategy.create_quote_array(),
+        "signals": signals.create_signals_array(),
+        "event": MarketEvent(loop),
+        "orders": orders,
+    }
+
+
+def start_feeds(market, market_data, balances):
+    """
+    Runs the orderbook websocket, the external price feed and the pricing
+    engine of a market in daemon threads of the current process.
+    """
+    orderbook_obj = OrderBook(
+        market=market,
+        orderbook=market_data["orderbook"],
+        event=market_data["event"],
+        signals=signals.BookSignals(market_data["signals"]),
+        recorder=(
+            BookRecorder(market, market_data["orderbook"].depth)
+            if settings.RECORDER_ENABLED
+            else None
+        ),
+    )
+    feed = price_feed.PriceFeed(
+        market=market, price=market_data["price"], event=market_data["event"]
+    )
+    engine = strategy.InventoryStrategy(
+        market=market, market_data=market_data, balances=balances
+    )
+    for target in (orderbook_obj.connect, feed.connect, engine.connect):
+        threading.Thread(target=target, daemon=True).start()
+
+
+async def notify_not_enough_balance(
+    client, left_coin_balance=None, right_coin_balance=None
+):
+    if right_coin_balance is None:
+        right_coin_wallet = await client.get_wallet("mxn")
+        right_coin_balance = right_coin_wallet["data"]["balances"]["available"]
+
+    if left_coin_balance is None:
+        left_coin_wallet = await client.get_wallet("btc")
+        left_coin_balance = left_coin_wallet["data"]["balances"]["available"]
+
+    await asyncio.get_running_loop().run_in_executor(
+        None,
+        lambda: notifications.send_funds_status_email(
+            left_coin_balance=left_coin_balance,
+            right_coin_balance=right_coin_balance,
+            market="BTC-MXN",
+        ),
+    )
+
+
+async def get_available_balance(client, balances, coin):
+    """
+    Coroutine version of main.get_available_balance.
+    """
+    if balances.claim_sync(coin):
+        bot_cycle.set_wallet_balance(balances, coin, await client.get_wallet(coin))
+    return bot_cycle.get_synced_balance(balances, coin)
+
+
+async def wait_for_requote(
+    side, config, market_data, updates, order_price, max_age, quotes=None
+):
+    """
+    Coroutine version of main.wait_for_requote.
+    """
+    deadline = time.time() + max_age
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            logging.info(f"{config['market']} {side.upper()} order reached its max age")
+            return
+
+        await market_data["event"].wait(timeout=remaining)
+
+        if updates.poll():
+            return
+        if bot_cycle.is_requote_due(side, config, market_data, order_price, quotes):
+            return
+
+
+async def run_ladder_cycle(
+    ladder, side, config, client, book, market_data, balances, updates, cycle_start
+):
+    """
+    Coroutine version of main.run_ladder_cycle.
+    """
+    market = config["market"]
+    levels = bot_cycle.get_ladder_levels(config, market_data)
+    time_to_sleep = bot_cycle.get_time_to_sleep(config)
+    prices = bot_cycle.get_ladder_prices(side, config, market_data, levels, book)
+    if not prices:
+        await ladder.cancel()
+        await updates.wait(bot_cycle.TRY_AGAIN_IN)
+        return
+
+    available_balance = await get_available_balance(
+        client, balances, bot_cycle.get_coin(market, side)
+    )
+    if available_balance is None:
+        await updates.wait(bot_cycle.TRY_AGAIN_IN)
+        return
+
+    orders = price_source.get_ladder_orders(
+        market=market,
+        side=side,
+        prices=prices,
+        levels=levels,
+        max_balance=ladder.get_spendable_balance(available_balance),
+    )
+    responses = await ladder.update(
+        orders=orders,
+        available_balance=available_balance,
+        threshold=config.get("requote_threshold"),
+    )
+    metrics.observe("cycle", time.perf_counter() - cycle_start)
+    bot_cycle.log_ladder_responses(market, side, responses, orders)
+
+    if config.get("event_driven"):
+        await wait_for_requote(
+            side=side,
+            config={**config, "spread": config["levels"][0]["spread"]},
+            market_data=market_data,
+            updates=updates,
+            order_price=prices[0],
+            max_age=time_to_sleep,
+            quotes=ladder,
+        )
+    else:
+        logging.info(f"Sleeping {time_to_sleep} seconds")
+        await updates.wait(time_to_sleep)
+
+
+async def run_bot(config_id, config, updates, client, market_data, balances):
+    """
+    Coroutine version of main.run_bot.
+    """
+    side = config["side"]
+    quotes = AsyncQuoteManager(
+        client=client, market=config["market"], side=side, balances=balances
+    )
+    ladder = AsyncLadderManager(
+        client=client, market=config["market"], side=side, balances=balances
+    )
+    while True:
+        cycle_start = time.perf_counter()
+        with metrics.timer("config"):
+            config = apply_updates(config, updates)
+        if config is None:
+            logging.info(f"Bot {config_id} stopped")
+            await quotes.cancel()
+            await ladder.cancel()
+            return
+        market = config["market"]
+        time_to_sleep = bot_cycle.get_time_to_sleep(config)
+        book = bot_cycle.read_book(market_data)
+        quotes.sync(market_data["orders"])
+        ladder.sync(market_data["orders"])
+
+        if not config.get("is_active"):
+            logging.info(
+                f"{market} {side.upper()} bot is not active. Sleeping {time_to_sleep} seconds"
+            )
+            await quotes.cancel()
+            await ladder.cancel()
+            await updates.wait(time_to_sleep)
+            continue
+
+        if config.get("levels"):
+            await quotes.cancel()
+            await run_ladder_cycle(
+                ladder=ladder,
+                side=side,
+                config=config,
+                client=client,
+                book=book,
+                market_data=market_data,
+                balances=balances,
+                updates=updates,
+                cycle_start=cycle_start,
+            )
+            continue
+        await ladder.cancel()
+
+        order_price, tauros_price, external_price = bot_cycle.get_order_price(
+            side, config, market_data, book
+        )
+        if not order_price:
+            await quotes.cancel()
+            await updates.wait(bot_cycle.TRY_AGAIN_IN)
+            continue
+
+        coin = bot_cycle.get_coin(market, side)
+        available_balance = await get_available_balance(client, balances, coin)
+        if available_balance is None:
+            await updates.wait(bot_cycle.TRY_AGAIN_IN)
+            continue
+
+        coin_balance = quotes.get_spendable_balance(available_balance)
+        if coin_balance == 0:
+            logging.error(
+                f"{coin} wallet is empty. Imposible to place a {side} order. Sending email . . ."
+            )
+            if side == "buy":
+                await notify_not_enough_balance(client, right_coin_balance=0)
+            else:
+                await notify_not_enough_balance(client, left_coin_balance=0)
+            await updates.wait(settings.NOT_FUNDS_AWAITING_TIME * 60)
+            continue
+
+        order = bot_cycle.create_order(
+            market, side, order_price, max_balance=coin_balance, config=config
+        )
+        order_placed = await quotes.replace(
+            order=order, available_balance=available_balance
+        )
+        metrics.observe("cycle", time.perf_counter() - cycle_start)
+
+        if not bot_cycle.log_order_placed(
+            market, side, order_placed, tauros_price, external_price
+        ):
+            if bot_cycle.is_not_funds_error(order_placed, coin):
+                await quotes.cancel()
+                await notify_not_enough_balance(client)
+                logging.error("Not enough funds email sent...")
+                await updates.wait(settings.NOT_FUNDS_AWAITING_TIME * 60)
+            continue
+
+        if config.get("event_driven"):
+            await wait_for_requote(
+                side=side,
+                config=config,
+                market_data=market_data,
+                updates=updates,
+                order_price=order_price,
+                max_age=time_to_sleep,
+                quotes=quotes,
+            )
+        else:
+            logging.info(f"Sleeping {time_to_sleep} seconds")
+            await updates.wait(time_to_sleep)
+
+
+async def run_bots(config_service, prod=True, nonce_generator=None):
+    loop = asyncio.get_running_loop()
+    client = AsyncTaurosPrivate(
+        key=settings.TAUR_API_KEY,
+        secret=settings.TAUR_API_SECRET,
+        prod=prod,
+        nonce_generator=nonce_generator,
+    )
+    # Bots can be added at runtime, so data is created for every supported
+    # market. Feeds only run for markets with bots.
+    orders = OrderStore({}) if settings.USER_STREAM_ENABLED else None
+    coins = set()
+    markets = {}
+    for market in settings.PRICE_SOURCE_RULES:
+        coins.update(market.split("-"))
+        markets[market.upper()] = create_market_data(loop, market, orders=orders)
+    balances = BalanceCache(coins)
+
+    if settings.METRICS_ENABLED:
+        metrics.start_server(markets)
+
+    started_markets = set()
+    for _, bot_config in config_service.robots.items():
+        market = bot_config["market"].upper()
+        if market not in started_markets:
+            start_feeds(market, markets[market], balances)
+            started_markets.add(market)
+
+    if settings.USER_STREAM_ENABLED:
+        user_stream = UserStream(
+            client=client,
+            orders=orders,
+            balances=balances,
+            events={market: data["event"] for market, data in markets.items()},
+            prod=prod,
+        )
+        threading.Thread(target=user_stream.connect, daemon=True).start()
+
+    if settings.RECORDER_ENABLED:
+        recorder = Recorder(
+            markets=markets,
+            orders=orders,
+            poll_interval=settings.RECORDER_POLL_INTERVAL,
+        )
+        threading.Thread(target=recorder.connect, daemon=True).start()
+
+    # Awaiting to receive websocket stream and external prices
+    await asyncio.sleep(3)
+
+    # Task and market of every running bot by config_id
+    bots = {}
+
+    def start_bot(config_id, bot_config):
+        market = bot_config["market"].upper()
+        if market not in started_markets:
+            start_feeds(market, markets[market], balances)
+            started_markets.add(market)
+        updates = AsyncBotUpdates(loop)
+        config_service.register(config_id, updates)
+        task = loop.create_task(
+            run_bot(config_id, bot_config, updates, client, markets[market], balances)
+        )
+        bots[config_id] = (task, market)
+
+    async def stop_bot(config_id):
+        """
+        Coroutine version of the stop_bot of main.main.
+        """
+        config_service.unregister(config_id)
+        if config_id not in bots:
+            return
+        task, market = bots.pop(config_id)
+        markets[market]["event"].notify_all()
+        await asyncio.wait({task}, timeout=settings.BOT_STOP_TIMEOUT)
+        if not task.done():
+            logging.error(
+                f"Bot {config_id} did not stop in {settings.BOT_STOP_TIMEOUT} seconds. Cancelling it, its orders may be left open"
+            )
+            task.cancel()
+
+    for config_id, bot_config in config_service.robots.items():
+        start_bot(config_id, bot_config)
+
+    threading.Thread(target=config_service.watch, daemon=True).start()
+
+    try:
+        while True:
+            try:
+                action, config_id, bot_config = config_service.control.get_nowait()
+            except queue.Empty:
+                await asyncio.sleep(1)
+                continue
+            if action == "add":
+                start_bot(config_id, bot_config)
+            elif action == "remove":
+                await stop_bot(config_id)
+    finally:
+        for task, _ in bots.values():
+            task.cancel()
+        await client.close()
+
+
+def run(config_service, prod=True, nonce_generator=None):
+    """
+    Runs every bot as a coroutine of a single event loop. Bots share one
+    aiohttp session and the orderbooks and external prices are kept in
+    memory of the current process.
+    """
+    asyncio.run(run_bots(config_service, prod=prod, nonce_generator=nonce_generator))
@@ -0,0 +1,549 @@
+import argparse
+import heapq
+import json
+import logging
+from decimal import Decimal
+
+import numpy as np
+
+import settings
+from trading_bot import price_source
+from trading_bot.book_query import BookQuery
+from trading_bot.recorder import BOOKS, PRICES, RecordingReader
+from trading_bot.shared_book import (
+    ASKS_A,
+    ASKS_P,
+    ASKS_V,
+    BIDS_A,
+    BIDS_P,
+    BIDS_V,
+    BLOCKS,
+)
+
+# External price columns
+BID = 0
+ASK = 1
+
+# Seconds a bot waits after a failed price query, like the live bots
+PRICE_RETRY_TIME = 3
+
+
+class MarketHistory:
+    """
+    Recorded market data in columnar arrays.
+
+    Tauros books are rows of price, amount and value blocks for asks and
+    bids, depth long each (the SharedBook layout without its header), with
+    the number of levels per side in asks_depth and bids_depth. External
+    prices are rows of [bid, ask]. Both streams are sorted by timestamp.
+    """
+
+    def __init__(
+        self,
+        book_timestamps,
+        books,
+        asks_depth,
+        bids_depth,
+        price_timestamps,
+        prices,
+        depth,
+    ):
+        self.book_timestamps = np.asarray(book_timestamps, dtype=np.float64)
+        self.books = np.asarray(books, dtype=np.float64)
+        self.asks_depth = np.asarray(asks_depth, dtype=np.int64)
+        self.bids_depth = np.asarray(bids_depth, dtype=np.int64)
+        self.price_timestamps = np.asarray(price_timestamps, dtype=np.float64)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.depth = depth
+
+        # Best prices with any value, used to match our orders
+        has_asks = self.asks_depth > 0
+        has_bids = self.bids_depth > 0
+        self.best_asks = np.where(has_asks, self._column(ASKS_P, 0), np.inf)
+        self.best_bids = np.where(has_bids, self._column(BIDS_P, 0), 0.0)
+
+    @classmethod
+    def from_recording(cls, market, days=None, directory=None):
+        """
+        History of a market from the recorder files of the given days,
+        every recorded day if days is None.
+        """
+        reader = RecordingReader(market, directory=directory)
+        books = reader.read_days(BOOKS, days)
+        prices = reader.read_days(PRICES, days)
+        if books is None or prices is None:
+            raise ValueError(f"No {market} recordings found for days {days}")
+        return cls(
+            books["timestamp"],
+            books["levels"],
+            books["asks_depth"],
+            books["bids_depth"],
+            prices["timestamp"],
+            np.column_stack((prices["bid"], prices["ask"])),
+            books["levels"].shape[1] // BLOCKS,
+        )
+
+    def _column(self, block, level):
+        return self.books[:, block * self.depth + level]
+
+    def _block(self, index, block, size):
+        start = block * self.depth
+        return self.books[index, start : start + size]
+
+    def get_book(self, index):
+        """
+        BookQuery over the book at index, without copying its levels.
+        """
+        asks, bids = self.asks_depth[index], self.bids_depth[index]
+        return BookQuery(
+            self._block(index, ASKS_P, asks),
+            self._block(index, ASKS_A, asks),
+            self._block(index, ASKS_V, asks),
+            self._block(index, BIDS_P, bids),
+            self._block(index, BIDS_A, bids),
+            self._block(index, BIDS_V, bids),
+        )
+
+    def get_book_index(self, timestamp):
+        """
+        Index of the last book received at timestamp, -1 if there is none.
+        """
+        return int(np.searchsorted(self.book_timestamps, timestamp, "right")) - 1
+
+    def get_external_price(self, timestamp, ask=True, max_age=None):
+        """
+        Last external price at timestamp as a Decimal, None if there is no
+        price or it is older than max_age, like price_feed.get_price.
+        """
+        if max_age is None:
+            max_age = settings.EXTERNAL_PRICE_MAX_AGE
+        index = int(np.searchsorted(self.price_timestamps, timestamp, "right")) - 1
+        if index < 0 or timestamp - self.price_timestamps[index] > max_age:
+            return None
+        price = self.prices[index, ASK if ask else BID]
+        return Decimal(str(price)) if price else None
+
+    def get_mid_price(self, timestamp):
+        index = int(np.searchsorted(self.price_timestamps, timestamp, "right")) - 1
+        if index < 0:
+            return None
+        return float(self.prices[index].mean())
+
+    def get_event_times(self):
+        """
+        Timestamps of every book and external price update, sorted.
+        """
+        return np.union1d(self.book_timestamps, self.price_timestamps)
+
+
+class FeeModel:
+    """
+    Fees in percent of the traded value, charged in the right coin.
+    """
+
+    def __init__(self, maker=None, taker=None):
+        self.maker = settings.BACKTEST_MAKER_FEE if maker is None else maker
+        self.taker = settings.BACKTEST_TAKER_FEE if taker is None else taker
+
+    def get_fee(self, value, maker=True):
+        return value * (self.maker if maker else self.taker) / 100
+
+
+class SimulatedOrder:
+    def __init__(self, side, price, amount, placed_at):
+        self.side = side
+        self.price = price
+        # Amount of left coin still open
+        self.amount = amount
+        self.placed_at = placed_at
+        # Index of the first book not matched against the order yet
+        self.book_index = None
+
+
+class SimulatedBot:
+    """
+    State of one bot config: its live order and when it acts again.
+    """
+
+    def __init__(self, config_id, config):
+        self.config_id = config_id
+        self.config = config
+        self.side = config["side"]
+        self.order = None
+        self.quotes = 0
+
+    def get_refresh_time(self):
+        return self.config.get("refresh_rate") * 60 or settings.REFRESH_ORDER_RATE
+
+
+class Backtest:
+    """
+    Replays a MarketHistory through price_source with the semantics of the
+    live bot loop: every bot computes its order price and value, replaces
+    its order and waits refresh_rate minutes, or until the target price
+    moves more than requote_threshold if event_driven.
+
+    Orders rest in the book and are filled as maker when a recorded book
+    trades through their price (a buy order is matched by asks at or below
+    its price and a sell order by bids at or above it). Orders that cross
+    the book when placed are filled as taker. Fills are found with one
+    vectorized scan of the best prices between bot decisions, so only bot
+    decisions and fills run in Python.
+
+    Recorded books do not show our own fills, so the amount taken from
+    each level is kept and a level that stays in the book does not fill
+    again. New fills need the recorded amount of the level to go up, or
+    the level to leave the book and come back.
+    """
+
+    def __init__(
+        self, history, configs, left_balance, right_balance, fees=None, latency=0.0
+    ):
+        self.history = history
+        self.bots = [
+            SimulatedBot(config_id, config)
+            for config_id, config in configs
+            if config.get("is_active")
+        ]
+        self.balances = {"left": float(left_balance), "right": float(right_balance)}
+        self.initial_balances = dict(self.balances)
+        self.locked = {"left": 0.0, "right": 0.0}
+        self.fees = fees or FeeModel()
+        self.latency = latency
+        self.trades = []
+        self.event_times = history.get_event_times()
+        # (book side, price) to (book index, amount) taken by our fills
+        self.taken = {}
+
+    def _get_coin(self, side):
+        return "right" if side == "buy" else "left"
+
+    def _fill(self, bot, timestamp, price, amount, maker=True):
+        order = bot.order
+        value = price * amount
+        fee = self.fees.get_fee(value, maker=maker)
+        if bot.side == "buy":
+            self.locked["right"] -= order.price * amount
+            self.balances["right"] -= value
+            self.balances["left"] += amount
+        else:
+            self.locked["left"] -= amount
+            self.balances["left"] -= amount
+            self.balances["right"] += value
+        self.balances["right"] -= fee
+        order.amount -= amount
+        self.trades.append((timestamp, bot.config_id, bot.side, price, amount, fee))
+        if order.amount <= 1e-12:
+            self._cancel(bot)
+
+    def _cancel(self, bot):
+        order = bot.order
+        if order is None:
+            return
+        coin = self._get_coin(bot.side)
+        if bot.side == "buy":
+            self.locked[coin] -= order.amount * order.price
+        else:
+            self.locked[coin] -= order.amount
+        self.locked[coin] = max(self.locked[coin], 0.0)
+        bot.order = None
+
+    def _get_taken(self, book_side, price, index):
+        """
+        Amount of the level at price taken by our fills that is still in the
+        book at index. Levels that shrink or leave the book give it back.
+        """
+        taken_at = self.taken.get((book_side, price))
+        if taken_at is None:
+            return 0.0
+        taken_index, taken = taken_at
+        if taken_index >= index:
+            return taken
+        depth = self.history.depth
+        books = self.history.books[taken_index + 1 : index + 1]
+        prices = books[:, book_side * depth : (book_side + 1) * depth]
+        amounts = books[:, (book_side + 1) * depth : (book_side + 2) * depth]
+        level_amounts = np.where(prices == price, amounts, 0).sum(axis=1)
+        return min(taken, float(level_amounts.min()))
+
+    def _take(self, order, index, price, amount):
+        book_side = ASKS_P if order.side == "buy" else BIDS_P
+        taken = self._get_taken(book_side, price, index)
+        self.taken[(book_side, price)] = (index, taken + amount)
+
+    def _get_matches(self, order, index):
+        """
+        Levels of the book at index that match the order, as price and
+        amount arrays from the best level. Amounts exclude what our
+        previous fills took.
+        """
+        book = self.history.get_book(index)
+        prices, amounts, _ = book.asks if order.side == "buy" else book.bids
+        if order.side == "buy":
+            matches = prices <= order.price
+        else:
+            matches = prices >= order.price
+        prices, amounts = prices[matches].tolist(), amounts[matches].tolist()
+        book_side = ASKS_P if order.side == "buy" else BIDS_P
+        amounts = [
+            max(amount - self._get_taken(book_side, price, index), 0.0)
+            for price, amount in zip(prices, amounts)
+        ]
+        return prices, amounts
+
+    def _find_fill(self, order, start, stop):
+        """
+        Index of the first book between start and stop that trades through
+        the order, None if there is none.
+        """
+        if start >= stop:
+            return None
+        if order.side == "buy":
+            crossed = self.history.best_asks[start:stop] <= order.price
+        else:
+            crossed = self.history.best_bids[start:stop] >= order.price
+        index = int(np.argmax(crossed))
+        return start + index if crossed[index] else None
+
+    def _find_available_fill(self, order, start, stop):
+        """
+        Index of the first book between start and stop that trades through
+        the order with liquidity our fills have not taken, None if there
+        is none.
+        """
+        while True:
+            index = self._find_fill(order, start, stop)
+            if index is None or any(self._get_matches(order, index)[1]):
+                return index
+            start = index + 1
+
+    def _match(self, bot, timestamp):
+        """
+        Fills the live order of bot with the books received up to timestamp.
+        """
+        order = bot.order
+        history = self.history
+        stop = history.get_book_index(timestamp) + 1
+        while bot.order is not None:
+            index = self._find_available_fill(order, order.book_index, stop)
+            if index is None:
+                order.book_index = stop
+                return
+            amount = 0.0
+            for price, level_amount in zip(*self._get_matches(order, index)):
+                level_amount = min(order.amount - amount, level_amount)
+                self._take(order, index, price, level_amount)
+                amount += level_amount
+            order.book_index = index + 1
+            self._fill(bot, float(history.book_timestamps[index]), order.price, amount)
+
+    def _match_all(self, timestamp):
+        for bot in self.bots:
+            if bot.order is not None:
+                self._match(bot, timestamp)
+
+    def _place(self, bot, timestamp, price, value):
+        price = float(price)
+        amount = float(value) / price
+        coin = self._get_coin(bot.side)
+        self.locked[coin] += float(value) if bot.side == "buy" else amount
+        bot.order = SimulatedOrder(bot.side, price, amount, timestamp)
+        bot.quotes += 1
+
+        # Orders crossing the book are filled at once as taker
+        index = self.history.get_book_index(timestamp)
+        if index >= 0:
+            order = bot.order
+            for level_price, level_amount in zip(*self._get_matches(order, index)):
+                if bot.order is None:
+                    break
+                level_amount = min(order.amount, level_amount)
+                if not level_amount:
+                    continue
+                self._take(order, index, level_price, level_amount)
+                self._fill(bot, timestamp, level_price, level_amount, maker=False)
+        if bot.order is not None:
+            live_at = timestamp + self.latency
+            bot.order.book_index = self.history.get_book_index(live_at) + 1
+
+    def _get_target_price(self, bot, timestamp):
+        index = self.history.get_book_index(timestamp)
+        if index < 0:
+            return None, None
+        external_price = self.history.get_external_price(
+            timestamp, ask=bot.side == "sell"
+        )
+        return price_source.get_order_price(
+            side=bot.side,
+            book=self.history.get_book(index),
+            external_price=external_price,
+            spread=bot.config["spread"],
+            greedy_mood=bot.config.get("greedy_mood", True),
+        )
+
+    def _wait_for_requote(self, bot, timestamp, order_price):
+        """
+        Time the bot wakes up after placing an order at timestamp, like
+        main.wait_for_requote.
+        """
+        deadline = timestamp + bot.get_refresh_time()
+        if bot.order is None:
+            # Filled as taker
+            return timestamp
+        fill = self._find_available_fill(
+            bot.order,
+            bot.order.book_index,
+            self.history.get_book_index(deadline) + 1,
+        )
+        if fill is not None:
+            deadline = min(deadline, float(self.history.book_timestamps[fill]))
+
+        start = int(np.searchsorted(self.event_times, timestamp, "right"))
+        stop = int(np.searchsorted(self.event_times, deadline, "right"))
+        for event_time in self.event_times[start:stop].tolist():
+            target_price, _ = self._get_target_price(bot, event_time)
+            if target_price is not None and price_source.should_requote(
+                order_price,
+                target_price,
+                threshold=bot.config.get("requote_threshold"),
+            ):
+                return event_time
+        return deadline
+
+    def _step(self, bot, timestamp):
+        """
+        Runs one iteration of the bot loop at timestamp. Returns the time of
+        the next iteration.
+        """
+        config = bot.config
+        order_price, _ = self._get_target_price(bot, timestamp)
+        if not order_price:
+            self._cancel(bot)
+            return timestamp + PRICE_RETRY_TIME
+
+        # The live order is replaced, so its funds can be spent again
+        self._cancel(bot)
+        coin = self._get_coin(bot.side)
+        balance = self.balances[coin] - self.locked[coin]
+        if balance <= 0:
+            return timestamp + settings.NOT_FUNDS_AWAITING_TIME * 60
+
+        order_value = price_source.get_order_value(
+            max_balance=Decimal(str(balance)),
+            price=order_price,
+            max_order_value=config.get("order_value") or 20_000.00,
+            side=bot.side,
+        )
+        self._place(bot, timestamp, order_price, order_value)
+
+        if config.get("event_driven"):
+            return self._wait_for_requote(bot, timestamp, order_price)
+        return timestamp + bot.get_refresh_time()
+
+    def run(self, start=None, end=None):
+        """
+        Replays the history between start and end timestamps.
+        Returns a BacktestReport.
+        """
+        history = self.history
+        if start is None:
+            start = max(history.book_timestamps[0], history.price_timestamps[0])
+        if end is None:
+            end = min(history.book_timestamps[-1], history.price_timestamps[-1])
+        self.start_price = history.get_mid_price(start)
+
+        pending = [(start, index) for index in range(len(self.bots))]
+        heapq.heapify(pending)
+        while pending:
+            timestamp, index = heapq.heappop(pending)
+            if timestamp > end:
+                break
+            self._match_all(timestamp)
+            next_time = self._step(self.bots[index], timestamp)
+            heapq.heappush(pending, (next_time, index))
+
+        self._match_all(end)
+        for bot in self.bots:
+            self._cancel(bot)
+        return BacktestReport(self, end)
+
+
+class BacktestReport:
+    """
+    Trades, inventory and PnL of a backtest. PnL is in the right coin and
+    marks the left coin inventory to the external mid price at the end.
+    """
+
+    def __init__(self, backtest, end):
+        trades = backtest.trades
+        self.timestamps = np.array([trade[0] for trade in trades])
+        self.sides = np.array([trade[2] for trade in trades])
+        self.prices = np.array([trade[3] for trade in trades])
+        self.amounts = np.array([trade[4] for trade in trades])
+        self.fees = np.array([trade[5] for trade in trades])
+
+        self.balances = dict(backtest.balances)
+        self.initial_balances = backtest.initial_balances
+        self.end_price = backtest.history.get_mid_price(end)
+        self.quotes = {bot.config_id: bot.quotes for bot in backtest.bots}
+
+        signed_amounts = np.where(self.sides == "buy", self.amounts, -self.amounts)
+        self.inventory = backtest.initial_balances["left"] + np.cumsum(signed_amounts)
+
+    def get_pnl(self):
+        left = self.balances["left"] - self.initial_balances["left"]
+        right = self.balances["right"] - self.initial_balances["right"]
+        return left * self.end_price + right
+
+    def get_summary(self):
+        buys = self.sides == "buy"
+        return {
+            "trades": len(self.prices),
+            "buys": int(buys.sum()),
+            "sells": int((~buys).sum()),
+            "volume": float(np.dot(self.prices, self.amounts)),
+            "fees": float(self.fees.sum()),
+            "pnl": self.get_pnl(),
+            "left_balance": self.balances["left"],
+            "right_balance": self.balances["right"],
+            "max_inventory": float(self.inventory.max()) if len(self.inventory) else 0,
+            "min_inventory": float(self.inventory.min()) if len(self.inventory) else 0,
+            "quotes": self.quotes,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest bot configs")
+    parser.add_argument("market")
+    parser.add_argument("--days", nargs="*", help="Recorded days, every day if empty")
+    parser.add_argument("--recordings", default=None, help="Recordings directory")
+    parser.add_argument("--config", default="./robots.json")
+    parser.add_argument("--left-balance", type=float, default=0.0)
+    parser.add_argument("--right-balance", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.0, help="In seconds")
+    args = parser.parse_args()
+
+    with open(args.config) as robots:
+        configs = [
+            (config_id, config)
+            for config_id, config in enumerate(json.load(robots))
+            if config["market"].lower() == args.market.lower()
+        ]
+
+    history = MarketHistory.from_recording(
+        args.market, days=args.days or None, directory=args.recordings
+    )
+    backtest = Backtest(
+        history,
+        configs,
+        left_balance=args.left_balance,
+        right_balance=args.right_balance,
+        latency=args.latency,
+    )
+    report = backtest.run()
+    logging.info(json.dumps(report.get_summary(), indent=4))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(message)s", level=logging.INFO)
+    main()
@@ -0,0 +1,128 @@
+import time
+from decimal import Decimal
+from multiprocessing import Array
+
+import settings
+
+AVAILABLE = 0
+RESERVED = 1
+SYNCED_AT = 2
+CLAIMED_AT = 3
+LOCKED = 4
+
+
+class BalanceCache:
+    """
+    Available balance per coin shared by every bot process, along with the
+    funds locked by our live orders.
+
+    Balances are updated with our own orders (funds locked by placed
+    orders and unlocked by closed ones) and reconciled with the exchange
+    wallet every sync_interval seconds. Bots reserve the funds of an order
+    before placing it, so bots trading the same coin never count the same
+    funds twice.
+
+    The cache does no network requests: callers query the wallet when
+    claim_sync returns True and store it with set_available.
+    """
+
+    def __init__(self, coins, sync_interval=None):
+        self.sync_interval = sync_interval or settings.BALANCE_SYNC_INTERVAL
+        self.balances = {coin.lower(): Array("d", 5) for coin in coins}
+
+    def claim_sync(self, coin):
+        """
+        Returns True if the balance of the coin must be reconciled with the
+        exchange. Only one caller gets True until the sync interval passes
+        again or the sync fails.
+        """
+        balance = self.balances[coin.lower()]
+        with balance.get_lock():
+            if time.time() - balance[CLAIMED_AT] < self.sync_interval:
+                return False
+            balance[CLAIMED_AT] = time.time()
+            return True
+
+    def fail_sync(self, coin):
+        balance = self.balances[coin.lower()]
+        with balance.get_lock():
+            balance[CLAIMED_AT] = 0
+
+    def set_available(self, coin, available):
+        balance = self.balances[coin.lower()]
+        with balance.get_lock():
+            balance[AVAILABLE] = float(available)
+            balance[SYNCED_AT] = time.time()
+
+    def is_synced(self, coin):
+        return self.balances[coin.lower()][SYNCED_AT] > 0
+
+    def get_available(self, coin):
+        """
+        Available balance not reserved by any bot.
+        """
+        balance = self.balances[coin.lower()]
+        with balance.get_lock():
+            available = balance[AVAILABLE] - balance[RESERVED]
+        return max(Decimal(str(available)), Decimal(0))
+
+    def reserve(self, coin, amount):
+        """
+        Reserves funds for an order about to be placed.
+        Returns False if there are not enough unreserved funds.
+        """
+        balance = self.balances[coin.lower()]
+        with balance.get_lock():
+            if balance[AVAILABLE] - balance[RESERVED] < float(amount):
+                return False
+            balance[RESERVED] += float(amount)
+            return True
+
+    def release(self, coin, amount):
+        """
+        Releases a reservation whose order could not be placed.
+        """
+        balance = self.balances[coin.lower()]
+        with balance.get_lock():
+            balance[RESERVED] = max(balance[RESERVED] - float(amount), 0)
+
+    def commit(self, coin, amount):
+        """
+        Turns a reservation into funds locked by a placed order.
+        """
+        balance = self.balances[coin.lower()]
+        with balance.get_lock():
+            balance[RESERVED] = max(balance[RESERVED] - float(amount), 0)
+            balance[AVAILABLE] -= float(amount)
+            balance[LOCKED] += float(amount)
+
+    def unlock(self, coin, amount, credit=True):
+        """
+        Unlocks the funds of an order that is no longer live. They are added
+        back to the available balance if credit, otherwise the order was
+        filled or the next wallet sync reports them.
+        """
+        balance = self.balances[coin.lower()]
+        with balance.get_lock():
+            balance[LOCKED] = max(balance[LOCKED] - float(amount), 0)
+            if credit:
+                balance[AVAILABLE] += float(amount)
+
+    def credit(self, coin, amount):
+        """
+        Adds funds unlocked by a closed order or received by a fill.
+        """
+        balance = self.balances[coin.lower()]
+        with balance.get_lock():
+            balance[AVAILABLE] += float(amount)
+
+    def get_total(self, coin):
+        """
+        Available balance plus the funds locked by our live orders, None if
+        the balance is not known yet.
+        """
+        balance = self.balances[coin.lower()]
+        with balance.get_lock():
+            if not balance[SYNCED_AT]:
+                return None
+            return balance[AVAILABLE] + balance[LOCKED]
@@ -1,29 +1,39 @@
 import bitso
 from decimal import Decimal
+from trading_bot.book_query import BookQuery
 
 
 bisto_api = bitso.Api()
 
 
-def get_bid_price(market="btc-mxn", ignore_below=Decimal("500.00")):
+def _get_book(market):
     # Getting bitso order book
     bitso_order_book = bisto_api.order_book(market.replace("-", "_"))
+    return BookQuery.from_levels(bitso_order_book.asks, bitso_order_book.bids)
 
-    bitso_price = None
-    for bid in bitso_order_book.bids:
-        bid_value = bid.price * bid.amount
-        if bid_value >= ignore_below:
-            bitso_price = bid.price
-            return bitso_price
 
+def _get_first_price(book, ask, ignore_below):
+    price = book.get_best_price(ask=ask, ignore_below=ignore_below, inclusive=True)
+    return None if price is None else Decimal(str(price))
 
-def get_ask_price(market="btc-mxn", ignore_below=Decimal("500.00")):
-    # Getting bitso order book
-    bitso_order_book = bisto_api.order_book(market.replace("-", "_"))
 
-    bitso_price = None
-    for ask in bitso_order_book.asks:
-        ask_value = ask.price * ask.amount
-        if ask_value >= ignore_below:
-            bitso_price = ask.price
-            return bitso_price
+def get_bid_price(market="btc-mxn", ignore_below=Decimal("500.00")):
+    return _get_first_price(_get_book(market), ask=False, ignore_below=ignore_below)
+
+
+def get_ask_price(market="btc-mxn", ignore_below=Decimal("500.00")):
+    return _get_first_price(_get_book(market), ask=True, ignore_below=ignore_below)
+
+
+def get_quote(market="btc-mxn", ignore_below=Decimal("500.00")):
+    """
+    Returns (bid, ask, size) floats of the first levels with a value of at
+    least ignore_below, size being their average amount. None if a side is
+    empty.
+    """
+    book = _get_book(market)
+    bid = book.get_best_level(ask=False, ignore_below=ignore_below, inclusive=True)
+    ask = book.get_best_level(ask=True, ignore_below=ignore_below, inclusive=True)
+    if bid is None or ask is None:
+        return None
+    return bid[0], ask[0], (bid[1] + ask[1]) / 2
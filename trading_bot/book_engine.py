@@ -0,0 +1,128 @@
+import logging
+from bisect import bisect_left
+
+import settings
+
+
+def get_orderbook_depth(market):
+    """
+    Number of levels per side published for a market.
+    """
+    return settings.ORDERBOOK_DEPTHS.get(market.lower(), settings.ORDERBOOK_SIZE)
+
+
+class BookSide:
+    """
+    Price levels of one side of the book, kept sorted from the best price in
+    parallel lists. Bids are sorted by negated price so both sides use the
+    same ascending bisect.
+    """
+
+    def __init__(self, descending=False):
+        self.sign = -1 if descending else 1
+        self.keys = []
+        self.prices = []
+        self.amounts = []
+        self.values = []
+
+    def clear(self):
+        self.keys.clear()
+        self.prices.clear()
+        self.amounts.clear()
+        self.values.clear()
+
+    def update(self, price, amount, value):
+        """
+        Sets the level at price. Levels with zero amount are removed.
+        """
+        key = self.sign * price
+        index = bisect_left(self.keys, key)
+        exists = index < len(self.keys) and self.keys[index] == key
+        if not amount:
+            if exists:
+                del self.keys[index]
+                del self.prices[index]
+                del self.amounts[index]
+                del self.values[index]
+            return
+        if exists:
+            self.amounts[index] = amount
+            self.values[index] = value
+            return
+        self.keys.insert(index, key)
+        self.prices.insert(index, price)
+        self.amounts.insert(index, amount)
+        self.values.insert(index, value)
+
+    def replace(self, levels):
+        """
+        Replaces every level with levels, (price, amount, value) tuples in
+        any order, sorting them once instead of inserting them one by one.
+        Like update, a later level of the same price wins and levels with
+        zero amount are removed.
+        """
+        sign = self.sign
+        book = {sign * level[0]: level for level in levels}
+        book = sorted(item for item in book.items() if item[1][1])
+        self.keys = [key for key, _ in book]
+        self.prices = [level[0] for _, level in book]
+        self.amounts = [level[1] for _, level in book]
+        self.values = [level[2] for _, level in book]
+
+    def get_levels(self, depth):
+        """
+        Returns up to depth (price, amount, value) tuples from the best level.
+        """
+        return list(zip(self.prices[:depth], self.amounts[:depth], self.values[:depth]))
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class BookEngine:
+    """
+    Keeps the full book of a market from snapshots and incremental diffs.
+
+    Diffs carry a sequence number that must follow the last one applied.
+    When a gap is found the diff is discarded and the caller must resync
+    the book with a new snapshot.
+    """
+
+    def __init__(self, market):
+        self.market = market
+        self.asks = BookSide()
+        self.bids = BookSide(descending=True)
+        self.sequence = None
+
+    def apply_snapshot(self, asks, bids, sequence=None):
+        self.asks.replace(asks)
+        self.bids.replace(bids)
+        self.sequence = sequence
+
+    def apply_diff(self, asks, bids, sequence=None):
+        """
+        Applies changed levels to the book.
+        Returns False if the diff does not follow the last sequence applied.
+        """
+        if sequence is not None and self.sequence is not None:
+            if sequence <= self.sequence:
+                # Already applied
+                return True
+            if sequence != self.sequence + 1:
+                logging.error(
+                    f"{self.market} orderbook gap: expected {self.sequence + 1}, got {sequence}"
+                )
+                return False
+        for price, amount, value in asks:
+            self.asks.update(price, amount, value)
+        for price, amount, value in bids:
+            self.bids.update(price, amount, value)
+        if sequence is not None:
+            self.sequence = sequence
+        return True
+
+    def get_levels(self, depth):
+        """
+        Returns (asks, bids) lists of (price, amount, value) tuples.
+        """
+        return self.asks.get_levels(depth), self.bids.get_levels(depth)
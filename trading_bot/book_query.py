@@ -0,0 +1,139 @@
+import numpy as np
+
+
+def _to_array(items):
+    return np.fromiter(items, dtype=np.float64)
+
+
+class BookQuery:
+    """
+    Vectorized queries over an orderbook. Each side is made of price,
+    amount and value float arrays sorted from the best price, so every
+    query is a single NumPy pass without creating Decimal objects per level.
+    """
+
+    def __init__(self, asks_p, asks_a, asks_v, bids_p, bids_a, bids_v):
+        self.asks = (asks_p, asks_a, asks_v)
+        self.bids = (bids_p, bids_a, bids_v)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Query over a SharedBook snapshot, without copying its levels.
+        """
+        return cls(
+            snapshot.asks_p,
+            snapshot.asks_a,
+            snapshot.asks_v,
+            snapshot.bids_p,
+            snapshot.bids_a,
+            snapshot.bids_v,
+        )
+
+    @classmethod
+    def from_orderbook(cls, orderbook):
+        """
+        Query over a dict of asks and bids lists with price, amount and
+        value keys, like the tauros REST orderbook.
+        """
+        sides = []
+        for side in ("asks", "bids"):
+            entries = orderbook[side]
+            prices = _to_array(float(entry["price"]) for entry in entries)
+            values = _to_array(float(entry["value"]) for entry in entries)
+            amounts = _to_array(float(entry.get("amount", 0) or 0) for entry in entries)
+            if not amounts.any() and len(prices):
+                amounts = values / prices
+            sides += [prices, amounts, values]
+        return cls(*sides)
+
+    @classmethod
+    def from_levels(cls, asks, bids):
+        """
+        Query over lists of objects with price and amount attributes, like
+        the bitso order book.
+        """
+        sides = []
+        for levels in (asks, bids):
+            prices = _to_array(float(level.price) for level in levels)
+            amounts = _to_array(float(level.amount) for level in levels)
+            sides += [prices, amounts, prices * amounts]
+        return cls(*sides)
+
+    def _get_side(self, ask):
+        return self.asks if ask else self.bids
+
+    def get_best_level(self, ask=True, ignore_below=0.0, inclusive=False):
+        """
+        Returns (price, amount) of the first level with a value above
+        ignore_below (or equal to it if inclusive), None if there is no such
+        level.
+        """
+        prices, amounts, values = self._get_side(ask)
+        if inclusive:
+            matches = values >= float(ignore_below)
+        else:
+            matches = values > float(ignore_below)
+        index = int(np.argmax(matches)) if len(matches) else 0
+        if not len(matches) or not matches[index]:
+            return None
+        return float(prices[index]), float(amounts[index])
+
+    def get_best_price(self, ask=True, ignore_below=0.0, inclusive=False):
+        """
+        Returns the price of the first level with a value above ignore_below
+        (or equal to it if inclusive), None if there is no such level.
+        """
+        level = self.get_best_level(
+            ask=ask, ignore_below=ignore_below, inclusive=inclusive
+        )
+        return None if level is None else level[0]
+
+    def get_vwap(self, amount, ask=True):
+        """
+        Average price paid to take amount from the side, None if the book is
+        not deep enough.
+        """
+        prices, amounts, _ = self._get_side(ask)
+        cumulative = np.cumsum(amounts)
+        if not len(cumulative) or cumulative[-1] < amount:
+            return None
+        taken = np.minimum(amounts, np.maximum(amount - (cumulative - amounts), 0))
+        return float(np.dot(taken, prices) / amount)
+
+    def get_cumulative_depth(self, ask=True, by_value=False):
+        """
+        Cumulative amount (or value) available up to each level.
+        """
+        _, amounts, values = self._get_side(ask)
+        return np.cumsum(values if by_value else amounts)
+
+    def get_mid_price(self):
+        if not len(self.asks[0]) or not len(self.bids[0]):
+            return None
+        return float((self.asks[0][0] + self.bids[0][0]) / 2)
+
+    def get_microprice(self):
+        """
+        Mid price weighted by the amount at the top of the opposite side.
+        """
+        if not len(self.asks[0]) or not len(self.bids[0]):
+            return None
+        ask, ask_amount = self.asks[0][0], self.asks[1][0]
+        bid, bid_amount = self.bids[0][0], self.bids[1][0]
+        total = ask_amount + bid_amount
+        if not total:
+            return self.get_mid_price()
+        return float((ask * bid_amount + bid * ask_amount) / total)
+
+    def get_imbalance(self, levels=5):
+        """
+        Difference between the bid and ask amounts of the first levels over
+        their sum, from -1 (only asks) to 1 (only bids).
+        """
+        bid_amount = float(self.bids[1][:levels].sum())
+        ask_amount = float(self.asks[1][:levels].sum())
+        total = bid_amount + ask_amount
+        if not total:
+            return 0.0
+        return (bid_amount - ask_amount) / total
@@ -0,0 +1,216 @@
+import logging
+from decimal import Decimal
+
+import settings
+from trading_bot import metrics, price_source, signals, strategy
+from trading_bot.book_query import BookQuery
+
+# Seconds to wait after a failed price or balance query
+TRY_AGAIN_IN = 3
+
+# Place order errors meaning the wallet has not enough funds. Formatted with
+# the coin of the order.
+NOT_FUNDS_MESSAGES = (
+    "The minimum order",
+    "has not enough {}",
+    "'amount' field must be greater",
+)
+
+
+def get_time_to_sleep(config):
+    return config.get("refresh_rate") * 60 or settings.REFRESH_ORDER_RATE
+
+
+def get_coin(market, side):
+    """
+    Coin locked by the orders of a side. Orders are placed by value, buy
+    orders lock the right coin and sell orders lock the left coin.
+    """
+    left_coin, right_coin = market.split("-")
+    return right_coin if side == "buy" else left_coin
+
+
+def read_book(market_data):
+    return BookQuery.from_snapshot(market_data["orderbook"].snapshot())
+
+
+def set_wallet_balance(balances, coin, coin_wallet):
+    """
+    Reconciles the balance cache with a get_wallet response.
+    """
+    if coin_wallet["success"]:
+        balances.set_available(
+            coin, Decimal(coin_wallet["data"]["balances"]["available"])
+        )
+        return
+    balances.fail_sync(coin)
+    error_msg = coin_wallet["msg"]
+    logging.error(f"Tauros {coin} wallet query failed. Error: {error_msg}")
+
+
+def get_synced_balance(balances, coin):
+    """
+    Unreserved balance of a coin, None if it is not known yet.
+    """
+    if not balances.is_synced(coin):
+        return None
+    return balances.get_available(coin)
+
+
+def get_order_price(side, config, market_data, book):
+    """
+    Prices the order of a single level bot.
+    Returns (order_price, tauros_price, external_price), order price is None
+    if any reference price is missing.
+    """
+    market = config["market"]
+    external_price = strategy.get_reference_price(
+        config, market_data, ask=side == "sell"
+    )
+    with metrics.timer("price"):
+        order_price, tauros_price = price_source.get_order_price(
+            side=side,
+            book=book,
+            external_price=external_price,
+            spread=signals.get_spread(config, market_data),
+            greedy_mood=config.get("greedy_mood", True),
+        )
+    if not order_price:
+        logging.error(
+            f"External or Tauros query price failed for {side.upper()} bot in {market}. Trying again in: {TRY_AGAIN_IN}s"
+        )
+    return order_price, tauros_price, external_price
+
+
+def create_order(market, side, order_price, max_balance, config):
+    order_value = price_source.get_order_value(
+        max_balance=max_balance,
+        price=order_price,
+        max_order_value=config.get("order_value") or 20_000.00,
+        side=side,
+    )
+    return {
+        "market": market,
+        "amount": str(order_value),
+        "is_amount_value": True,
+        "side": side.upper(),
+        "type": "LIMIT",
+        "price": str(order_price),
+    }
+
+
+def is_not_funds_error(order_placed, coin):
+    """
+    Returns True if a failed place order response means the wallet has not
+    enough funds for the order.
+    """
+    try:
+        error_msg = order_placed["msg"][0]
+        return any(
+            message.format(coin.upper()) in error_msg for message in NOT_FUNDS_MESSAGES
+        )
+    except (KeyError, IndexError, TypeError):
+        return False
+
+
+def log_order_placed(market, side, order_placed, tauros_price, external_price):
+    """
+    Logs the result of a place order response. Returns True if the order
+    was placed.
+    """
+    if not order_placed["success"]:
+        logging.error(
+            f"Could not place {side} order in {market} market. Error: {order_placed['msg']}"
+        )
+        return False
+
+    logging.info(f"Tauros {side} order price: {tauros_price}")
+    logging.info(f"External {side} order price: {external_price}")
+    order_data = order_placed["data"]
+    real_spread = (external_price - Decimal(order_data["price"])) / external_price
+    real_spread = abs(round(real_spread * 100, 2))
+    order_data["spread"] = str(real_spread) + "%"
+    logging.info(f"{side.capitalize()} order successfully placed: {order_data}")
+    return True
+
+
+def get_ladder_levels(config, market_data):
+    """
+    Levels of a ladder bot with their spread widened by the book signals.
+    """
+    return [
+        {**level, "spread": signals.get_spread(config, market_data, level["spread"])}
+        for level in config["levels"]
+    ]
+
+
+def get_ladder_prices(side, config, market_data, levels, book):
+    """
+    Prices every level of a ladder bot. Returns None if any reference price
+    is missing.
+    """
+    external_price = strategy.get_reference_price(
+        config, market_data, ask=side == "sell"
+    )
+    with metrics.timer("price"):
+        prices = price_source.get_ladder_prices(
+            side=side,
+            book=book,
+            external_price=external_price,
+            levels=levels,
+            greedy_mood=config.get("greedy_mood", True),
+        )
+    if not prices:
+        logging.error(
+            f"External or Tauros query price failed for {side.upper()} ladder in {config['market']}"
+        )
+    return prices
+
+
+def log_ladder_responses(market, side, responses, orders):
+    for level, order_placed in responses:
+        if order_placed["success"]:
+            logging.info(
+                f"{side.capitalize()} level {level} order placed: {order_placed['data']}"
+            )
+        else:
+            logging.error(
+                f"Could not place {side} level {level} order in {market} market. Error: {order_placed['msg']}"
+            )
+    logging.info(
+        f"{market} {side.upper()} ladder: {len(responses)} of {len(orders)} levels replaced"
+    )
+
+
+def is_requote_due(side, config, market_data, order_price, quotes=None):
+    """
+    Check of wait_for_requote after every market event. Returns True if an
+    order of quotes, a QuoteManager or a LadderManager, was filled or closed,
+    or if the target price moved more than the configured requote threshold.
+    """
+    market = config["market"]
+    if quotes is not None and quotes.is_hit(market_data["orders"]):
+        logging.info(f"{market} {side.upper()} order filled or closed")
+        return True
+
+    external_price = strategy.get_reference_price(
+        config, market_data, ask=side == "sell"
+    )
+    target_price, _ = price_source.get_order_price(
+        side=side,
+        book=read_book(market_data),
+        external_price=external_price,
+        spread=signals.get_spread(config, market_data),
+        greedy_mood=config.get("greedy_mood", True),
+    )
+    if target_price is None:
+        return False
+
+    if price_source.should_requote(
+        order_price, target_price, threshold=config.get("requote_threshold")
+    ):
+        logging.info(
+            f"{market} {side.upper()} target price moved to {target_price}. Requoting"
+        )
+        return True
+    return False
@@ -0,0 +1,298 @@
+import copy
+import json
+import logging
+import os
+import queue
+import time
+
+import settings
+from trading_bot.http_session import get_session
+from trading_bot.strategy import STRATEGIES
+
+# Keys that identify a bot. Changing them restarts the bot.
+IDENTITY_KEYS = ("market", "side")
+
+# Put into the updates queue of a bot to stop it
+STOP = None
+
+
+def validate_config(config):
+    """
+    Returns a list of errors of a bot config, empty if it is valid.
+    """
+    if not isinstance(config, dict):
+        return ["config must be an object"]
+    errors = []
+    market = config.get("market")
+    if not isinstance(market, str) or market.lower() not in settings.PRICE_SOURCE_RULES:
+        errors.append(f"unknown market {market}")
+    if config.get("side") not in ("buy", "sell"):
+        errors.append(f"side must be buy or sell, got {config.get('side')}")
+    for key in ("spread", "refresh_rate"):
+        if not isinstance(config.get(key), (int, float)):
+            errors.append(f"{key} must be a number")
+    for key in ("order_value", "requote_threshold", "volatility_spread"):
+        if config.get(key) is not None and not isinstance(config[key], (int, float)):
+            errors.append(f"{key} must be a number")
+    if config.get("signals_window") not in (None,) + tuple(settings.SIGNALS_WINDOWS):
+        errors.append(f"signals_window must be one of {settings.SIGNALS_WINDOWS}")
+    if config.get("strategy") not in (None,) + STRATEGIES:
+        errors.append(f"unknown strategy {config.get('strategy')}")
+    levels = config.get("levels")
+    if levels is not None:
+        if not isinstance(levels, list) or not all(
+            isinstance(level, dict)
+            and isinstance(level.get("spread"), (int, float))
+            and isinstance(level.get("order_value"), (int, float))
+            for level in levels
+        ):
+            errors.append("levels must be a list of spread and order_value objects")
+    return errors
+
+
+def apply_updates(config, updates):
+    """
+    Applies the config deltas pending in the updates queue of a bot.
+    Returns None if the bot was stopped.
+    """
+    while True:
+        try:
+            delta = updates.get_nowait()
+        except queue.Empty:
+            return config
+        if delta is STOP:
+            return None
+        config = {**config, **delta}
+        config = {key: value for key, value in config.items() if value is not None}
+        logging.info(f"Config updated: {delta}")
+
+
+class BotUpdates:
+    """
+    Updates queue of a bot process. Bots sleep on it instead of time.sleep,
+    so they wake up as soon as a delta or STOP is pushed. Items read while
+    waiting are kept for the next apply_updates.
+    """
+
+    def __init__(self, updates):
+        self.updates = updates
+        self.pending = []
+
+    def get_nowait(self):
+        if self.pending:
+            return self.pending.pop(0)
+        return self.updates.get_nowait()
+
+    def wait(self, timeout):
+        """
+        Blocks up to timeout seconds. Returns True if an update arrived.
+        """
+        if self.pending:
+            return True
+        try:
+            self.pending.append(self.updates.get(timeout=max(timeout, 0)))
+        except queue.Empty:
+            return False
+        return True
+
+    def poll(self):
+        return self.wait(0)
+
+
+class ConfigService:
+    """
+    Loads bot configs once and watches them for changes, robots.json by its
+    modification time or the firebase database through its streaming REST
+    endpoint.
+
+    Valid changes of running bots are pushed as deltas to their updates
+    queue (removed keys are set to None). Added and removed bots, or bots
+    whose market or side changed, are reported to the control queue as
+    ("add", config_id, config) and ("remove", config_id, None) so the
+    runtime starts or stops them.
+    """
+
+    def __init__(self, robots, remote=False, path="./robots.json"):
+        self.remote = remote
+        self.path = path
+        self.robots = {}
+        self.updates = {}
+        self.control = queue.Queue()
+        for config_id, config in robots:
+            errors = validate_config(config)
+            if errors:
+                logging.error(f"Ignoring bot {config_id}. Invalid config: {errors}")
+                continue
+            self.robots[config_id] = config
+
+    def register(self, config_id, updates):
+        self.updates[config_id] = updates
+
+    def unregister(self, config_id):
+        updates = self.updates.pop(config_id, None)
+        if updates is not None:
+            updates.put(STOP)
+
+    def watch(self):
+        if self.remote:
+            self._stream_firebase()
+        else:
+            self._watch_file()
+
+    def reload(self, robots):
+        """
+        Compares robots, a dict of configs by id, with the running ones and
+        dispatches the changes.
+        """
+        for config_id in list(self.robots):
+            if config_id not in robots:
+                logging.info(f"Bot {config_id} removed")
+                del self.robots[config_id]
+                self.control.put(("remove", config_id, None))
+
+        for config_id, config in robots.items():
+            old_config = self.robots.get(config_id)
+            if config == old_config:
+                continue
+            errors = validate_config(config)
+            if errors:
+                logging.error(f"Ignoring bot {config_id} change. Invalid: {errors}")
+                continue
+
+            self.robots[config_id] = config
+            if old_config is None:
+                logging.info(f"Bot {config_id} added")
+                self.control.put(("add", config_id, config))
+            elif any(config.get(k) != old_config.get(k) for k in IDENTITY_KEYS):
+                logging.info(f"Bot {config_id} market or side changed. Restarting")
+                self.control.put(("remove", config_id, None))
+                self.control.put(("add", config_id, config))
+            elif config_id in self.updates:
+                delta = {
+                    key: config.get(key)
+                    for key in set(config) | set(old_config)
+                    if config.get(key) != old_config.get(key)
+                }
+                self.updates[config_id].put(delta)
+
+    def _watch_file(self):
+        last_modified = os.stat(self.path).st_mtime
+        while True:
+            time.sleep(settings.CONFIG_WATCH_INTERVAL)
+            try:
+                modified = os.stat(self.path).st_mtime
+                if modified == last_modified:
+                    continue
+                last_modified = modified
+                with open(self.path) as robots:
+                    robots_list = json.load(robots)
+            except (OSError, ValueError) as e:
+                logging.error(f"Could not load {self.path}. Error: {e}")
+                continue
+            self.reload(dict(enumerate(robots_list)))
+
+    def _stream_firebase(self):
+        url = f"https://{settings.FIREBASE_PROJECT_ID}.firebaseio.com/.json"
+        while True:
+            try:
+                response = get_session().get(
+                    url,
+                    headers={"Accept": "text/event-stream"},
+                    stream=True,
+                    # Firebase sends a keep-alive event every 30 seconds
+                    timeout=(settings.HTTP_TIMEOUT, 60),
+                )
+                state = dict(self.robots)
+                event = None
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith("event:"):
+                        event = line[len("event:") :].strip()
+                    elif line.startswith("data:") and event in ("put", "patch"):
+                        data = json.loads(line[len("data:") :])
+                        state = apply_firebase_event(state, event, data)
+                        self.reload(state)
+                    elif event in ("cancel", "auth_revoked"):
+                        break
+            except Exception as e:
+                logging.error(f"Firebase config stream failed. Error: {e}")
+            time.sleep(settings.CONFIG_WATCH_INTERVAL)
+
+
+def normalize_robots(robots):
+    """
+    Returns a dict of configs by id from a firebase collection, which is
+    a list when the ids are consecutive and a dict otherwise.
+    """
+    if isinstance(robots, list):
+        return {index: robot for index, robot in enumerate(robots) if robot}
+    return {int(key): robot for key, robot in (robots or {}).items() if robot}
+
+
+def _get_child(target, key):
+    if isinstance(target, list):
+        index = int(key)
+        return target[index] if index < len(target) else None
+    return target.get(key)
+
+
+def _set_child(target, key, value):
+    """
+    Sets a child of a config object or list, removing it if value is None.
+    Firebase paths index lists by position.
+    """
+    if isinstance(target, list):
+        index = int(key)
+        target.extend([None] * (index + 1 - len(target)))
+        target[index] = value
+        while target and target[-1] is None:
+            target.pop()
+    elif value is None:
+        target.pop(key, None)
+    else:
+        target[key] = value
+
+
+def _get_container(target, key):
+    child = _get_child(target, key)
+    if not isinstance(child, (dict, list)):
+        child = {}
+        _set_child(target, key, child)
+    return child
+
+
+def apply_firebase_event(state, event, data):
+    """
+    Applies a firebase streaming put or patch event to state, a dict of
+    configs by id. Returns the new state, state is not changed.
+    """
+    keys = [key for key in data["path"].split("/") if key]
+    value = data["data"]
+    state = dict(state)
+    if not keys:
+        if event == "put":
+            return normalize_robots(value)
+        for config_id, config in (value or {}).items():
+            _set_child(state, int(config_id), config)
+        return state
+
+    # Configs are shared with the running ones, so they are changed on a copy
+    config_id = int(keys[0])
+    root = {config_id: copy.deepcopy(state.get(config_id))}
+    path = [config_id] + keys[1:]
+    target = root
+    for key in path[:-1]:
+        target = _get_container(target, key)
+    if event == "put":
+        _set_child(target, path[-1], value)
+    else:
+        # Patched children are replaced, null ones are removed
+        target = _get_container(target, path[-1])
+        for key, child in value.items():
+            _set_child(target, key, child)
+
+    config = root.get(config_id)
+    if config:
+        state[config_id] = config
+    else:
+        state.pop(config_id, None)
+    return state
@@ -0,0 +1,195 @@
+import heapq
+import itertools
+import logging
+import os
+import queue
+import time
+from multiprocessing import Queue
+
+import settings
+from trading_bot import metrics
+
+# Requests sent first when several are waiting for the rate limit
+PRIORITIES = {
+    "close_order": 0,
+    "get_wallet": 1,
+    "place_order": 2,
+    "get_orders": 2,
+}
+
+
+# Owner of a slot whose bot process has not been created yet
+RESERVED = object()
+
+
+class TokenBucket:
+    """
+    Allows rate requests per second on average and bursts of up to burst
+    requests.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        """
+        Takes a token. Returns 0 if there was one, otherwise the seconds to
+        wait for the next one.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class GatewayClient:
+    """
+    Client of the bot processes with the TaurosPrivate methods used by
+    bots. Requests are sent to the OrderGateway and the caller blocks until
+    its reply arrives in the reply queue of its slot.
+
+    Requests carry a deadline GATEWAY_TIMEOUT seconds away. Orders not sent
+    by then are dropped by the gateway, so the caller keeps waiting for the
+    ones already in flight, up to HTTP_TIMEOUT more seconds.
+    """
+
+    def __init__(self, requests, replies, slot):
+        self.requests = requests
+        self.replies = replies
+        self.slot = slot
+        self.request_ids = itertools.count()
+
+    def _call(self, kind, **kwargs):
+        # Replies to a previous owner of the slot never match the process id
+        request_id = (os.getpid(), next(self.request_ids))
+        deadline = time.time() + settings.GATEWAY_TIMEOUT
+        self.requests.put((self.slot, request_id, kind, kwargs, deadline))
+        wait_until = deadline + settings.HTTP_TIMEOUT
+        while True:
+            try:
+                reply_id, response = self.replies.get(
+                    timeout=max(wait_until - time.time(), 0)
+                )
+            except queue.Empty:
+                # The request may still be sent or have been executed
+                return {
+                    "success": False,
+                    "msg": f"Order gateway timeout. Result of {kind} unknown",
+                }
+            if reply_id == request_id:
+                return response
+
+    def place_order(self, order):
+        return self._call("place_order", order=order)
+
+    def close_order(self, order_id):
+        return self._call("close_order", order_id=order_id)
+
+    def get_wallet(self, coin):
+        return self._call("get_wallet", coin=coin)
+
+    def get_orders(self, market=None):
+        return self._call("get_orders", market=market)
+
+
+class OrderGateway:
+    """
+    Single process sending the requests of every bot with one TaurosPrivate
+    client, so nonces are generated in one place and the exchange rate
+    limit is enforced for all bots with a token bucket.
+
+    Requests are signed and sent one at a time, so they reach the exchange
+    in nonce order and none is rejected for a nonce lower than one sent
+    concurrently. Waiting requests are sent by priority, closes first.
+    Wallet queries of a coin already waiting are not sent again, they get
+    the reply of the pending one. Orders whose caller
+    deadline passed while waiting are not placed.
+
+    Bots get a GatewayClient of a reply slot. Queues are created before the
+    gateway and the bots are forked, so there are slots bot processes.
+    """
+
+    def __init__(self, client, slots=None, rate=None, burst=None):
+        self.client = client
+        self.requests = Queue()
+        self.replies = [Queue() for _ in range(slots or settings.GATEWAY_SLOTS)]
+        self.owners = [None] * len(self.replies)
+        self.bucket = TokenBucket(
+            rate or settings.GATEWAY_RATE_LIMIT, burst or settings.GATEWAY_BURST
+        )
+        self.pending = []
+        self.sequence = itertools.count()
+        self.wallets = {}
+
+    def get_client(self, slot):
+        return GatewayClient(self.requests, self.replies[slot], slot)
+
+    def acquire_slot(self):
+        """
+        Reserves a reply slot for a bot process about to be started. Slots
+        of finished processes are reused.
+        """
+        for slot, owner in enumerate(self.owners):
+            if owner is None or (owner is not RESERVED and not owner.is_alive()):
+                self.owners[slot] = RESERVED
+                return slot
+        raise RuntimeError("No order gateway slots left. Raise GATEWAY_SLOTS")
+
+    def bind_slot(self, slot, process):
+        self.owners[slot] = process
+
+    def _add(self, request):
+        slot, request_id, kind, kwargs, _ = request
+        if kind == "get_wallet":
+            waiters = self.wallets.get(kwargs["coin"])
+            if waiters is not None:
+                waiters.append((slot, request_id))
+                return
+            self.wallets[kwargs["coin"]] = [(slot, request_id)]
+        heapq.heappush(self.pending, (PRIORITIES[kind], next(self.sequence), request))
+
+    def _execute(self, request):
+        slot, request_id, kind, kwargs, deadline = request
+        if kind == "place_order" and time.time() > deadline:
+            # The bot already gave up, a late order would not be tracked
+            logging.error(f"Order gateway dropped expired order: {kwargs['order']}")
+            metrics.inc("gateway_expired")
+            response = {"success": False, "msg": "Order gateway request expired"}
+        else:
+            try:
+                response = getattr(self.client, kind)(**kwargs)
+            except Exception as e:
+                logging.error(f"Order gateway {kind} failed. Error: {e}")
+                response = {"success": False, "msg": str(e)}
+
+        waiters = [(slot, request_id)]
+        if kind == "get_wallet":
+            waiters = self.wallets.pop(kwargs["coin"])
+        for slot, request_id in waiters:
+            self.replies[slot].put((request_id, response))
+
+    def connect(self):
+        while True:
+            try:
+                # Blocks only while there is nothing to send
+                self._add(self.requests.get(block=not self.pending))
+                while True:
+                    self._add(self.requests.get_nowait())
+            except queue.Empty:
+                pass
+            if not self.pending:
+                continue
+
+            wait = self.bucket.take()
+            if wait:
+                metrics.inc("gateway_throttled")
+                time.sleep(min(wait, settings.GATEWAY_POLL_INTERVAL))
+                continue
+            _, _, request = heapq.heappop(self.pending)
+            self._execute(request)
@@ -0,0 +1,44 @@
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import settings
+
+_sessions = {}
+
+
+def create_session():
+    """
+    Creates a keep-alive session with a connection pool and retries.
+    Only idempotent (GET) requests are retried after being sent, connection
+    errors are retried for every method since the request never left.
+    """
+    retry = Retry(
+        total=settings.HTTP_RETRIES,
+        backoff_factor=settings.HTTP_BACKOFF_FACTOR,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.HTTP_POOL_SIZE,
+        pool_maxsize=settings.HTTP_POOL_SIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """
+    Returns the session of the current process. Forked processes get their
+    own session so sockets are never shared between bots.
+    """
+    pid = os.getpid()
+    session = _sessions.get(pid)
+    if session is None:
+        session = create_session()
+        _sessions[pid] = session
+    return session
@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Lock, RawArray
+
+import settings
+from trading_bot import price_feed
+
+# Stages of a bot cycle timed in histograms
+STAGES = (
+    "cycle",
+    "config",
+    "external_price",
+    "wallet",
+    "price",
+    "place_order",
+    "close_order",
+)
+
+# Histogram upper bounds in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Counters and the label of their series
+COUNTERS = {
+    "http_errors": ("client", ("tauros", "external")),
+    "nonce_rejections": (None, (None,)),
+    "ws_messages": ("market", tuple(m.upper() for m in settings.PRICE_SOURCE_RULES)),
+    "book_resyncs": ("market", tuple(m.upper() for m in settings.PRICE_SOURCE_RULES)),
+    "gateway_throttled": (None, (None,)),
+    "gateway_expired": (None, (None,)),
+}
+
+PREFIX = "tauros_bot"
+
+
+class Metrics:
+    """
+    Histograms of the bot cycle stages and counters stored in a single
+    shared array, so every process forked after its creation records in the
+    same series and the endpoint of the main process exposes all of them.
+
+    Each histogram takes a count per bucket (plus +Inf), the sum and the
+    count of its observations. Every histogram and counter series has a lock
+    of its own, so processes recording different series never wait for
+    each other.
+    """
+
+    def __init__(self):
+        self.offsets = {}
+        size = 0
+        for stage in STAGES:
+            self.offsets[stage] = size
+            size += len(BUCKETS) + 3
+        for name, (_, values) in COUNTERS.items():
+            for value in values:
+                self.offsets[(name, value)] = size
+                size += 1
+        self.data = RawArray("d", size)
+        self.locks = {key: Lock() for key in self.offsets}
+
+    def observe(self, stage, seconds):
+        offset = self.offsets[stage]
+        bucket = len(BUCKETS)
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                bucket = index
+                break
+        with self.locks[stage]:
+            self.data[offset + bucket] += 1
+            self.data[offset + len(BUCKETS) + 1] += seconds
+            self.data[offset + len(BUCKETS) + 2] += 1
+
+    def inc(self, name, label=None, amount=1):
+        offset = self.offsets.get((name, label))
+        if offset is None:
+            return
+        with self.locks[(name, label)]:
+            self.data[offset] += amount
+
+    def render(self, markets=None):
+        """
+        Returns every metric in the Prometheus text format. Book and
+        external price ages are read from markets, a dict of market data.
+        """
+        data = self.data[:]
+        for stage in STAGES:
+            # Buckets, sum and count of a histogram are copied consistently
+            offset = self.offsets[stage]
+            with self.locks[stage]:
+                data[offset : offset + len(BUCKETS) + 3] = self.data[
+                    offset : offset + len(BUCKETS) + 3
+                ]
+
+        lines = [
+            f"# HELP {PREFIX}_stage_seconds Duration of the bot cycle stages.",
+            f"# TYPE {PREFIX}_stage_seconds histogram",
+        ]
+        for stage in STAGES:
+            offset = self.offsets[stage]
+            cumulative = 0
+            for index, bound in enumerate(BUCKETS + ("+Inf",)):
+                cumulative += data[offset + index]
+                lines.append(
+                    f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} '
+                    f"{cumulative:g}"
+                )
+            total = data[offset + len(BUCKETS) + 1]
+            count = data[offset + len(BUCKETS) + 2]
+            lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {total:g}')
+            lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {count:g}')
+
+        for name, (label, values) in COUNTERS.items():
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            for value in values:
+                series = f'{{{label}="{value}"}}' if label else ""
+                count = data[self.offsets[(name, value)]]
+                lines.append(f"{PREFIX}_{name}_total{series} {count:g}")
+
+        if markets:
+            now = time.time()
+            lines.append(f"# TYPE {PREFIX}_book_age_seconds gauge")
+            for market, market_data in markets.items():
+                timestamp = market_data["orderbook"].snapshot().timestamp
+                if timestamp:
+                    lines.append(
+                        f'{PREFIX}_book_age_seconds{{market="{market}"}} '
+                        f"{now - timestamp:.3f}"
+                    )
+            lines.append(f"# TYPE {PREFIX}_external_price_age_seconds gauge")
+            for market, market_data in markets.items():
+                timestamp = market_data["price"][price_feed.SOURCE_TIMESTAMP]
+                if timestamp:
+                    lines.append(
+                        f'{PREFIX}_external_price_age_seconds{{market="{market}"}} '
+                        f"{now - timestamp:.3f}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+# Created on import, before the bot processes are forked
+registry = Metrics()
+
+
+def observe(stage, seconds):
+    registry.observe(stage, seconds)
+
+
+def inc(name, label=None, amount=1):
+    registry.inc(name, label=label, amount=amount)
+
+
+@contextmanager
+def timer(stage):
+    """
+    Records the time spent in the block in the stage histogram.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(stage, time.perf_counter() - start)
+
+
+def start_server(markets=None, port=None, address=None):
+    """
+    Serves the metrics at /metrics from a daemon thread.
+    """
+    port = port or settings.METRICS_PORT
+    address = address or settings.METRICS_ADDRESS
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render(markets).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"Serving metrics at {address}:{port}")
+    return server
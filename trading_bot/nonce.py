@@ -0,0 +1,47 @@
+import logging
+import time
+from multiprocessing import Value
+
+import settings
+from trading_bot import metrics
+
+
+class NonceGenerator:
+    """
+    Strictly increasing nonces shared by every process forked after its
+    creation. Nonces are milliseconds since epoch but never repeat nor go
+    backwards, even if several processes sign in the same millisecond or
+    the clock is adjusted.
+    """
+
+    def __init__(self):
+        self.last_nonce = Value("q", 0)
+        self.rejections = Value("q", 0)
+
+    def get_nonce(self):
+        with self.last_nonce.get_lock():
+            nonce = max(int(1000 * time.time()), self.last_nonce.value + 1)
+            self.last_nonce.value = nonce
+        return str(nonce)
+
+    def reject(self, nonce):
+        """
+        Records a nonce rejected by the exchange and moves the next nonces
+        forward, in case our clock is behind the last nonce accepted. Each
+        rejection jumps from the clock or the last nonce, whichever is
+        ahead, and never more than NONCE_MAX_LEAD ahead of the clock.
+        """
+        with self.rejections.get_lock():
+            self.rejections.value += 1
+            rejections = self.rejections.value
+        metrics.inc("nonce_rejections")
+        with self.last_nonce.get_lock():
+            now = int(1000 * time.time())
+            jump = max(self.last_nonce.value, now) + settings.NONCE_REJECTION_JUMP
+            self.last_nonce.value = max(
+                self.last_nonce.value, min(jump, now + settings.NONCE_MAX_LEAD)
+            )
+        logging.warning(f"Nonce {nonce} rejected. Total rejections: {rejections}")
+
+    def get_rejections(self):
+        return self.rejections.value
@@ -1,34 +1,31 @@
 from decimal import Decimal
-import requests
+import settings
+from trading_bot.http_session import get_session
 
 BASE_URL = "https://www.okx.com"
 
 
+def _get(path):
+    response = get_session().get(BASE_URL + path, timeout=settings.HTTP_TIMEOUT)
+    return response.json()
+
+
 def get_price_limit(instrument_id="BTC-USDC", type_of_instrument="SPOT"):
-    response = requests.get(
-        BASE_URL
-        + f"/api/v5/public/price-limit?instId={instrument_id}-{type_of_instrument}",
+    return _get(
+        f"/api/v5/public/price-limit?instId={instrument_id}-{type_of_instrument}"
     )
-    return response.json()
 
 
 def get_instruments(instrument_type="SPOT"):
-    response = requests.get(
-        BASE_URL + f"/api/v5/public/instruments?instType={instrument_type}"
-    )
-    return response.json()
+    return _get(f"/api/v5/public/instruments?instType={instrument_type}")
 
 
 def get_ticker(instrument_id="BTC-USDC"):
-    response = requests.get(BASE_URL + f"/api/v5/market/ticker?instId={instrument_id}")
-    return response.json()
+    return _get(f"/api/v5/market/ticker?instId={instrument_id}")
 
 
 def get_tickers(instrument_type="SPOT"):
-    response = requests.get(
-        BASE_URL + f"/api/v5/market/tickers?instType={instrument_type}"
-    )
-    return response.json()
+    return _get(f"/api/v5/market/tickers?instType={instrument_type}")
 
 
 def get_ask_price(market):
@@ -37,3 +34,13 @@ def get_ask_price(market):
 
 def get_bid_price(market):
     return Decimal(get_ticker(market.upper())["data"][0]["bidPx"])
+
+
+def get_quote(market):
+    """
+    Returns (bid, ask, size) floats of the ticker, size being the average
+    amount at the top of the book.
+    """
+    ticker = get_ticker(market.upper())["data"][0]
+    size = (float(ticker["bidSz"] or 0) + float(ticker["askSz"] or 0)) / 2
+    return float(ticker["bidPx"]), float(ticker["askPx"]), size
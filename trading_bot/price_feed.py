@@ -0,0 +1,78 @@
+import logging
+import time
+from decimal import Decimal
+from multiprocessing import Array
+
+import settings
+from trading_bot import metrics, reference_price
+
+BID = 0
+ASK = 1
+# Time the price was published
+TIMESTAMP = 2
+# Time the oldest source of the price was received
+SOURCE_TIMESTAMP = 3
+
+
+def create_price_array():
+    """
+    Shared memory layout for a market external price: [bid, ask, timestamp,
+    source timestamp].
+    """
+    return Array("d", 4)
+
+
+class PriceFeed:
+    """
+    Queries the external reference price of a market once per refresh and
+    publishes it in shared memory, along with the time it was published and
+    the time its oldest source was received, so bots in the same market read
+    it without doing any network request. The optional event is notified
+    after every update.
+    """
+
+    def __init__(self, market, price, refresh_rate=None, event=None):
+        self.market = market.lower()
+        self.price = price
+        self.event = event
+        self.refresh_rate = refresh_rate or settings.EXTERNAL_PRICE_REFRESH_RATE
+
+    def connect(self):
+        while True:
+            self.update()
+            time.sleep(self.refresh_rate)
+
+    def update(self):
+        with metrics.timer("external_price"):
+            quote = reference_price.get_quote(self.market)
+
+        if quote is None:
+            logging.error(f"External price not available for {self.market}")
+            return
+
+        with self.price.get_lock():
+            self.price[BID] = quote.bid
+            self.price[ASK] = quote.ask
+            self.price[TIMESTAMP] = time.time()
+            self.price[SOURCE_TIMESTAMP] = quote.timestamp
+
+        if self.event is not None:
+            with self.event:
+                self.event.notify_all()
+
+
+def get_price(raw_price, ask=True, max_age=None):
+    """
+    Reads the external price published by a PriceFeed.
+    Returns None if no price has been published yet or if its oldest source
+    is stale.
+    """
+    if max_age is None:
+        max_age = settings.EXTERNAL_PRICE_MAX_AGE
+    with raw_price.get_lock():
+        price = raw_price[ASK] if ask else raw_price[BID]
+        timestamp = raw_price[SOURCE_TIMESTAMP]
+
+    if not price or time.time() - timestamp > max_age:
+        return None
+    return Decimal(str(price))
@@ -1,6 +1,9 @@
 from decimal import Decimal
 import settings
-from trading_bot import bitso_client, okx_client
+from trading_bot import reference_price
+
+# Tauros orders located at first places are ignored if its value is below
+TAUROS_IGNORE_BELOW = 200.00
 
 
 def get_buy_order_price(max_price, ref_price, spread=None, greedy_mood=True):
@@ -21,6 +24,61 @@ def get_sell_order_price(min_price, ref_price, spread=None, greedy_mood=True):
     return ref_price - settings.ORDER_PRICE_DELTA
 
 
+def _get_book_price(book, ask, ignore_below=TAUROS_IGNORE_BELOW):
+    price = book.get_best_price(ask=ask, ignore_below=ignore_below)
+    return None if price is None else Decimal(str(price))
+
+
+def get_order_price(side, book, external_price, spread, greedy_mood=True):
+    """
+    Returns the order price for the given side along with the tauros
+    reference price, read from a BookQuery of the tauros orderbook.
+    Order price is None if any reference price is missing.
+    """
+    tauros_price = _get_book_price(book, ask=side != "buy")
+
+    if not external_price or not tauros_price:
+        return None, tauros_price
+
+    if side == "buy":
+        order_price = get_buy_order_price(
+            max_price=external_price,
+            ref_price=tauros_price,
+            spread=spread,
+            greedy_mood=greedy_mood,
+        )
+        if not greedy_mood:
+            tauros_ask_price = _get_book_price(book, ask=True, ignore_below=0)
+            if tauros_ask_price and order_price >= tauros_ask_price:
+                # TODO: Remove magic number
+                order_price = tauros_ask_price - Decimal("0.01")
+    else:
+        order_price = get_sell_order_price(
+            min_price=external_price,
+            ref_price=tauros_price,
+            spread=spread,
+            greedy_mood=greedy_mood,
+        )
+        if not greedy_mood:
+            tauros_bid_price = _get_book_price(book, ask=False, ignore_below=0)
+            if tauros_bid_price and order_price <= tauros_bid_price:
+                # TODO: Remove magic number
+                order_price = tauros_bid_price + Decimal("0.01")
+
+    return order_price, tauros_price
+
+
+def should_requote(order_price, target_price, threshold=None):
+    """
+    Returns True if the target price moved more than threshold (in percent)
+    from the live order price.
+    """
+    if threshold is None:
+        threshold = settings.REQUOTE_THRESHOLD
+    change = abs(target_price - order_price) / order_price * 100
+    return change > Decimal(str(threshold))
+
+
 def get_order_value(max_balance, price, max_order_value=20_000.00, side="buy"):
     # Setting order value
     MAX_ORDER_VALUE = Decimal(str(max_order_value))
@@ -39,14 +97,69 @@ def get_order_value(max_balance, price, max_order_value=20_000.00, side="buy"):
     return order_value
 
 
+def get_ladder_prices(side, book, external_price, levels, greedy_mood=True):
+    """
+    Returns the order price of every ladder level, None if any reference
+    price is missing. Only the first level competes for the first place of
+    the book, deeper levels are placed at their own spread but never at a
+    better price than the level before them.
+    """
+    prices = []
+    for index, level in enumerate(levels):
+        order_price, _ = get_order_price(
+            side=side,
+            book=book,
+            external_price=external_price,
+            spread=level["spread"],
+            greedy_mood=greedy_mood and index == 0,
+        )
+        if order_price is None:
+            return None
+        if prices:
+            if side == "buy":
+                order_price = min(order_price, prices[-1])
+            else:
+                order_price = max(order_price, prices[-1])
+        prices.append(order_price)
+    return prices
+
+
+def get_ladder_orders(market, side, prices, levels, max_balance):
+    """
+    Returns the orders of a ladder from its first level. Each level takes
+    up to its order_value from the balance left by the previous ones, levels
+    the balance does not reach are left out.
+    """
+    orders = []
+    for price, level in zip(prices, levels):
+        if max_balance <= 0:
+            break
+        order_value = get_order_value(
+            max_balance=max_balance,
+            price=price,
+            max_order_value=level["order_value"],
+            side=side,
+        )
+        orders.append(
+            {
+                "market": market,
+                "amount": str(order_value),
+                "is_amount_value": True,
+                "side": side.upper(),
+                "type": "LIMIT",
+                "price": str(price),
+            }
+        )
+        max_balance -= order_value if side == "buy" else order_value / price
+    return orders
+
+
 def get_external_price(market, ask=True):
-    source = settings.PRICE_SOURCE_RULES[market]
-    if source == settings.BITSO:
-        client = bitso_client
-    elif source == settings.OKX:
-        client = okx_client
-    else:
-        raise NotImplementedError(f"Source price rule not defined for {market} market")
-    if ask:
-        return client.get_ask_price(market=market)
-    return client.get_bid_price(market=market)
+    """
+    Returns the external reference ask or bid price of a market, None if
+    no source is available.
+    """
+    quote = reference_price.get_quote(market)
+    if quote is None:
+        return None
+    return Decimal(str(quote.ask if ask else quote.bid))
@@ -0,0 +1,332 @@
+import logging
+from decimal import Decimal
+from trading_bot.price_source import should_requote
+from trading_bot.tauros_api import is_closed_status
+
+
+class QuoteManager:
+    """
+    Keeps the live order of a bot and replaces it by placing the new order
+    before closing the old one, so the market is never left unquoted.
+
+    Both orders are live for a moment, so the new order can only overlap
+    the old one if the available balance (which excludes the funds locked
+    by the live order) covers it. Otherwise the old order is closed first.
+
+    If a BalanceCache is given, the funds of the new order are reserved
+    before placing it and the cache is updated with the funds locked and
+    unlocked by our orders.
+
+    With the user stream, fills shrink the live order to its unfilled part
+    and a closed order is forgotten.
+    """
+
+    def __init__(self, client, market, side, balances=None):
+        self.client = client
+        self.market = market
+        self.side = side
+        self.balances = balances
+        left_coin, right_coin = market.split("-")
+        # Orders are placed by value, buy orders lock the right coin and
+        # sell orders lock the left coin.
+        self.coin = right_coin if side == "buy" else left_coin
+        self.order_id = None
+        self.order_price = None
+        self.order_amount = None
+        # Left coin amount of the live order filled, as reported
+        self.order_filled = Decimal(0)
+        self.locked_balance = Decimal(0)
+
+    def _get_locked_balance(self, order):
+        value = Decimal(order["amount"])
+        if self.side == "buy":
+            return value
+        return value / Decimal(order["price"])
+
+    def get_spendable_balance(self, available_balance):
+        """
+        Balance that can be used by the next order, including the funds
+        locked by the live order that is going to be replaced.
+        """
+        return available_balance + self.locked_balance
+
+    def is_quoting(self, order, threshold=None):
+        """
+        Returns True if the live order price and amount are within threshold
+        (in percent) of the order ones, so it does not need to be replaced.
+        """
+        if self.order_id is None:
+            return False
+        return not should_requote(
+            self.order_price, Decimal(order["price"]), threshold=threshold
+        ) and not should_requote(
+            self.order_amount, Decimal(order["amount"]), threshold=threshold
+        )
+
+    def _get_reported(self, orders):
+        if orders is None or self.order_id is None:
+            return None
+        return orders.get(self.order_id) or None
+
+    def is_hit(self, orders):
+        """
+        Returns True if the user stream reported a fill or the close of the
+        live order that has not been synced yet.
+        """
+        order = self._get_reported(orders)
+        if order is None:
+            return False
+        filled = Decimal(str(order.get("filled") or 0))
+        return is_closed_status(order) or filled > self.order_filled
+
+    def sync(self, orders):
+        """
+        Applies the fills and the close of the live order reported by the
+        user stream. Filled funds are no longer locked, and a closed order
+        is forgotten so it is neither closed again nor counted as locked
+        funds. Returns True if the live order changed.
+        """
+        order = self._get_reported(orders)
+        if order is None:
+            return False
+        if is_closed_status(order):
+            _, locked_balance = self._on_cancelled()
+            if self.balances is not None:
+                self.balances.unlock(self.coin, locked_balance, credit=False)
+            return True
+        return self._on_filled(
+            filled=Decimal(str(order.get("filled") or 0)),
+            amount=Decimal(str(order.get("amount") or 0)),
+        )
+
+    def _on_filled(self, filled, amount):
+        """
+        Shrinks the live order to its unfilled part. filled and amount are
+        the left coin amounts of the order reported by the user stream.
+        """
+        if not amount or filled <= self.order_filled:
+            return False
+        remaining = max((amount - filled) / (amount - self.order_filled), 0)
+        filled_balance = self.locked_balance * (1 - remaining)
+        self.locked_balance -= filled_balance
+        self.order_amount *= remaining
+        self.order_filled = filled
+        if self.balances is not None:
+            self.balances.unlock(self.coin, filled_balance, credit=False)
+        logging.info(
+            f"{self.market} {self.side} order {self.order_id} partially filled: {filled} of {amount}"
+        )
+        return True
+
+    def _reserve(self, locked_balance):
+        if self.balances is None or self.balances.reserve(self.coin, locked_balance):
+            return None
+        return {
+            "success": False,
+            "msg": f"{self.coin.upper()} balance already reserved by other bots",
+        }
+
+    def _on_placed(self, order_placed, order, locked_balance):
+        if not order_placed["success"]:
+            if self.balances is not None:
+                self.balances.release(self.coin, locked_balance)
+            return None
+
+        if self.balances is not None:
+            self.balances.commit(self.coin, locked_balance)
+        old_order_id = self.order_id
+        old_locked_balance = self.locked_balance
+        self.order_id = order_placed["data"]["id"]
+        self.order_price = Decimal(order["price"])
+        self.order_amount = Decimal(order["amount"])
+        self.order_filled = Decimal(0)
+        self.locked_balance = locked_balance
+        return old_order_id, old_locked_balance
+
+    def _on_cancelled(self):
+        old_order_id = self.order_id
+        old_locked_balance = self.locked_balance
+        self.order_id = None
+        self.order_price = None
+        self.order_amount = None
+        self.order_filled = Decimal(0)
+        self.locked_balance = Decimal(0)
+        return old_order_id, old_locked_balance
+
+    def _on_closed(self, close_order, locked_balance):
+        if not close_order["success"]:
+            logging.info(f"Order close faild. Error: {close_order['msg']}")
+            if self.balances is not None:
+                self.balances.unlock(self.coin, locked_balance, credit=False)
+            return
+        if self.balances is not None:
+            self.balances.unlock(self.coin, locked_balance)
+
+    def replace(self, order, available_balance):
+        """
+        Places the order and closes the previous live order.
+        Returns the place order response.
+        """
+        locked_balance = self._get_locked_balance(order)
+        overlap = locked_balance <= available_balance
+        if not overlap:
+            self.cancel()
+
+        not_reserved = self._reserve(locked_balance)
+        if not_reserved:
+            return not_reserved
+
+        order_placed = self.client.place_order(order=order)
+        old_order = self._on_placed(order_placed, order, locked_balance)
+        if old_order is not None and old_order[0] is not None:
+            self._close_order(*old_order)
+        return order_placed
+
+    def cancel(self):
+        """
+        Closes the live order, if any.
+        """
+        if self.order_id is None:
+            return
+        self._close_order(*self._on_cancelled())
+
+    def _close_order(self, order_id, locked_balance):
+        close_order = self.client.close_order(order_id)
+        self._on_closed(close_order, locked_balance)
+        return close_order
+
+
+class LadderManager:
+    """
+    Keeps the live orders of a multi-level bot, one QuoteManager per level.
+
+    Desired orders are diffed against the live ones: levels whose order did
+    not move more than the requote threshold are kept, only the changed
+    levels are replaced and levels no longer desired are closed.
+    """
+
+    quote_manager_class = QuoteManager
+
+    def __init__(self, client, market, side, balances=None):
+        self.client = client
+        self.market = market
+        self.side = side
+        self.balances = balances
+        self.levels = []
+
+    def get_spendable_balance(self, available_balance):
+        """
+        Balance that can be used by the ladder, including the funds locked
+        by its live orders.
+        """
+        return available_balance + sum(level.locked_balance for level in self.levels)
+
+    def is_hit(self, orders):
+        """
+        Returns True if the live order of any level was filled or closed.
+        """
+        return any(level.is_hit(orders) for level in self.levels)
+
+    def sync(self, orders):
+        for level in self.levels:
+            level.sync(orders)
+
+    def _get_changes(self, orders, threshold):
+        while len(self.levels) < len(orders):
+            self.levels.append(
+                self.quote_manager_class(
+                    client=self.client,
+                    market=self.market,
+                    side=self.side,
+                    balances=self.balances,
+                )
+            )
+        return [
+            (index, order)
+            for index, order in enumerate(orders)
+            if not self.levels[index].is_quoting(order, threshold=threshold)
+        ]
+
+    def update(self, orders, available_balance, threshold=None):
+        """
+        Quotes orders, a list of one order per level from the best one.
+        Returns the place order responses of the levels that changed, as a
+        list of (level, response).
+        """
+        responses = []
+        for index, order in self._get_changes(orders, threshold):
+            level = self.levels[index]
+            locked_balance = level.locked_balance
+            order_placed = level.replace(
+                order=order, available_balance=available_balance
+            )
+            available_balance += locked_balance - level.locked_balance
+            responses.append((index, order_placed))
+        for level in self.levels[len(orders) :]:
+            level.cancel()
+        return responses
+
+    def cancel(self):
+        """
+        Closes the live orders of every level.
+        """
+        for level in self.levels:
+            level.cancel()
+
+
+class AsyncQuoteManager(QuoteManager):
+    """
+    QuoteManager for an AsyncTaurosPrivate client.
+    """
+
+    async def replace(self, order, available_balance):
+        locked_balance = self._get_locked_balance(order)
+        overlap = locked_balance <= available_balance
+        if not overlap:
+            await self.cancel()
+
+        not_reserved = self._reserve(locked_balance)
+        if not_reserved:
+            return not_reserved
+
+        order_placed = await self.client.place_order(order=order)
+        old_order = self._on_placed(order_placed, order, locked_balance)
+        if old_order is not None and old_order[0] is not None:
+            await self._close_order(*old_order)
+        return order_placed
+
+    async def cancel(self):
+        if self.order_id is None:
+            return
+        await self._close_order(*self._on_cancelled())
+
+    async def _close_order(self, order_id, locked_balance):
+        close_order = await self.client.close_order(order_id)
+        self._on_closed(close_order, locked_balance)
+        return close_order
+
+
+class AsyncLadderManager(LadderManager):
+    """
+    LadderManager for an AsyncTaurosPrivate client.
+    """
+
+    quote_manager_class = AsyncQuoteManager
+
+    async def update(self, orders, available_balance, threshold=None):
+        responses = []
+        for index, order in self._get_changes(orders, threshold):
+            level = self.levels[index]
+            locked_balance = level.locked_balance
+            order_placed = await level.replace(
+                order=order, available_balance=available_balance
+            )
+            available_balance += locked_balance - level.locked_balance
+            responses.append((index, order_placed))
+        for level in self.levels[len(orders) :]:
+            await level.cancel()
+        return responses
+
+    async def cancel(self):
+        for level in self.levels:
+            await level.cancel()
@@ -0,0 +1,337 @@
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+import settings
+from trading_bot import price_feed
+from trading_bot.shared_book import (
+    ASKS_DEPTH,
+    BIDS_DEPTH,
+    BLOCKS,
+    HEADER_SIZE,
+    TIMESTAMP,
+)
+
+BOOKS = "books"
+PRICES = "prices"
+ORDERS = "orders"
+
+SIDES = {"BUY": 1, "SELL": -1}
+ORDER_STATUSES = {
+    "OPEN": 0,
+    "PARTIALLY_FILLED": 1,
+    "FILLED": 2,
+    "CLOSED": 3,
+    "CANCELLED": 4,
+}
+UNKNOWN = -1
+
+
+def get_columns(stream, depth=None):
+    """
+    Returns the (name, dtype, shape) columns of a stream. Every stream
+    starts with the timestamp of its rows.
+    """
+    if stream == BOOKS:
+        return [
+            ("timestamp", "<f8", ()),
+            ("asks_depth", "<i4", ()),
+            ("bids_depth", "<i4", ()),
+            # SharedBook price, amount and value blocks of asks and bids
+            ("levels", "<f8", (BLOCKS * depth,)),
+        ]
+    if stream == PRICES:
+        return [
+            ("timestamp", "<f8", ()),
+            ("bid", "<f8", ()),
+            ("ask", "<f8", ()),
+        ]
+    if stream == ORDERS:
+        return [
+            ("timestamp", "<f8", ()),
+            ("order_id", "<i8", ()),
+            ("side", "<i1", ()),
+            ("status", "<i1", ()),
+            ("price", "<f8", ()),
+            ("amount", "<f8", ()),
+            ("filled", "<f8", ()),
+        ]
+    raise ValueError(f"Unknown stream {stream}")
+
+
+def get_market_directory(market, directory=None):
+    return os.path.join(directory or settings.RECORDINGS_DIR, market.lower())
+
+
+class ColumnWriter:
+    """
+    Appends the rows of a stream to one binary file per column, in a
+    directory per UTC day. Files only grow, so they can be memory mapped
+    while being written and a crash at most leaves a partial last row,
+    which readers ignore.
+
+    If the columns of the day were recorded with another shape, e.g. the
+    book depth changed, rows go to a new segment of the day in a
+    directory named day.1, day.2 and so on.
+    """
+
+    def __init__(self, market, stream, depth=None, directory=None):
+        self.directory = get_market_directory(market, directory)
+        self.stream = stream
+        self.columns = get_columns(stream, depth)
+        self.dtypes = [np.dtype(dtype) for _, dtype, _ in self.columns]
+        self.day = None
+        self.files = []
+        self.last_flush = time.time()
+
+    def _get_segment(self, day):
+        """
+        Directory of the last segment of day, or of a new one if the last
+        segment was recorded with other columns.
+        """
+        segments = itertools.chain([day], (f"{day}.{n}" for n in itertools.count(1)))
+        meta_paths = (
+            os.path.join(self.directory, segment, f"{self.stream}.json")
+            for segment in segments
+        )
+        last_path = None
+        for path in meta_paths:
+            if not os.path.exists(path):
+                break
+            last_path = path
+        if last_path is not None:
+            with open(last_path) as meta:
+                if json.load(meta)["columns"] == json.loads(json.dumps(self.columns)):
+                    return os.path.dirname(last_path)
+            logging.warning(f"{last_path} has other columns. Starting a segment")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as meta:
+            json.dump({"columns": self.columns}, meta)
+        return os.path.dirname(path)
+
+    def _open(self, day):
+        self.close()
+        path = self._get_segment(day)
+        self.files = [
+            open(os.path.join(path, f"{self.stream}.{name}.bin"), "ab")
+            for name, _, _ in self.columns
+        ]
+        self.day = day
+
+    def append(self, *row):
+        """
+        Appends a row with a value per column, the timestamp first.
+        """
+        day = time.strftime("%Y-%m-%d", time.gmtime(row[0]))
+        if day != self.day:
+            self._open(day)
+        for file, dtype, value in zip(self.files, self.dtypes, row):
+            file.write(np.asarray(value, dtype=dtype).tobytes())
+
+    def flush(self, force=True):
+        """
+        Writes the buffered rows to disk. Without force, only once per
+        RECORDER_FLUSH_INTERVAL.
+        """
+        if (
+            not force
+            and time.time() - self.last_flush < settings.RECORDER_FLUSH_INTERVAL
+        ):
+            return
+        for file in self.files:
+            file.flush()
+        self.last_flush = time.time()
+
+    def close(self):
+        for file in self.files:
+            file.close()
+        self.files = []
+
+
+class BookRecorder:
+    """
+    Records every orderbook written by an OrderBook feed. It runs in the
+    feed itself, so no update is missed between two reads of the SharedBook.
+    """
+
+    def __init__(self, market, depth, directory=None):
+        self.books = ColumnWriter(market, BOOKS, depth, directory)
+
+    def update(self, orderbook):
+        """
+        Appends the book just written to orderbook, a SharedBook written by
+        this process.
+        """
+        array = orderbook.array
+        self.books.append(
+            array[TIMESTAMP],
+            array[ASKS_DEPTH],
+            array[BIDS_DEPTH],
+            array[HEADER_SIZE:],
+        )
+        self.books.flush(force=False)
+
+
+class Recorder:
+    """
+    Records the market data seen by the bots: every external price and
+    every change of our own orders reported by the user stream. Books are
+    recorded by the BookRecorder of each orderbook feed.
+
+    A thread per market waits on the market event and stores the new price,
+    so updates are recorded as bots see them. With poll_interval markets
+    are polled instead, for events that can not be waited from a thread.
+    """
+
+    def __init__(self, markets, orders=None, directory=None, poll_interval=None):
+        self.markets = markets
+        self.orders = orders
+        self.directory = directory
+        self.poll_interval = poll_interval
+
+    def connect(self):
+        threads = [
+            threading.Thread(
+                target=self._record_market, args=(market, market_data), daemon=True
+            )
+            for market, market_data in self.markets.items()
+        ]
+        if self.orders is not None:
+            threads.append(threading.Thread(target=self._record_orders, daemon=True))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _wait(self, event):
+        if self.poll_interval:
+            time.sleep(self.poll_interval)
+            return
+        with event:
+            event.wait(timeout=settings.RECORDER_FLUSH_INTERVAL)
+
+    def _record_market(self, market, market_data):
+        price = market_data["price"]
+        prices = ColumnWriter(market, PRICES, directory=self.directory)
+        price_timestamp = 0
+        while True:
+            self._wait(market_data["event"])
+
+            with price.get_lock():
+                bid = price[price_feed.BID]
+                ask = price[price_feed.ASK]
+                timestamp = price[price_feed.TIMESTAMP]
+            if timestamp != price_timestamp:
+                price_timestamp = timestamp
+                prices.append(timestamp, bid, ask)
+
+            prices.flush(force=False)
+
+    def _record_orders(self):
+        writers = {}
+        states = {}
+        version = None
+        while True:
+            time.sleep(self.poll_interval or settings.RECORDER_ORDERS_INTERVAL)
+            if self.orders.version.value == version:
+                continue
+            version = self.orders.version.value
+            orders = self.orders.copy()
+            # Orders pruned from the store are not reported again
+            states = {
+                order_id: state
+                for order_id, state in states.items()
+                if order_id in orders
+            }
+            for order_id, order in orders.items():
+                state = (order.get("status"), order.get("filled"))
+                if states.get(order_id) == state:
+                    continue
+                states[order_id] = state
+                market = order.get("market", "").lower()
+                if market not in writers:
+                    writers[market] = ColumnWriter(
+                        market, ORDERS, directory=self.directory
+                    )
+                writers[market].append(
+                    time.time(),
+                    int(order_id),
+                    SIDES.get(str(order.get("side", "")).upper(), 0),
+                    ORDER_STATUSES.get(str(order.get("status", "")).upper(), UNKNOWN),
+                    float(order.get("price") or 0),
+                    float(order.get("amount") or 0),
+                    float(order.get("filled") or 0),
+                )
+            for writer in writers.values():
+                writer.flush()
+
+
+class RecordingReader:
+    """
+    Reads the recordings of a market. Columns of a day are memory mapped,
+    so nothing is loaded until it is used.
+    """
+
+    def __init__(self, market, directory=None):
+        self.directory = get_market_directory(market, directory)
+
+    def get_days(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(os.listdir(self.directory))
+
+    def read(self, stream, day):
+        """
+        Returns a dict of read only arrays by column name for a stream.
+        """
+        path = os.path.join(self.directory, day)
+        meta_path = os.path.join(path, f"{stream}.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as meta:
+            columns = [
+                (name, np.dtype(dtype), tuple(shape))
+                for name, dtype, shape in json.load(meta)["columns"]
+            ]
+
+        # Rows written completely in every column
+        files = [os.path.join(path, f"{stream}.{name}.bin") for name, _, _ in columns]
+        rows = min(
+            os.path.getsize(file) // (dtype.itemsize * int(np.prod(shape)))
+            for file, (_, dtype, shape) in zip(files, columns)
+        )
+        data = {}
+        for file, (name, dtype, shape) in zip(files, columns):
+            if rows:
+                data[name] = np.memmap(
+                    file, dtype=dtype, mode="r", shape=(rows,) + shape
+                )
+            else:
+                data[name] = np.empty((0,) + shape, dtype=dtype)
+        return data
+
+    def read_days(self, stream, days=None):
+        """
+        Returns the columns of a stream for several days, every day if days
+        is None. A single day is not copied.
+        """
+        days = self.get_days() if days is None else days
+        chunks = [self.read(stream, day) for day in days]
+        chunks = [chunk for chunk in chunks if chunk is not None]
+        if not chunks:
+            return None
+        if len(chunks) == 1:
+            return chunks[0]
+        for name in chunks[0]:
+            if len({chunk[name].shape[1:] for chunk in chunks}) > 1:
+                raise ValueError(f"{stream} {name} shape differs across {days}")
+        return {
+            name: np.concatenate([chunk[name] for chunk in chunks])
+            for name in chunks[0]
+        }
@@ -0,0 +1,208 @@
+import logging
+import os
+import statistics
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import settings
+from trading_bot import bitso_client, metrics, okx_client
+
+# Prices are floats, size is the amount of the left coin at the top of the
+# book and timestamp the time the oldest leg was received
+Quote = namedtuple("Quote", ["bid", "ask", "size", "timestamp"])
+
+VENUES = {
+    settings.BITSO: bitso_client,
+    settings.OKX: okx_client,
+}
+
+
+def get_sources(market):
+    """
+    Sources of a market reference price. Markets without reference price
+    sources use their single price source rule.
+    """
+    sources = settings.REFERENCE_PRICE_SOURCES.get(market)
+    if sources:
+        return sources
+    return [{"venue": settings.PRICE_SOURCE_RULES[market], "market": market}]
+
+
+def _get_legs(source):
+    legs = [(source["venue"], source["market"])]
+    fx = source.get("fx")
+    if fx:
+        legs.append((fx["venue"], fx["market"]))
+    return legs
+
+
+def convert(quote, fx):
+    """
+    Converts a quote to the right coin of the fx quote, e.g. a BTC-USDC
+    quote and a USD-MXN fx quote give a BTC-MXN quote.
+    """
+    return Quote(
+        bid=quote.bid * fx.bid,
+        ask=quote.ask * fx.ask,
+        size=quote.size,
+        timestamp=min(quote.timestamp, fx.timestamp),
+    )
+
+
+def reject_outliers(quotes, max_deviation):
+    """
+    Drops the quotes whose mid price deviates more than max_deviation (in
+    percent) from the median of all of them. With only two quotes there is
+    no majority, so the first (primary) source is kept if they disagree.
+    """
+    if len(quotes) < 2:
+        return quotes
+    mids = [(quote.bid + quote.ask) / 2 for quote in quotes]
+    if len(quotes) == 2:
+        deviation = abs(mids[0] - mids[1]) / mids[0] * 100
+        return quotes if deviation <= max_deviation else quotes[:1]
+    median = statistics.median(mids)
+    return [
+        quote
+        for quote, mid in zip(quotes, mids)
+        if abs(mid - median) / median * 100 <= max_deviation
+    ]
+
+
+def combine(quotes, max_age, now=None):
+    """
+    Averages the quotes weighted by their size and freshness. Quotes
+    without size weigh by freshness only.
+    """
+    now = now or time.time()
+    weights = []
+    for quote in quotes:
+        freshness = max(1 - (now - quote.timestamp) / max_age, 0.0)
+        weights.append(freshness * (quote.size or 1.0))
+    total = sum(weights)
+    if not total:
+        weights = [1.0] * len(quotes)
+        total = len(quotes)
+    return Quote(
+        bid=sum(w * quote.bid for w, quote in zip(weights, quotes)) / total,
+        ask=sum(w * quote.ask for w, quote in zip(weights, quotes)) / total,
+        size=sum(quote.size for quote in quotes),
+        timestamp=min(quote.timestamp for quote in quotes),
+    )
+
+
+class ReferencePrice:
+    """
+    Reference price of a market combined from several venues. Venue quotes
+    (legs) are fetched concurrently and cached for ttl seconds, so a fx leg
+    is shared by every market using it. A slow venue is waited for at most
+    timeout seconds: its request keeps running in the background and its
+    last quote is used until it is older than max_age.
+    """
+
+    def __init__(self, ttl=None, timeout=None, max_age=None, max_deviation=None):
+        self.ttl = ttl or settings.REFERENCE_PRICE_TTL
+        self.timeout = timeout or settings.REFERENCE_PRICE_TIMEOUT
+        self.max_age = max_age or settings.REFERENCE_PRICE_MAX_AGE
+        self.max_deviation = max_deviation or settings.REFERENCE_PRICE_MAX_DEVIATION
+        self.executor = ThreadPoolExecutor(max_workers=settings.HTTP_POOL_SIZE)
+        self.lock = threading.Lock()
+        self.legs = {}
+        self.pending = {}
+        self.results = {}
+
+    def _fetch(self, venue, market):
+        try:
+            result = VENUES[venue].get_quote(market)
+        except Exception as e:
+            metrics.inc("http_errors", "external")
+            logging.error(f"{venue} {market} price query failed. Error: {e}")
+            return
+        if result is None:
+            logging.error(f"{venue} {market} price not available")
+            return
+        with self.lock:
+            self.legs[(venue, market)] = Quote(*result, timestamp=time.time())
+
+    def _refresh(self, legs):
+        now = time.time()
+        futures = []
+        with self.lock:
+            for leg in legs:
+                quote = self.legs.get(leg)
+                if quote is not None and now - quote.timestamp < self.ttl:
+                    continue
+                future = self.pending.get(leg)
+                if future is None or future.done():
+                    future = self.executor.submit(self._fetch, *leg)
+                    self.pending[leg] = future
+                futures.append(future)
+        if futures:
+            wait(futures, timeout=self.timeout)
+
+    def _get_leg(self, leg, now):
+        quote = self.legs.get(leg)
+        if quote is None or now - quote.timestamp > self.max_age:
+            return None
+        return quote
+
+    def get_quote(self, market):
+        """
+        Returns the reference Quote of a market, None if every source is
+        down, stale or rejected.
+        """
+        now = time.time()
+        with self.lock:
+            result, expires = self.results.get(market, (None, 0))
+        if now < expires:
+            return result
+
+        sources = get_sources(market)
+        self._refresh({leg for source in sources for leg in _get_legs(source)})
+
+        now = time.time()
+        quotes = []
+        with self.lock:
+            for source in sources:
+                legs = [self._get_leg(leg, now) for leg in _get_legs(source)]
+                if None in legs:
+                    continue
+                quotes.append(convert(*legs) if len(legs) == 2 else legs[0])
+
+        accepted = reject_outliers(quotes, self.max_deviation)
+        if len(accepted) < len(quotes):
+            logging.warning(
+                f"{len(quotes) - len(accepted)} {market} reference price sources "
+                "rejected as outliers"
+            )
+        if not accepted:
+            return None
+
+        result = combine(accepted, self.max_age, now=now)
+        with self.lock:
+            self.results[market] = (result, now + self.ttl)
+        return result
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Returns the engine of the current process, created on first use so
+    forked processes never share the thread pool.
+    """
+    pid = os.getpid()
+    with _engines_lock:
+        engine = _engines.get(pid)
+        if engine is None:
+            engine = ReferencePrice()
+            _engines[pid] = engine
+    return engine
+
+
+def get_quote(market):
+    return get_engine().get_quote(market.lower())
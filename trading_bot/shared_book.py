@@ -0,0 +1,149 @@
+import time
+from multiprocessing.sharedctypes import RawArray
+
+import numpy as np
+
+import settings
+
+# Header layout
+SEQUENCE = 0
+TIMESTAMP = 1
+ASKS_DEPTH = 2
+BIDS_DEPTH = 3
+HEADER_SIZE = 4
+
+# Level blocks, each one is depth long
+ASKS_P = 0
+ASKS_A = 1
+ASKS_V = 2
+BIDS_P = 3
+BIDS_A = 4
+BIDS_V = 5
+BLOCKS = 6
+
+
+class BookSnapshot:
+    """
+    Consistent copy of a SharedBook. Levels are NumPy views over the copy.
+    """
+
+    def __init__(self, data, depth):
+        self.data = data
+        self.sequence = int(data[SEQUENCE])
+        self.timestamp = data[TIMESTAMP]
+        asks_depth = int(data[ASKS_DEPTH])
+        bids_depth = int(data[BIDS_DEPTH])
+        self.asks_p = self._block(ASKS_P, depth)[:asks_depth]
+        self.asks_a = self._block(ASKS_A, depth)[:asks_depth]
+        self.asks_v = self._block(ASKS_V, depth)[:asks_depth]
+        self.bids_p = self._block(BIDS_P, depth)[:bids_depth]
+        self.bids_a = self._block(BIDS_A, depth)[:bids_depth]
+        self.bids_v = self._block(BIDS_V, depth)[:bids_depth]
+
+    def _block(self, block, depth):
+        start = HEADER_SIZE + block * depth
+        return self.data[start : start + depth]
+
+    def get_age(self):
+        """
+        Seconds since the book was last updated.
+        """
+        return time.time() - self.timestamp
+
+    def to_orderbook(self):
+        """
+        Returns the book as a dict of asks and bids lists, the format of the
+        tauros REST orderbook.
+        """
+        return {
+            "asks": [
+                {"price": price, "amount": amount, "value": value}
+                for price, amount, value in zip(
+                    self.asks_p.tolist(), self.asks_a.tolist(), self.asks_v.tolist()
+                )
+            ],
+            "bids": [
+                {"price": price, "amount": amount, "value": value}
+                for price, amount, value in zip(
+                    self.bids_p.tolist(), self.bids_a.tolist(), self.bids_v.tolist()
+                )
+            ],
+        }
+
+
+class SharedBook:
+    """
+    Orderbook stored in a single contiguous float array guarded by a
+    seqlock: a header with a sequence number, the update timestamp and the
+    depth of each side, followed by price, amount and value blocks for asks
+    and bids.
+
+    There must be a single writer. The sequence is odd while a write is in
+    progress, so readers retry until they copy the array with the same even
+    sequence before and after the copy. Readers never block the writer.
+    """
+
+    def __init__(self, depth=None, shared=True):
+        self.depth = depth or settings.ORDERBOOK_SIZE
+        size = HEADER_SIZE + BLOCKS * self.depth
+        self.buffer = RawArray("d", size) if shared else None
+        self._set_view()
+
+    def _set_view(self):
+        if self.buffer is None:
+            self.array = np.zeros(HEADER_SIZE + BLOCKS * self.depth)
+        else:
+            self.array = np.frombuffer(self.buffer, dtype=np.float64)
+
+    def __getstate__(self):
+        # Only the shared buffer is sent to child processes
+        return {"depth": self.depth, "buffer": self.buffer}
+
+    def __setstate__(self, state):
+        self.depth = state["depth"]
+        self.buffer = state["buffer"]
+        self._set_view()
+
+    def _block(self, block):
+        start = HEADER_SIZE + block * self.depth
+        return self.array[start : start + self.depth]
+
+    def _write_side(self, levels, price_block, amount_block, value_block):
+        levels = levels[: self.depth]
+        count = len(levels)
+        prices = self._block(price_block)
+        amounts = self._block(amount_block)
+        values = self._block(value_block)
+        if count:
+            prices[:count], amounts[:count], values[:count] = zip(*levels)
+        prices[count:] = 0
+        amounts[count:] = 0
+        values[count:] = 0
+        return count
+
+    def write(self, asks, bids):
+        """
+        Replaces the book with asks and bids, sequences of
+        (price, amount, value) tuples sorted from the best level.
+        """
+        array = self.array
+        array[SEQUENCE] += 1
+        array[ASKS_DEPTH] = self._write_side(asks, ASKS_P, ASKS_A, ASKS_V)
+        array[BIDS_DEPTH] = self._write_side(bids, BIDS_P, BIDS_A, BIDS_V)
+        array[TIMESTAMP] = time.time()
+        array[SEQUENCE] += 1
+
+    def snapshot(self):
+        """
+        Returns a consistent BookSnapshot of the book.
+        """
+        array = self.array
+        while True:
+            sequence = array[SEQUENCE]
+            if sequence % 2:
+                # Write in progress
+                time.sleep(0)
+                continue
+            data = array.copy()
+            if array[SEQUENCE] == sequence:
+                return BookSnapshot(data, self.depth)
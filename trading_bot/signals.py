@@ -0,0 +1,203 @@
+import math
+import time
+from multiprocessing import Array
+
+import numpy as np
+
+import settings
+
+TIMESTAMP = 0
+
+# Signals of every window, in percent except ofi (left coin), updates and
+# span (seconds). volatility is the realized volatility of the mid price
+# over the window, mid_return its log return and ofi the order flow
+# imbalance of the top of the book (Cont, Kukanov and Stoikov). span is the
+# time covered by the updates kept, shorter than the window if the book
+# updated faster than SIGNALS_MAX_RATE.
+SIGNALS = (
+    "volatility",
+    "mid_return",
+    "ofi",
+    "spread_mean",
+    "spread_std",
+    "updates",
+    "span",
+)
+
+# Values summed by the rolling windows on every book update
+RETURN = 0
+SQUARED_RETURN = 1
+OFI = 2
+SPREAD = 3
+SQUARED_SPREAD = 4
+
+
+def create_signals_array(windows=None):
+    """
+    Shared memory layout for the signals of a market: [timestamp] followed
+    by the SIGNALS of every window.
+    """
+    windows = windows or settings.SIGNALS_WINDOWS
+    return Array("d", 1 + len(windows) * len(SIGNALS))
+
+
+class RollingWindow:
+    """
+    Sums of the values pushed in the last seconds, kept in a ring buffer of
+    capacity entries. Every push is O(1): the new values are added to the
+    sums and the expired ones subtracted. Sums are recomputed from the
+    buffer once per capacity pushes so rounding errors do not accumulate.
+    """
+
+    def __init__(self, seconds, capacity, fields):
+        self.seconds = seconds
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity)
+        self.values = np.zeros((capacity, fields))
+        self.sums = np.zeros(fields)
+        self.head = 0
+        self.size = 0
+        self.pushes = 0
+
+    def _pop(self):
+        self.sums -= self.values[self.head]
+        self.head = (self.head + 1) % self.capacity
+        self.size -= 1
+
+    def push(self, timestamp, values):
+        if self.size == self.capacity:
+            self._pop()
+        index = (self.head + self.size) % self.capacity
+        self.timestamps[index] = timestamp
+        self.values[index] = values
+        self.sums += self.values[index]
+        self.size += 1
+        while self.size and self.timestamps[self.head] <= timestamp - self.seconds:
+            self._pop()
+
+        self.pushes += 1
+        if self.pushes % self.capacity == 0:
+            indexes = (self.head + np.arange(self.size)) % self.capacity
+            self.sums = self.values[indexes].sum(axis=0)
+
+    def get_span(self, timestamp):
+        """
+        Seconds covered by the values kept. Once the buffer is full values
+        are evicted before they expire, so it can be less than seconds.
+        """
+        if self.size < self.capacity:
+            return self.seconds
+        return timestamp - self.timestamps[self.head]
+
+
+class BookSignals:
+    """
+    Incremental signals of a market computed from every update of the
+    orderbook feed and published in shared memory, so bots read them
+    without recomputing anything from history.
+    """
+
+    def __init__(self, signals, windows=None, max_rate=None):
+        self.signals = signals
+        # Windows keep max_rate updates per second of their length
+        max_rate = max_rate or settings.SIGNALS_MAX_RATE
+        self.windows = [
+            RollingWindow(
+                seconds,
+                max(math.ceil(seconds * max_rate), 1),
+                fields=SQUARED_SPREAD + 1,
+            )
+            for seconds in windows or settings.SIGNALS_WINDOWS
+        ]
+        self.last_top = None
+
+    def _get_ofi(self, top):
+        bid, bid_amount, ask, ask_amount = top
+        last_bid, last_bid_amount, last_ask, last_ask_amount = self.last_top
+        ofi = 0.0
+        if bid >= last_bid:
+            ofi += bid_amount
+        if bid <= last_bid:
+            ofi -= last_bid_amount
+        if ask <= last_ask:
+            ofi -= ask_amount
+        if ask >= last_ask:
+            ofi += last_ask_amount
+        return ofi
+
+    def update(self, asks, bids, timestamp=None):
+        """
+        Takes the (price, amount, value) levels of the book after an update.
+        """
+        if not asks or not bids:
+            return
+        timestamp = timestamp or time.time()
+        top = (bids[0][0], bids[0][1], asks[0][0], asks[0][1])
+        mid = (top[0] + top[2]) / 2
+        spread = (top[2] - top[0]) / mid * 100
+        if self.last_top is None:
+            mid_return = ofi = 0.0
+        else:
+            last_mid = (self.last_top[0] + self.last_top[2]) / 2
+            mid_return = math.log(mid / last_mid) * 100
+            ofi = self._get_ofi(top)
+        self.last_top = top
+
+        values = (mid_return, mid_return**2, ofi, spread, spread**2)
+        published = [timestamp]
+        for window in self.windows:
+            window.push(timestamp, values)
+            sums = window.sums
+            updates = window.size
+            spread_mean = sums[SPREAD] / updates
+            spread_variance = max(sums[SQUARED_SPREAD] / updates - spread_mean**2, 0)
+            published += [
+                math.sqrt(max(sums[SQUARED_RETURN], 0)),
+                sums[RETURN],
+                sums[OFI],
+                spread_mean,
+                math.sqrt(spread_variance),
+                updates,
+                window.get_span(timestamp),
+            ]
+
+        with self.signals.get_lock():
+            self.signals[:] = published
+
+
+def get_signals(raw_signals, window=None, windows=None, max_age=None):
+    """
+    Reads the signals of a window (in seconds, the first one by default)
+    published by BookSignals. Returns a dict of SIGNALS, None if no
+    signals have been published yet or if they are stale.
+    """
+    windows = list(windows or settings.SIGNALS_WINDOWS)
+    if max_age is None:
+        max_age = settings.SIGNALS_MAX_AGE
+    index = windows.index(window) if window is not None else 0
+    offset = 1 + index * len(SIGNALS)
+    with raw_signals.get_lock():
+        timestamp = raw_signals[TIMESTAMP]
+        values = raw_signals[offset : offset + len(SIGNALS)]
+
+    if not timestamp or time.time() - timestamp > max_age:
+        return None
+    return dict(zip(SIGNALS, values))
+
+
+def get_spread(config, market_data, spread=None):
+    """
+    Spread of a bot, spread or its configured one widened by
+    volatility_spread times the volatility (in percent) of its
+    signals_window. Static if the bot sets no volatility_spread or the
+    signals are not available.
+    """
+    if spread is None:
+        spread = config["spread"]
+    multiplier = config.get("volatility_spread")
+    if not multiplier:
+        return spread
+    signals = get_signals(market_data["signals"], window=config.get("signals_window"))
+    if signals is None:
+        return spread
+    return spread + multiplier * signals["volatility"]
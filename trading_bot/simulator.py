@@ -0,0 +1,668 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+from bisect import bisect_left, insort
+from collections import deque
+
+import numpy as np
+from aiohttp import WSMsgType, web
+
+import settings
+from trading_bot.tauros_api import NONCE_ERROR_MSG, PreparedRequest, TaurosPrivate
+
+# Account of the synthetic liquidity, its balances are not tracked
+LIQUIDITY = "liquidity"
+# Latest reaction times kept for the stats percentiles
+REACTION_TIMES_SIZE = 10000
+
+
+class SimulatedBook:
+    """
+    Price-time priority book of a market. Each side is a list of
+    (sorting price, order number, order id) kept sorted with bisect, bids by
+    negated price, and the total amount per price level is kept to publish
+    websocket diffs of the levels changed.
+    """
+
+    def __init__(self, market):
+        self.market = market
+        self.sides = {"BUY": [], "SELL": []}
+        self.levels = {"BUY": {}, "SELL": {}}
+        self.changed = {"BUY": set(), "SELL": set()}
+        self.sequence = 0
+
+    def _get_key(self, order):
+        sign = -1 if order["side"] == "BUY" else 1
+        return (sign * order["price"], order["number"], order["id"])
+
+    def _change_level(self, side, price, amount):
+        levels = self.levels[side]
+        levels[price] = levels.get(price, 0.0) + amount
+        if levels[price] <= 1e-12:
+            del levels[price]
+        self.changed[side].add(price)
+
+    def add(self, order):
+        insort(self.sides[order["side"]], self._get_key(order))
+        self._change_level(order["side"], order["price"], order["remaining"])
+
+    def remove(self, order):
+        side = self.sides[order["side"]]
+        key = self._get_key(order)
+        index = bisect_left(side, key)
+        if index < len(side) and side[index] == key:
+            del side[index]
+            self._change_level(order["side"], order["price"], -order["remaining"])
+
+    def fill(self, order, amount):
+        self._change_level(order["side"], order["price"], -amount)
+
+    def get_best(self, side):
+        entries = self.sides[side]
+        return entries[0][2] if entries else None
+
+    def get_levels(self, side):
+        prices = sorted(self.levels[side], reverse=side == "BUY")
+        return [(price, self.levels[side][price]) for price in prices]
+
+    def pop_changes(self):
+        """
+        Returns the changed levels since the last call, as websocket diff
+        entries of asks and bids, and increases the sequence.
+        """
+        changes = []
+        for side in ("SELL", "BUY"):
+            levels = self.levels[side]
+            changes.append(
+                [
+                    {
+                        "p": price,
+                        "a": levels.get(price, 0.0),
+                        "v": price * levels.get(price, 0.0),
+                    }
+                    for price in sorted(self.changed[side])
+                ]
+            )
+            self.changed[side].clear()
+        if changes[0] or changes[1]:
+            self.sequence += 1
+        return changes
+
+
+class Exchange:
+    """
+    Matching engine and accounts of the simulator. Orders are matched at the
+    resting order price, balances are locked while orders are open.
+    """
+
+    def __init__(self, markets, balances):
+        self.books = {market: SimulatedBook(market) for market in markets}
+        self.orders = {}
+        self.accounts = {}
+        self.initial_balances = balances
+        self.ids = itertools.count(1)
+        self.on_order = None
+        self.on_balance = None
+
+    def get_balances(self, account):
+        if account not in self.accounts:
+            self.accounts[account] = {
+                coin: {"available": amount, "frozen": 0.0}
+                for coin, amount in self.initial_balances.items()
+            }
+        return self.accounts[account]
+
+    def _move(self, account, coin, available=0.0, frozen=0.0):
+        if account == LIQUIDITY:
+            return
+        balance = self.get_balances(account).setdefault(
+            coin, {"available": 0.0, "frozen": 0.0}
+        )
+        balance["available"] += available
+        balance["frozen"] += frozen
+        if self.on_balance is not None:
+            self.on_balance(account, coin, balance)
+
+    def _get_lock(self, order, amount):
+        left_coin, right_coin = order["market"].split("-")
+        if order["side"] == "BUY":
+            return right_coin, amount * order["price"]
+        return left_coin, amount
+
+    def _notify(self, order):
+        if self.on_order is not None and order["account"] != LIQUIDITY:
+            self.on_order(order)
+
+    def place_order(self, account, market, side, price, amount):
+        """
+        Places a limit order, matching it against the book first.
+        Returns the order or an error message.
+        """
+        market = market.lower()
+        if market not in self.books:
+            return None, f"Market {market} not available"
+        if price <= 0 or amount <= 0:
+            return None, "'amount' field must be greater than zero"
+        order = {
+            "id": next(self.ids),
+            "number": time.monotonic_ns(),
+            "account": account,
+            "market": market,
+            "side": side,
+            "price": price,
+            "amount": amount,
+            "remaining": amount,
+            "filled": 0.0,
+            "status": "OPEN",
+            "created_at": time.time(),
+        }
+        coin, lock = self._get_lock(order, amount)
+        if account != LIQUIDITY:
+            balance = self.get_balances(account).get(coin, {"available": 0.0})
+            if balance["available"] < lock:
+                return None, f"Your wallet has not enough {coin.upper()}"
+        self._move(account, coin, available=-lock, frozen=lock)
+
+        self._match(order)
+        if order["remaining"] > 1e-12:
+            self.orders[order["id"]] = order
+            self.books[market].add(order)
+        self._notify(order)
+        return order, None
+
+    def _match(self, order):
+        book = self.books[order["market"]]
+        opposite = "SELL" if order["side"] == "BUY" else "BUY"
+        while order["remaining"] > 1e-12:
+            resting_id = book.get_best(opposite)
+            if resting_id is None:
+                return
+            resting = self.orders[resting_id]
+            if order["side"] == "BUY" and resting["price"] > order["price"]:
+                return
+            if order["side"] == "SELL" and resting["price"] < order["price"]:
+                return
+            amount = min(order["remaining"], resting["remaining"])
+            book.fill(resting, amount)
+            self._fill(resting, amount, resting["price"])
+            self._fill(order, amount, resting["price"])
+            if resting["remaining"] <= 1e-12:
+                book.remove(resting)
+                del self.orders[resting_id]
+            self._notify(resting)
+
+    def _fill(self, order, amount, price):
+        order["remaining"] -= amount
+        order["filled"] += amount
+        order["status"] = (
+            "FILLED" if order["remaining"] <= 1e-12 else "PARTIALLY_FILLED"
+        )
+        left_coin, right_coin = order["market"].split("-")
+        account = order["account"]
+        if order["side"] == "BUY":
+            locked = amount * order["price"]
+            self._move(
+                account, right_coin, available=locked - amount * price, frozen=-locked
+            )
+            self._move(account, left_coin, available=amount)
+        else:
+            self._move(account, left_coin, frozen=-amount)
+            self._move(account, right_coin, available=amount * price)
+
+    def close_order(self, account, order_id):
+        order = self.orders.get(order_id)
+        if order is None or order["account"] != account:
+            return None, f"Order {order_id} not found"
+        self.books[order["market"]].remove(order)
+        del self.orders[order_id]
+        coin, lock = self._get_lock(order, order["remaining"])
+        self._move(account, coin, available=lock, frozen=-lock)
+        order["status"] = "CLOSED"
+        self._notify(order)
+        return order, None
+
+    def get_open_orders(self, account, market=None):
+        return [
+            order
+            for order in self.orders.values()
+            if order["account"] == account
+            and (market is None or order["market"] == market.lower())
+        ]
+
+
+def format_order(order):
+    return {
+        "id": order["id"],
+        "order_id": order["id"],
+        "market": order["market"].upper(),
+        "side": order["side"],
+        "price": str(order["price"]),
+        "amount": str(order["amount"]),
+        "filled": str(order["filled"]),
+        "status": order["status"],
+        "created_at": order["created_at"],
+    }
+
+
+class Simulator:
+    """
+    Local stand-in of the tauros REST API and websocket used by the bots:
+    placeorder, closeorder, myopenorders, getbalance and the public
+    orderbook, plus the orderbook, orders and balances websocket channels.
+
+    Requests are authenticated with the same signature and nonce rules as
+    the real API and answered after latency seconds (plus up to jitter).
+    Synthetic liquidity is quoted around a random walk mid price, so the
+    bots orders are filled when the market moves through them.
+
+    Point the bots to it with TAUROS_API_URL and TAUROS_WS_URL.
+    """
+
+    def __init__(
+        self,
+        accounts,
+        markets,
+        balances,
+        latency=0.0,
+        jitter=0.0,
+        tick_interval=1.0,
+        volatility=0.0005,
+        liquidity_levels=10,
+    ):
+        self.clients = {
+            key: TaurosPrivate(key=key, secret=secret)
+            for key, secret in accounts.items()
+        }
+        self.last_nonces = {key: 0 for key in accounts}
+        self.exchange = Exchange(markets, balances)
+        self.exchange.on_order = self._on_order
+        self.exchange.on_balance = self._on_balance
+        self.mid_prices = dict(markets)
+        self.liquidity = {market: [] for market in markets}
+        self.latency = latency
+        self.jitter = jitter
+        self.tick_interval = tick_interval
+        self.volatility = volatility
+        self.liquidity_levels = liquidity_levels
+
+        self.book_subscribers = {market: set() for market in markets}
+        self.user_subscribers = {}
+        self.outboxes = {}
+        self.published_at = {market: 0.0 for market in markets}
+        # Seconds from a book publication to the next order of the market
+        self.reaction_times = deque(maxlen=REACTION_TIMES_SIZE)
+        self.requests = 0
+        self.orders = 0
+
+    async def _sleep_latency(self):
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def _authenticate(self, key, signature, nonce, path, body, method):
+        """
+        Checks the signature of a request over body, the bytes received, and
+        its nonce. Returns the error message, None if it is valid.
+        """
+        client = self.clients.get(key)
+        if client is None:
+            return "Invalid API key"
+        try:
+            nonce = int(nonce)
+        except (TypeError, ValueError):
+            return NONCE_ERROR_MSG
+        expected = client._sign(PreparedRequest(path, body, method=method), nonce)
+        if signature != expected:
+            return "Invalid signature"
+        if nonce <= self.last_nonces[key]:
+            return NONCE_ERROR_MSG
+        self.last_nonces[key] = nonce
+        return None
+
+    async def _private(self, request, handler):
+        self.requests += 1
+        await self._sleep_latency()
+        body = await request.read()
+        data = {}
+        if request.method == "POST":
+            try:
+                data = json.loads(body or b"{}")
+            except ValueError:
+                return web.json_response(
+                    {"success": False, "msg": "Invalid JSON"}, status=400
+                )
+        key = request.headers.get("Authorization", "").replace("Bearer ", "")
+        error = self._authenticate(
+            key,
+            request.headers.get("Taur-Signature"),
+            request.headers.get("Taur-Nonce"),
+            request.path,
+            body,
+            request.method.lower(),
+        )
+        if error is not None:
+            return web.json_response({"success": False, "msg": error}, status=401)
+
+        response = handler(key, data, request.query)
+        self._publish_books()
+        return web.json_response(response, status=200 if response["success"] else 400)
+
+    def _place_order(self, account, data, query):
+        try:
+            price = float(data["price"])
+            amount = float(data["amount"])
+        except (KeyError, TypeError, ValueError):
+            return {
+                "success": False,
+                "msg": ["'amount' field must be greater than zero"],
+            }
+        if data.get("is_amount_value"):
+            amount = amount / price
+        market = str(data.get("market", "")).lower()
+        if market in self.published_at:
+            self.orders += 1
+            self.reaction_times.append(time.time() - self.published_at[market])
+        order, error = self.exchange.place_order(
+            account, market, str(data.get("side", "")).upper(), price, amount
+        )
+        if error is not None:
+            return {"success": False, "msg": [error]}
+        return {"success": True, "data": format_order(order)}
+
+    def _close_order(self, account, data, query):
+        order, error = self.exchange.close_order(account, data.get("id"))
+        if error is not None:
+            return {"success": False, "msg": error}
+        return {"success": True, "data": format_order(order)}
+
+    def _get_orders(self, account, data, query):
+        orders = self.exchange.get_open_orders(account, query.get("market"))
+        return {"success": True, "data": [format_order(order) for order in orders]}
+
+    def _get_balance(self, account, data, query):
+        coin = query.get("coin", "").lower()
+        balance = self.exchange.get_balances(account).get(
+            coin, {"available": 0.0, "frozen": 0.0}
+        )
+        return {
+            "success": True,
+            "data": {
+                "coin": coin,
+                "balances": {
+                    "available": str(balance["available"]),
+                    "frozen": str(balance["frozen"]),
+                },
+            },
+        }
+
+    async def get_orderbook(self, request):
+        self.requests += 1
+        await self._sleep_latency()
+        market = request.match_info["market"].lower()
+        book = self.exchange.books.get(market)
+        if book is None:
+            return web.json_response(
+                {"success": False, "msg": "Market not found"}, status=404
+            )
+        self._publish_books()
+        return web.json_response(
+            {
+                "success": True,
+                "payload": {
+                    "asks": [
+                        {"price": price, "amount": amount, "value": price * amount}
+                        for price, amount in book.get_levels("SELL")
+                    ],
+                    "bids": [
+                        {"price": price, "amount": amount, "value": price * amount}
+                        for price, amount in book.get_levels("BUY")
+                    ],
+                    "sequence": book.sequence,
+                },
+            }
+        )
+
+    async def get_stats(self, request):
+        reaction_times = np.array(self.reaction_times)
+        stats = {"requests": self.requests, "orders": self.orders}
+        if len(reaction_times):
+            stats["reaction_p50"] = float(np.percentile(reaction_times, 50))
+            stats["reaction_p99"] = float(np.percentile(reaction_times, 99))
+        return web.json_response(stats)
+
+    def _send(self, ws, message):
+        outbox = self.outboxes.get(ws)
+        if outbox is None:
+            return
+        # Messages keep their order, so jitter never reorders book diffs
+        deliver_at = max(
+            time.monotonic() + self.latency + random.uniform(0, self.jitter),
+            outbox["last"],
+        )
+        outbox["last"] = deliver_at
+        outbox["queue"].put_nowait((deliver_at, message))
+
+    async def _deliver(self, ws, queue):
+        while not ws.closed:
+            deliver_at, message = await queue.get()
+            delay = deliver_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await ws.send_str(message)
+
+    def _publish_books(self):
+        for market, book in self.exchange.books.items():
+            asks, bids = book.pop_changes()
+            if not asks and not bids:
+                continue
+            self.published_at[market] = time.time()
+            message = json.dumps(
+                {
+                    "channel": "orderbook",
+                    "market": market.upper(),
+                    "type": "update",
+                    "sequence": book.sequence,
+                    "data": {"asks": asks, "bids": bids},
+                }
+            )
+            for ws in self.book_subscribers[market]:
+                self._send(ws, message)
+
+    def _send_snapshot(self, ws, market):
+        book = self.exchange.books[market]
+        self._publish_books()
+        ws_levels = [
+            [
+                {"p": price, "a": amount, "v": price * amount}
+                for price, amount in book.get_levels(side)
+            ]
+            for side in ("SELL", "BUY")
+        ]
+        self._send(
+            ws,
+            json.dumps(
+                {
+                    "channel": "orderbook",
+                    "market": market.upper(),
+                    "type": "snapshot",
+                    "sequence": book.sequence,
+                    "data": {"asks": ws_levels[0], "bids": ws_levels[1]},
+                }
+            ),
+        )
+
+    def _on_order(self, order):
+        message = json.dumps({"channel": "orders", "data": format_order(order)})
+        for ws in self.user_subscribers.get(order["account"], {}).get("orders", ()):
+            self._send(ws, message)
+
+    def _on_balance(self, account, coin, balance):
+        message = json.dumps(
+            {
+                "channel": "balances",
+                "data": {"coin": coin, "available": balance["available"]},
+            }
+        )
+        for ws in self.user_subscribers.get(account, {}).get("balances", ()):
+            self._send(ws, message)
+
+    async def websocket(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        queue = asyncio.Queue()
+        self.outboxes[ws] = {"queue": queue, "last": 0.0}
+        deliver = asyncio.ensure_future(self._deliver(ws, queue))
+        account = None
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                msg = json.loads(message.data)
+                action = msg.get("action")
+                if action == "authenticate":
+                    error = self._authenticate(
+                        msg.get("key"),
+                        msg.get("signature"),
+                        msg.get("nonce"),
+                        "/ws/auth/",
+                        b"{}",
+                        "get",
+                    )
+                    if error is None:
+                        account = msg.get("key")
+                    self._send(
+                        ws,
+                        json.dumps(
+                            {"action": action, "success": error is None, "msg": error}
+                        ),
+                    )
+                elif action == "subscribe" and msg.get("channel") == "orderbook":
+                    market = str(msg.get("market", "")).lower()
+                    if market in self.book_subscribers:
+                        self.book_subscribers[market].add(ws)
+                        self._send_snapshot(ws, market)
+                elif action == "subscribe" and account is not None:
+                    channels = self.user_subscribers.setdefault(account, {})
+                    channels.setdefault(msg.get("channel"), set()).add(ws)
+        finally:
+            deliver.cancel()
+            del self.outboxes[ws]
+            for subscribers in self.book_subscribers.values():
+                subscribers.discard(ws)
+            for channels in self.user_subscribers.values():
+                for subscribers in channels.values():
+                    subscribers.discard(ws)
+        return ws
+
+    def _quote_liquidity(self, market):
+        """
+        Replaces the synthetic orders of a market around its mid price. The
+        new orders take any order of the bots they cross.
+        """
+        for order_id in self.liquidity[market]:
+            self.exchange.close_order(LIQUIDITY, order_id)
+        mid = self.mid_prices[market]
+        orders = []
+        for level in range(1, self.liquidity_levels + 1):
+            for side, sign in (("SELL", 1), ("BUY", -1)):
+                price = round(mid * (1 + sign * level * 0.0005), 2)
+                amount = random.uniform(0.5, 2) * 1000 / price
+                order, _ = self.exchange.place_order(
+                    LIQUIDITY, market, side, price, amount
+                )
+                if order["remaining"] > 1e-12:
+                    orders.append(order["id"])
+        self.liquidity[market] = orders
+
+    async def move_market(self):
+        while True:
+            for market in self.mid_prices:
+                self.mid_prices[market] *= 1 + random.gauss(0, self.volatility)
+                self._quote_liquidity(market)
+            self._publish_books()
+            await asyncio.sleep(self.tick_interval)
+
+    def private_route(self, handler):
+        async def route(request):
+            return await self._private(request, handler)
+
+        return route
+
+    def create_app(self):
+        app = web.Application()
+        app.router.add_post(
+            "/api/v1/trading/placeorder/", self.private_route(self._place_order)
+        )
+        app.router.add_post(
+            "/api/v1/trading/closeorder/", self.private_route(self._close_order)
+        )
+        app.router.add_get(
+            "/api/v1/trading/myopenorders/", self.private_route(self._get_orders)
+        )
+        app.router.add_get(
+            "/api/v1/data/getbalance/", self.private_route(self._get_balance)
+        )
+        app.router.add_get("/api/v2/trading/{market}/orderbook/", self.get_orderbook)
+        app.router.add_get("/sim/stats/", self.get_stats)
+        app.router.add_get("/", self.websocket)
+
+        async def start_market(app):
+            app["market_task"] = asyncio.ensure_future(self.move_market())
+
+        async def stop_market(app):
+            app["market_task"].cancel()
+
+        app.on_startup.append(start_market)
+        app.on_cleanup.append(stop_market)
+        return app
+
+
+def parse_pairs(values, cast=float):
+    pairs = {}
+    for value in values or []:
+        key, _, pair_value = value.partition("=")
+        pairs[key.lower()] = cast(pair_value)
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local tauros exchange simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="In seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="In seconds")
+    parser.add_argument(
+        "--market",
+        action="append",
+        help="Market and initial mid price, e.g. btc-mxn=800000",
+    )
+    parser.add_argument(
+        "--balance",
+        action="append",
+        help="Initial balance of every account, e.g. mxn=1000000",
+    )
+    parser.add_argument("--tick", type=float, default=1.0, help="In seconds")
+    parser.add_argument("--volatility", type=float, default=0.0005)
+    args = parser.parse_args()
+
+    markets = parse_pairs(args.market) or {"btc-mxn": 800_000.0}
+    balances = parse_pairs(args.balance) or {"btc": 10.0, "mxn": 10_000_000.0}
+    simulator = Simulator(
+        accounts={settings.TAUR_API_KEY: settings.TAUR_API_SECRET},
+        markets=markets,
+        balances=balances,
+        latency=args.latency,
+        jitter=args.jitter,
+        tick_interval=args.tick,
+        volatility=args.volatility,
+    )
+    web.run_app(simulator.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(message)s", level=logging.INFO)
+    main()
@@ -0,0 +1,199 @@
+import logging
+import math
+import time
+from decimal import Decimal
+from multiprocessing import Array
+
+import settings
+from trading_bot import price_feed
+from trading_bot.book_query import BookQuery
+
+# Bot configs using the pricing engine of their market
+STRATEGIES = ("inventory",)
+
+BID = 0
+ASK = 1
+RESERVATION = 2
+TIMESTAMP = 3
+
+
+def create_quote_array():
+    """
+    Shared memory layout for the quote of a market pricing engine:
+    [bid, ask, reservation price, timestamp].
+    """
+    return Array("d", 4)
+
+
+def get_quote_prices(
+    mid,
+    half_spread,
+    inventory,
+    variance,
+    imbalance,
+    risk_aversion,
+    horizon,
+    intensity,
+    imbalance_skew,
+):
+    """
+    Avellaneda-Stoikov quote around mid, in relative terms. The reservation
+    price moves against the inventory (-1 to 1) and with the book imbalance
+    (-1 to 1). The half spread is the optimal one, but never tighter than
+    half_spread. Returns (bid, ask, reservation).
+    """
+    risk = risk_aversion * variance * horizon
+    reservation = mid * (1 - inventory * risk + imbalance * imbalance_skew)
+    optimal = risk / 2 + math.log(1 + risk_aversion / intensity) / risk_aversion
+    half_spread = max(optimal, half_spread)
+    return reservation * (1 - half_spread), reservation * (1 + half_spread), reservation
+
+
+class InventoryStrategy:
+    """
+    Pricing engine of a market shared by its buy and sell bots. On every
+    notification of the market event, or after refresh_rate seconds, it
+    skews the external price by the inventory held in the shared balances,
+    the volatility of the external mid price and the imbalance of the
+    tauros book, and publishes the bid and ask in shared memory, so every
+    bot of the market prices from the same computation. The event is
+    notified after every update that changes the quote.
+
+    Volatility is the variance per second of the external mid price log
+    returns, averaged with an exponential decay of volatility_half_life
+    seconds.
+    """
+
+    def __init__(
+        self,
+        market,
+        market_data,
+        balances,
+        refresh_rate=None,
+        risk_aversion=None,
+        horizon=None,
+        intensity=None,
+        imbalance_skew=None,
+        imbalance_levels=None,
+        target_inventory=None,
+        volatility_half_life=None,
+    ):
+        self.market = market.lower()
+        self.left_coin, self.right_coin = self.market.split("-")
+        self.market_data = market_data
+        self.balances = balances
+        self.refresh_rate = refresh_rate or settings.STRATEGY_REFRESH_RATE
+        self.risk_aversion = risk_aversion or settings.STRATEGY_RISK_AVERSION
+        self.horizon = horizon or settings.STRATEGY_HORIZON
+        self.intensity = intensity or settings.STRATEGY_ORDER_INTENSITY
+        if imbalance_skew is None:
+            imbalance_skew = settings.STRATEGY_IMBALANCE_SKEW
+        self.imbalance_skew = imbalance_skew / 100
+        self.imbalance_levels = imbalance_levels or settings.STRATEGY_IMBALANCE_LEVELS
+        if target_inventory is None:
+            target_inventory = settings.STRATEGY_TARGET_INVENTORY
+        self.target_inventory = target_inventory
+        self.volatility_half_life = (
+            volatility_half_life or settings.STRATEGY_VOLATILITY_HALF_LIFE
+        )
+        self.variance = 0.0
+        self.last_mid = None
+        self.last_timestamp = 0.0
+
+    def connect(self):
+        event = self.market_data["event"]
+        while True:
+            self.update()
+            with event:
+                event.wait(timeout=self.refresh_rate)
+
+    def update_variance(self, mid, timestamp):
+        if self.last_mid is not None and timestamp > self.last_timestamp:
+            elapsed = timestamp - self.last_timestamp
+            squared_return = math.log(mid / self.last_mid) ** 2
+            decay = math.exp(-elapsed * math.log(2) / self.volatility_half_life)
+            self.variance = decay * self.variance + (1 - decay) * (
+                squared_return / elapsed
+            )
+        self.last_mid = mid
+        self.last_timestamp = timestamp
+
+    def get_inventory(self, mid):
+        """
+        Deviation of the share of value held in the left coin from the
+        target, from -1 to 1. Zero if the balances are not known yet.
+        """
+        left = self.balances.get_total(self.left_coin)
+        right = self.balances.get_total(self.right_coin)
+        if left is None or right is None or not left * mid + right:
+            return 0.0
+        share = left * mid / (left * mid + right)
+        return (share - self.target_inventory) / max(
+            self.target_inventory, 1 - self.target_inventory
+        )
+
+    def update(self):
+        raw_price = self.market_data["price"]
+        with raw_price.get_lock():
+            external_bid = raw_price[price_feed.BID]
+            external_ask = raw_price[price_feed.ASK]
+            timestamp = raw_price[price_feed.TIMESTAMP]
+            source_timestamp = raw_price[price_feed.SOURCE_TIMESTAMP]
+        if not external_bid or not external_ask:
+            return
+
+        mid = (external_bid + external_ask) / 2
+        self.update_variance(mid, timestamp)
+        book = BookQuery.from_snapshot(self.market_data["orderbook"].snapshot())
+        bid, ask, reservation = get_quote_prices(
+            mid=mid,
+            half_spread=(external_ask - external_bid) / 2 / mid,
+            inventory=self.get_inventory(mid),
+            variance=self.variance,
+            imbalance=book.get_imbalance(levels=self.imbalance_levels),
+            risk_aversion=self.risk_aversion,
+            horizon=self.horizon,
+            intensity=self.intensity,
+            imbalance_skew=self.imbalance_skew,
+        )
+
+        quote = self.market_data["quote"]
+        with quote.get_lock():
+            changed = quote[BID] != bid or quote[ASK] != ask
+            # Quotes are as old as the external price they come from
+            quote[:] = [bid, ask, reservation, source_timestamp]
+
+        if changed:
+            logging.debug(
+                f"{self.market} strategy quote: bid {bid:.2f}, ask {ask:.2f}, "
+                f"reservation {reservation:.2f}"
+            )
+            event = self.market_data["event"]
+            with event:
+                event.notify_all()
+
+
+def get_price(raw_quote, ask=True, max_age=None):
+    """
+    Reads the quote published by an InventoryStrategy.
+    Returns None if no quote has been published yet or if it is stale.
+    """
+    if max_age is None:
+        max_age = settings.EXTERNAL_PRICE_MAX_AGE
+    with raw_quote.get_lock():
+        price = raw_quote[ASK] if ask else raw_quote[BID]
+        timestamp = raw_quote[TIMESTAMP]
+
+    if not price or time.time() - timestamp > max_age:
+        return None
+    return Decimal(str(price))
+
+
+def get_reference_price(config, market_data, ask=True):
+    """
+    Reference price of a bot: the quote of its market pricing engine if
+    its config uses a strategy, the external price otherwise.
+    """
+    if config.get("strategy") in STRATEGIES:
+        return get_price(market_data["quote"], ask=ask)
+    return price_feed.get_price(market_data["price"], ask=ask)
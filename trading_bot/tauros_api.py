@@ -1,3 +1,5 @@
+import aiohttp
+import asyncio
 import requests
 import logging
 import json
@@ -6,56 +8,167 @@ import hmac
 import hashlib
 import base64
 import simplejson
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
+from multiprocessing import Value
 import websocket
 import ssl
+import settings
+from trading_bot.book_engine import BookEngine
+from trading_bot import metrics
+from trading_bot.book_query import BookQuery
+from trading_bot.http_session import get_session
+from trading_bot.nonce import NonceGenerator
+
+try:
+    import orjson
+
+    json_loads = orjson.loads
+except ImportError:
+    # orjson is optional, it only makes websocket frames faster to decode
+    json_loads = json.loads
+
+NONCE_ERROR_MSG = "Provided nonce it is not valid."
+
+
+def is_nonce_rejected(response):
+    return isinstance(response, dict) and response.get("msg") == NONCE_ERROR_MSG
+
+
+PLACE_ORDER_PATH = "/api/v1/trading/placeorder/"
+CLOSE_ORDER_PATH = "/api/v1/trading/closeorder/"
+
+# Bot cycle stage timed for each private endpoint
+REQUEST_STAGES = {
+    PLACE_ORDER_PATH: "place_order",
+    CLOSE_ORDER_PATH: "close_order",
+    "/api/v1/data/getbalance/": "wallet",
+}
+
+
+def get_api_url(prod=True):
+    if settings.TAUROS_API_URL:
+        return settings.TAUROS_API_URL.rstrip("/")
+    return "https://api.tauros.io" if prod else "https://api.staging.tauros.io"
+
+
+def get_ws_url(prod=True):
+    if settings.TAUROS_WS_URL:
+        return settings.TAUROS_WS_URL
+    return "wss://ws.tauros.io" if prod else "wss://ws-staging.tauros.io"
+
+
+class PreparedRequest:
+    """
+    Request whose body is serialized once into the bytes that are both
+    signed and sent. Only the nonce is added when it is signed.
+    """
+
+    __slots__ = ("path", "method", "body", "message")
+
+    def __init__(self, path, body, method="post"):
+        self.path = path
+        self.method = method
+        self.body = body
+        # Signed message after the nonce
+        self.message = method.upper().encode() + path.encode() + body
 
 
 class TaurosPrivate:
-    def __init__(self, key, secret, prod=True):
+    def __init__(self, key, secret, prod=True, nonce_generator=None):
         self.key = key
         self.secret = secret
-        self.base_url = (
-            "https://api.tauros.io" if prod else "https://api.staging.tauros.io"
-        )
+        # Shared by every process forked after creating the client
+        self.nonce_generator = nonce_generator or NonceGenerator()
+        self.base_url = get_api_url(prod)
+        # Keyed once, every signature works on a copy
+        self.hmac = hmac.new(base64.b64decode(secret), digestmod=hashlib.sha512)
+        self.headers = {
+            "Authorization": "Bearer {}".format(key),
+            "Content-Type": "application/json",
+        }
+        # Close requests of the orders placed, ready to be signed
+        self.close_templates = OrderedDict()
+
+    def prepare(self, path, data, method="post"):
+        body = json.dumps(data, separators=(",", ":")).encode()
+        return PreparedRequest(path, body, method=method)
+
+    def _sign(self, prepared, nonce):
+        api_sha256 = hashlib.sha256(str(nonce).encode() + prepared.message).digest()
+        api_hmac = self.hmac.copy()
+        api_hmac.update(api_sha256)
+        return base64.b64encode(api_hmac.digest()).decode()
 
     def _get_signature(self, path, data, nonce, method="post"):
-        request_data = json.dumps(data, separators=(",", ":"))
-        message = str(nonce) + method.upper() + path + str(request_data)
-        api_sha256 = hashlib.sha256(message.encode()).digest()
-        api_hmac = hmac.new(base64.b64decode(self.secret), api_sha256, hashlib.sha512)
-        api_signature = base64.b64encode(api_hmac.digest())
-        signature = api_signature.decode()
-        return signature
+        return self._sign(self.prepare(path, data, method=method), nonce)
+
+    def _get_headers(self, prepared, nonce):
+        headers = self.headers.copy()
+        headers["Taur-Signature"] = self._sign(prepared, nonce)
+        headers["Taur-Nonce"] = nonce
+        return headers
 
     def _request(self, path, data={}, query_params={}, method="post"):
-        nonce = str(int(1000 * time.time()))
-        signature = self._get_signature(
-            path=path,
-            data=data,
-            nonce=nonce,
-            method=method,
-        )
-        headers = {
-            "Authorization": "Bearer {}".format(self.key),
-            "Taur-Signature": signature,
-            "Taur-Nonce": nonce,
-            "Content-Type": "application/json",
-        }
-        try:
-            return requests.request(
-                method=method,
-                url=self.base_url + path,
-                data=json.dumps(data),
-                params=query_params,
-                headers=headers,
-            ).json()
-        except simplejson.errors.JSONDecodeError:
-            return {"success": False, "msg": "Could not connect to api.tauros.io"}
+        return self._send(self.prepare(path, data, method=method), query_params)
+
+    def _send(self, prepared, query_params={}):
+        stage = REQUEST_STAGES.get(prepared.path)
+        if stage is None:
+            return self._send_request(prepared, query_params)
+        with metrics.timer(stage):
+            return self._send_request(prepared, query_params)
+
+    def _send_request(self, prepared, query_params):
+        # Requests with a rejected nonce are not executed, so it is safe to
+        # send them again with a new one.
+        for _ in range(settings.NONCE_RETRIES + 1):
+            nonce = self.nonce_generator.get_nonce()
+            headers = self._get_headers(prepared, nonce)
+            try:
+                response = (
+                    get_session()
+                    .request(
+                        method=prepared.method,
+                        url=self.base_url + prepared.path,
+                        data=prepared.body,
+                        params=query_params,
+                        headers=headers,
+                        timeout=settings.HTTP_TIMEOUT,
+                    )
+                    .json()
+                )
+            except (simplejson.errors.JSONDecodeError, requests.RequestException):
+                metrics.inc("http_errors", "tauros")
+                return {"success": False, "msg": "Could not connect to api.tauros.io"}
+            if not is_nonce_rejected(response):
+                return response
+            self.nonce_generator.reject(nonce)
+        return response
+
+    def _on_order_placed(self, response):
+        """
+        Prepares the close request of a placed order, so closing it only
+        takes signing the nonce.
+        """
+        if isinstance(response, dict) and response.get("success"):
+            order_id = response["data"]["id"]
+            self.close_templates[order_id] = self.prepare(
+                CLOSE_ORDER_PATH, {"id": order_id}
+            )
+            if len(self.close_templates) > settings.CLOSE_TEMPLATES_SIZE:
+                self.close_templates.popitem(last=False)
+        return response
+
+    def _get_close_request(self, order_id):
+        prepared = self.close_templates.pop(order_id, None)
+        if prepared is None:
+            prepared = self.prepare(CLOSE_ORDER_PATH, {"id": order_id})
+        return prepared
 
     def place_order(self, order):
-        path = "/api/v1/trading/placeorder/"
-        return self._request(path=path, data=order)
+        return self._on_order_placed(self._request(path=PLACE_ORDER_PATH, data=order))
 
     def get_orders(self, market=None):
         path = "/api/v1/trading/myopenorders/"
@@ -65,11 +178,7 @@ class TaurosPrivate:
         return self._request(path=path, query_params=params, method="get")
 
     def close_order(self, order_id):
-        path = "/api/v1/trading/closeorder/"
-        data = {
-            "id": order_id,
-        }
-        return self._request(path=path, data=data)
+        return self._send(self._get_close_request(order_id))
 
     def get_wallet(self, coin):
         path = "/api/v1/data/getbalance/"
@@ -78,6 +187,42 @@ class TaurosPrivate:
         }
         return self._request(path=path, query_params=data, method="get")
 
+    def _check_closed(self, orders_ids, responses):
+        """
+        Logs the close order responses. Returns the number of orders closed
+        and the ids of the orders whose nonce was rejected.
+        """
+        orders_closed = 0
+        rejected_ids = []
+        for order_id, close_order in zip(orders_ids, responses):
+            if close_order["success"]:
+                orders_closed += 1
+            elif is_nonce_rejected(close_order):
+                rejected_ids.append(order_id)
+            else:
+                error_msg = close_order["msg"]
+                logging.error(
+                    f"Close order with id {order_id} failed. Error: {error_msg}"
+                )
+        return orders_closed, rejected_ids
+
+    def close_orders(self, orders_ids):
+        """
+        Closes orders concurrently. Requests sent at the same time may reach
+        the exchange out of nonce order, so orders rejected for their nonce
+        are closed again one at a time.
+        Returns the number of orders closed.
+        """
+        with ThreadPoolExecutor(max_workers=settings.CLOSE_ORDERS_WORKERS) as pool:
+            responses = list(pool.map(self.close_order, orders_ids))
+        orders_closed, rejected_ids = self._check_closed(orders_ids, responses)
+
+        responses = [self.close_order(order_id) for order_id in rejected_ids]
+        retried_closed, rejected_ids = self._check_closed(rejected_ids, responses)
+        for order_id in rejected_ids:
+            logging.error(f"Close order with id {order_id} failed. Nonce rejected")
+        return orders_closed + retried_closed
+
     def close_all_orders(self):
         """
         This function queries all open orders in tauros and closes them.
@@ -89,33 +234,124 @@ class TaurosPrivate:
 
         orders_ids = [order["order_id"] for order in open_orders["data"]]
         logging.info(f"Open orders: {orders_ids}")
-        orders_closed = 0
-        for order_id in orders_ids:
-            logging.info(f"Closing order with id: {order_id}")
-            close_order = self.close_order(order_id=order_id)
-            if not close_order["success"]:
-                error_msg = close_order["msg"]
-                logging.error(
-                    f"Close order with id {order_id} failed. Error: {error_msg}"
-                )
-                continue
-            orders_closed += 1
+        orders_closed = self.close_orders(orders_ids)
         logging.info(f"{orders_closed} limit orders closed!")
 
 
+class AsyncTaurosPrivate(TaurosPrivate):
+    """
+    asyncio version of TaurosPrivate. Endpoint methods (place_order,
+    close_order, get_orders and get_wallet) return awaitables and every
+    request goes through a single aiohttp session.
+    """
+
+    def __init__(self, key, secret, prod=True, nonce_generator=None):
+        super().__init__(
+            key=key, secret=secret, prod=prod, nonce_generator=nonce_generator
+        )
+        self.session = None
+
+    def get_session(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=settings.HTTP_POOL_SIZE),
+                timeout=aiohttp.ClientTimeout(total=settings.HTTP_TIMEOUT),
+            )
+        return self.session
+
+    async def _request(self, path, data={}, query_params={}, method="post"):
+        return await self._send(self.prepare(path, data, method=method), query_params)
+
+    async def _send(self, prepared, query_params={}):
+        stage = REQUEST_STAGES.get(prepared.path)
+        if stage is None:
+            return await self._send_request(prepared, query_params)
+        with metrics.timer(stage):
+            return await self._send_request(prepared, query_params)
+
+    async def _send_request(self, prepared, query_params):
+        for _ in range(settings.NONCE_RETRIES + 1):
+            nonce = self.nonce_generator.get_nonce()
+            headers = self._get_headers(prepared, nonce)
+            try:
+                async with self.get_session().request(
+                    method=prepared.method,
+                    url=self.base_url + prepared.path,
+                    data=prepared.body,
+                    params=query_params,
+                    headers=headers,
+                ) as response:
+                    response = await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                metrics.inc("http_errors", "tauros")
+                return {"success": False, "msg": "Could not connect to api.tauros.io"}
+            if not is_nonce_rejected(response):
+                return response
+            self.nonce_generator.reject(nonce)
+        return response
+
+    async def place_order(self, order):
+        response = await self._request(path=PLACE_ORDER_PATH, data=order)
+        return self._on_order_placed(response)
+
+    async def close_orders(self, orders_ids):
+        """
+        Coroutine version of TaurosPrivate.close_orders.
+        """
+        semaphore = asyncio.Semaphore(settings.CLOSE_ORDERS_WORKERS)
+
+        async def close_order(order_id):
+            async with semaphore:
+                return await self.close_order(order_id)
+
+        responses = await asyncio.gather(
+            *(close_order(order_id) for order_id in orders_ids)
+        )
+        orders_closed, rejected_ids = self._check_closed(orders_ids, responses)
+
+        responses = [await self.close_order(order_id) for order_id in rejected_ids]
+        retried_closed, rejected_ids = self._check_closed(rejected_ids, responses)
+        for order_id in rejected_ids:
+            logging.error(f"Close order with id {order_id} failed. Nonce rejected")
+        return orders_closed + retried_closed
+
+    async def close_all_orders(self):
+        """
+        This function queries all open orders in tauros and closes them.
+        """
+        open_orders = await self.get_orders()
+        if not open_orders["success"]:
+            logging.error(f'Querying open orders fail. Error: {open_orders["msg"]}')
+            return
+
+        orders_ids = [order["order_id"] for order in open_orders["data"]]
+        logging.info(f"Open orders: {orders_ids}")
+        orders_closed = await self.close_orders(orders_ids)
+        logging.info(f"{orders_closed} limit orders closed!")
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
 class TaurosPublic:
     def __init__(self, prod=True):
-        self.base_url = (
-            "https://api.tauros.io/api" if prod else "https://api.staging.tauros.io/api"
-        )
+        self.base_url = get_api_url(prod) + "/api"
 
     def _request(self, path, params={}):
         try:
-            return requests.get(
-                url=self.base_url + path,
-                params=params,
-            ).json()
-        except simplejson.errors.JSONDecodeError:
+            return (
+                get_session()
+                .get(
+                    url=self.base_url + path,
+                    params=params,
+                    timeout=settings.HTTP_TIMEOUT,
+                )
+                .json()
+            )
+        except (simplejson.errors.JSONDecodeError, requests.RequestException):
+            metrics.inc("http_errors", "tauros")
             return {"success": False, "msg": "Could not connect to api.tauros.io"}
 
     def get_order_book(self, market="BTC-MXN"):
@@ -129,11 +365,10 @@ class TaurosPublic:
             # Getting tauros order book
             tauros_order_book = self.get_order_book(market=market)
             orderbook = tauros_order_book["payload"]
-        tauros_price = None
-        for ask in orderbook["asks"]:
-            if Decimal(str(ask["value"])) > ignore_below:
-                tauros_price = Decimal(str(ask["price"]))
-                return tauros_price
+        price = BookQuery.from_orderbook(orderbook).get_best_price(
+            ask=True, ignore_below=ignore_below
+        )
+        return None if price is None else Decimal(str(price))
 
     def get_bid_price(
         self, market="btc-mxn", ignore_below=Decimal("200.00"), orderbook=None
@@ -142,24 +377,43 @@ class TaurosPublic:
             # Getting tauros order book
             tauros_order_book = self.get_order_book(market=market)
             orderbook = tauros_order_book["payload"]
-        tauros_price = None
-        for bid in orderbook["bids"]:
-            if Decimal(str(bid["value"])) > ignore_below:
-                tauros_price = Decimal(str(bid["price"]))
-                return tauros_price
+        price = BookQuery.from_orderbook(orderbook).get_best_price(
+            ask=False, ignore_below=ignore_below
+        )
+        return None if price is None else Decimal(str(price))
 
 
 class OrderBook:
-    def __init__(self, market, orderbook, prod=True):
-        self.ws_url = "wss://ws.tauros.io" if prod else "wss://ws-staging.tauros.io"
+    """
+    Feeds a SharedBook from the tauros orderbook websocket channel, and the
+    optional BookSignals and BookRecorder with every update.
+
+    Frames with "type": "update" are incremental diffs where levels with
+    zero amount are removed, any other frame is a full snapshot. If frames
+    carry a "sequence" number, gaps trigger a resync from the REST
+    orderbook. While a resync has not succeeded the book is stale: it is
+    published empty, so bots do not quote from it, and diffs are ignored.
+    """
+
+    def __init__(
+        self, market, orderbook, prod=True, event=None, signals=None, recorder=None
+    ):
+        self.ws_url = get_ws_url(prod)
         self.channel = "orderbook"
         self.market = market
+        self.engine = BookEngine(market=market)
+        self.tauros_public = TaurosPublic(prod=prod)
         self.ws = websocket.WebSocketApp(
             self.ws_url,
             on_open=self.on_open,
             on_message=self.on_message,
         )
         self.orderbook = orderbook
+        self.event = event
+        self.signals = signals
+        self.recorder = recorder
+        self.stale = False
+        self.resynced_at = 0
 
     def connect(self):
         self.ws.run_forever(
@@ -177,38 +431,196 @@ class OrderBook:
         ws.send(json.dumps(message))
 
     def on_message(self, ws, message):
-        msg = json.loads(message)
-        if msg.get("data") and self.orderbook:
-            for index, item in enumerate(msg["data"]["asks"]):
-                self.orderbook["asks_a"][index] = Decimal(item["a"])
-                self.orderbook["asks_v"][index] = Decimal(item["v"])
-                self.orderbook["asks_p"][index] = Decimal(item["p"])
-            for index, item in enumerate(msg["data"]["bids"]):
-                self.orderbook["bids_a"][index] = Decimal(item["a"])
-                self.orderbook["bids_v"][index] = Decimal(item["v"])
-                self.orderbook["bids_p"][index] = Decimal(item["p"])
-
-
-def format_orderbook(raw_orderbook):
-    orderbook = {"asks": [], "bids": []}
-    for index, item in enumerate(raw_orderbook["asks_p"]):
-        if item == 0:
-            break
-        orderbook["asks"].append(
-            {
-                "price": item,
-                "amount": raw_orderbook["asks_a"][index],
-                "value": raw_orderbook["asks_v"][index],
-            }
+        metrics.inc("ws_messages", self.market.upper())
+        msg = json_loads(message)
+        data = msg.get("data")
+        if not data or self.orderbook is None:
+            return
+
+        asks = [
+            (float(item["p"]), float(item["a"]), float(item["v"]))
+            for item in data.get("asks", [])
+        ]
+        bids = [
+            (float(item["p"]), float(item["a"]), float(item["v"]))
+            for item in data.get("bids", [])
+        ]
+        sequence = msg.get("sequence")
+        if msg.get("type") != "update":
+            self.engine.apply_snapshot(asks, bids, sequence=sequence)
+            self.stale = False
+        elif self.stale or not self.engine.apply_diff(asks, bids, sequence=sequence):
+            self.resync(sequence)
+            if self.stale:
+                return
+
+        levels = self.engine.get_levels(self.orderbook.depth)
+        self._write(*levels)
+        if self.signals is not None:
+            self.signals.update(*levels)
+        if self.event is not None:
+            with self.event:
+                self.event.notify_all()
+
+    def _write(self, asks, bids):
+        self.orderbook.write(asks, bids)
+        if self.recorder is not None:
+            self.recorder.update(self.orderbook)
+
+    def resync(self, sequence=None):
+        """
+        Rebuilds the book from the REST orderbook. A failed resync marks the
+        book as stale and is retried with the next frames, once every
+        BOOK_RESYNC_INTERVAL seconds.
+
+        sequence is the one of the frame that triggered the resync. The REST
+        orderbook is fetched after that frame, so it is used as the sequence
+        of a payload without one and later diffs are applied on top.
+        """
+        now = time.monotonic()
+        if self.stale and now - self.resynced_at < settings.BOOK_RESYNC_INTERVAL:
+            return
+        self.resynced_at = now
+        logging.info(f"Resyncing {self.market} orderbook")
+        metrics.inc("book_resyncs", self.market.upper())
+        response = self.tauros_public.get_order_book(market=self.market)
+        payload = response.get("payload") if isinstance(response, dict) else None
+        if not payload:
+            logging.error(f"{self.market} orderbook resync failed")
+            if not self.stale:
+                self.stale = True
+                self._write([], [])
+            return
+        self.stale = False
+        self.engine.apply_snapshot(
+            asks=[
+                (float(ask["price"]), float(ask["amount"]), float(ask["value"]))
+                for ask in payload["asks"]
+            ],
+            bids=[
+                (float(bid["price"]), float(bid["amount"]), float(bid["value"]))
+                for bid in payload["bids"]
+            ],
+            sequence=payload.get("sequence", sequence),
         )
-    for index, item in enumerate(raw_orderbook["bids_p"]):
-        if item == 0:
-            break
-        orderbook["bids"].append(
-            {
-                "price": item,
-                "aamount": raw_orderbook["bids_a"][index],
-                "value": raw_orderbook["bids_v"][index],
-            }
+
+
+# Order statuses after which an order is no longer live
+CLOSED_ORDER_STATUSES = ("FILLED", "CLOSED", "CANCELLED")
+
+
+def is_closed_status(order):
+    return str(order.get("status") or "").upper() in CLOSED_ORDER_STATUSES
+
+
+class OrderStore:
+    """
+    Our orders reported by the user stream by id, written by the UserStream
+    and read by the bots. orders is a Manager dict shared by processes, or
+    a dict in a single process.
+
+    Every write bumps a shared version, so readers answer from a cache of
+    their own process until something changes instead of querying the
+    Manager on every lookup. Closed orders are removed ttl seconds after
+    they are reported, so the store only grows with the live orders.
+    """
+
+    def __init__(self, orders, ttl=None):
+        self.orders = orders
+        self.ttl = ttl or settings.USER_STREAM_CLOSED_ORDERS_TTL
+        self.version = Value("Q", lock=False)
+        self.cache = {}
+        self.cache_version = None
+        # Closed orders as (reported at, order id), oldest first
+        self.closed = deque()
+
+    def put(self, order):
+        self.orders[order["id"]] = order
+        now = time.time()
+        if is_closed_status(order):
+            self.closed.append((now, order["id"]))
+        while self.closed and self.closed[0][0] < now - self.ttl:
+            self.orders.pop(self.closed.popleft()[1], None)
+        self.version.value += 1
+
+    def get(self, order_id):
+        version = self.version.value
+        if version != self.cache_version:
+            self.cache.clear()
+            self.cache_version = version
+        if order_id not in self.cache:
+            self.cache[order_id] = self.orders.get(order_id)
+        return self.cache[order_id]
+
+    def copy(self):
+        return dict(self.orders.copy())
+
+
+class UserStream:
+    """
+    Authenticated websocket stream of our own orders and balances.
+
+    Order frames ({"channel": "orders", "data": {"id", "market", "status",
+    "amount", "filled", ...}}) are stored in orders, an OrderStore shared
+    with the bots, and notify the event of the order market so bots requote
+    as soon as their order is hit. Balance frames ({"channel": "balances", "data":
+    {"coin", "available"}}) update the BalanceCache.
+    """
+
+    def __init__(self, client, orders, balances=None, events=None, prod=True):
+        self.ws_url = get_ws_url(prod)
+        self.client = client
+        self.ws = websocket.WebSocketApp(
+            self.ws_url,
+            on_open=self.on_open,
+            on_message=self.on_message,
         )
-    return orderbook
+        self.orders = orders
+        self.balances = balances
+        self.events = events or {}
+
+    def connect(self):
+        self.ws.run_forever(
+            ping_interval=20,
+            ping_timeout=10,
+            sslopt={"cert_reqs": ssl.CERT_NONE},
+        )
+
+    def on_open(self, ws):
+        path = "/ws/auth/"
+        nonce = self.client.nonce_generator.get_nonce()
+        message = {
+            "action": "authenticate",
+            "key": self.client.key,
+            "nonce": nonce,
+            "signature": self.client._get_signature(
+                path=path, data={}, nonce=nonce, method="get"
+            ),
+        }
+        ws.send(json.dumps(message))
+        for channel in ("orders", "balances"):
+            ws.send(json.dumps({"action": "subscribe", "channel": channel}))
+
+    def on_message(self, ws, message):
+        msg = json_loads(message)
+        data = msg.get("data")
+        if not data:
+            return
+
+        if msg.get("channel") == "orders":
+            self.orders.put(data)
+            event = self.events.get(data.get("market", "").upper())
+            if event is not None:
+                with event:
+                    event.notify_all()
+        elif msg.get("channel") == "balances" and self.balances is not None:
+            coin = data["coin"].lower()
+            if coin in self.balances.balances:
+                self.balances.set_available(coin, Decimal(str(data["available"])))
+
+
+def format_orderbook(shared_book):
+    """
+    Returns a consistent snapshot of a SharedBook as a dict of asks and bids.
+    """
+    return shared_book.snapshot().to_orderbook()